@@ -0,0 +1,110 @@
+from sqlalchemy import event, select, exists
+from sqlalchemy.orm import Session
+
+from database import upsert
+from models import LogAlteracao, VersaoTabela, Produto, Fornecedores, Categoria, Movimentacoes, TipoPagamento, TipoMovimentacao
+from versoes import registrar_alteracao
+
+# -------------------------------------------------------------------
+# Log de alterações (sincronização incremental / delta)
+# Os routers de registro chamam registrar_linhas(db, tabela, ids) antes do
+# commit; as linhas ficam guardadas na sessão e, no before_commit, vão
+# para a tabela log_alteracoes com a versão da transação (uma linha por
+# registro: a versão é sempre a da última transação que mexeu nele, e o
+# DELETE deixa uma lápide com removido=True).
+#
+# A versão sai de um contador global (linha "log_alteracoes" da
+# versao_tabela) incrementado logo antes do COMMIT. O UPDATE do contador
+# trava a linha até o fim da transação, então as versões são confirmadas
+# na mesma ordem em que são geradas: quem leu até a versão N já viu tudo
+# que tem versão <= N (sem "buracos" de transações mais lentas). Como o
+# contador é a última trava pega, o tempo em que ele fica preso é só o do
+# COMMIT, e não há risco de travamento cruzado com as outras linhas da
+# versao_tabela (que são pegas antes, na ordem de sempre).
+# -------------------------------------------------------------------
+CONTADOR = "log_alteracoes"
+
+# tabelas sincronizáveis pelo /consulta/changes
+MODELOS = {
+    "produtos": Produto,
+    "fornecedores": Fornecedores,
+    "categoria": Categoria,
+    "movimentacoes": Movimentacoes,
+    "tipo_pagamento": TipoPagamento,
+    "tipo_movimentacao": TipoMovimentacao,
+}
+
+
+def registrar_linhas(db: Session, tabela: str, ids, removido: bool = False):
+    """
+    Marca as linhas como alteradas (ou removidas) na transação atual.
+    Chamar antes do commit; a gravação no log é feita junto com o commit.
+    """
+    if isinstance(ids, int):
+        ids = (ids,)
+    pendentes = db.info.setdefault("linhas_alteradas", {})
+    for registro_id in ids:
+        pendentes[(tabela, registro_id)] = removido   # a última operação na transação vale
+
+
+@event.listens_for(Session, "before_commit")
+def _gravar_log(session):
+    pendentes = session.info.pop("linhas_alteradas", None)
+    if not pendentes:
+        return
+    # o que o ORM ainda tem pendente (DELETE, saldo) vai antes: o contador é a última trava
+    session.flush()
+    registrar_alteracao(session, CONTADOR)
+    versao = session.scalar(select(VersaoTabela.versao).where(VersaoTabela.tabela == CONTADOR))
+    valores = [
+        {"tabela": tabela, "registro_id": registro_id, "versao": versao, "removido": removido}
+        for (tabela, registro_id), removido in pendentes.items()
+    ]
+    session.execute(_stmt_upsert(session), valores)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_log(session):
+    session.info.pop("linhas_alteradas", None)
+
+
+def _stmt_upsert(db: Session):
+    # uma linha por registro: insere na primeira alteração e depois só troca versão/removido
+    return upsert(
+        db, LogAlteracao, ["tabela", "registro_id"],
+        lambda novo: {"versao": novo.versao, "removido": novo.removido}
+    )
+
+
+# -------------------------------------------------------------------
+# Leitura (usada pelo /consulta/changes)
+# -------------------------------------------------------------------
+def versao_atual(db: Session) -> int:
+    """Última versão confirmada no log (0 se nada foi registrado ainda)."""
+    return db.scalar(select(VersaoTabela.versao).where(VersaoTabela.tabela == CONTADOR)) or 0
+
+
+def alteracoes_desde(db: Session, desde: int, tabelas, limite: int):
+    """
+    Entradas do log com versão > desde, em ordem de versão.
+    Devolve (entradas, mais): com mais=True a página parou antes do fim,
+    sempre entre duas transações (as linhas de uma mesma versão vêm juntas).
+    """
+    base = (
+        select(LogAlteracao.tabela, LogAlteracao.registro_id, LogAlteracao.versao, LogAlteracao.removido)
+        .where(LogAlteracao.tabela.in_(tabelas))
+    )
+    entradas = db.execute(
+        base.where(LogAlteracao.versao > desde).order_by(LogAlteracao.versao).limit(limite + 1)
+    ).all()
+    if len(entradas) <= limite:
+        return entradas, False
+
+    corte = entradas[limite].versao
+    entradas = [e for e in entradas if e.versao < corte]
+    if not entradas:
+        # uma transação sozinha passa do limite (ex: lote grande): vai inteira
+        entradas = db.execute(base.where(LogAlteracao.versao == corte)).all()
+        mais = db.scalar(select(exists().where(LogAlteracao.tabela.in_(tabelas), LogAlteracao.versao > corte)))
+        return entradas, bool(mais)
+    return entradas, True
@@ -0,0 +1,185 @@
+import os
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import select, func
+
+from cache import get_cache
+from estoque import sinais_por_tipo
+from models import Movimentacoes, Produto
+from versoes import obter_versao
+
+# -------------------------------------------------------------------
+# Análises de estoque (ABC, XYZ, giro e cobertura)
+# As movimentações da janela são lidas em bloco, direto para arrays do
+# NumPy (uma coluna por array, sem criar objeto por linha), e as contas
+# por produto são feitas com agrupamentos vetorizados (np.bincount).
+#
+# O resultado fica em cache, com a versão das tabelas movimentacoes e
+# produtos na chave: enquanto ninguém registrar nada, as chamadas seguintes
+# não vão ao banco nem refazem as contas.
+# -------------------------------------------------------------------
+ANALISE_TTL = int(os.getenv("ANALISE_TTL", "3600"))  # segundos
+TAMANHO_LOTE = 50000
+
+# ABC: A = produtos que somam até 80% do faturamento, B = até 95%, C = o resto
+LIMITE_A = 0.80
+LIMITE_B = 0.95
+# XYZ: coeficiente de variação da demanda semanal
+LIMITE_X = 0.5
+LIMITE_Y = 1.0
+DIAS_POR_PERIODO = 7  # demanda agrupada por semana para o XYZ
+
+# tabelas que mudam o resultado (versões na chave do cache)
+TABELAS = ("movimentacoes", "produtos", "tipo_movimentacao")
+
+cache_analise = get_cache("analise", ttl=ANALISE_TTL)
+
+
+def carregar_colunas(db, desde: date):
+    """
+    Movimentações a partir de `desde` como arrays: produto_id, dia (ordinal),
+    quantidade com sinal (entrada +, saída -) e faturamento (preco_venda x quantidade).
+    """
+    sinais = sinais_por_tipo(db)
+    result = db.execute(
+        select(
+            Movimentacoes.produto_id,
+            Movimentacoes.data,
+            Movimentacoes.tipo_mov_id,
+            Movimentacoes.quantidade,
+            func.coalesce(Movimentacoes.preco_venda, 0),
+        )
+        .where(Movimentacoes.data >= datetime.combine(desde, time.min))
+        .execution_options(yield_per=TAMANHO_LOTE)
+    )
+
+    partes = []
+    for lote in result.partitions():
+        produto_id, data, tipo_mov_id, quantidade, preco_venda = zip(*lote)
+        dias = np.array(data, dtype="datetime64[s]").astype("datetime64[D]").astype(np.int64)
+        sinal = np.array([sinais.get(t, 0) for t in tipo_mov_id], dtype=np.int8)
+        quantidade = np.array(quantidade, dtype=np.float64)
+        partes.append((
+            np.array(produto_id, dtype=np.int64),
+            dias,
+            sinal * quantidade,
+            np.array(preco_venda, dtype=np.float64) * quantidade,
+        ))
+
+    if not partes:
+        vazio = np.array([], dtype=np.int64)
+        return vazio, vazio, np.array([], dtype=np.float64), np.array([], dtype=np.float64)
+    return tuple(np.concatenate(coluna) for coluna in zip(*partes))
+
+
+def classificar_abc(faturamento: np.ndarray) -> np.ndarray:
+    classes = np.full(faturamento.shape, "C", dtype="<U1")
+    total = faturamento.sum()
+    if total <= 0:
+        return classes
+    ordem = np.argsort(-faturamento, kind="stable")
+    acumulado = np.cumsum(faturamento[ordem]) / total
+    # o produto entra na classe pelo acumulado ANTES dele (o primeiro é sempre A)
+    anterior = np.concatenate(([0.0], acumulado[:-1]))
+    classes_ordenadas = np.where(anterior < LIMITE_A, "A", np.where(anterior < LIMITE_B, "B", "C"))
+    classes[ordem] = classes_ordenadas
+    classes[faturamento <= 0] = "C"
+    return classes
+
+
+def classificar_xyz(cv: np.ndarray) -> np.ndarray:
+    # sem demanda nenhuma (cv = nan) fica como Z
+    return np.where(cv <= LIMITE_X, "X", np.where(cv <= LIMITE_Y, "Y", "Z"))
+
+
+def calcular(db, dias: int, hoje: date = None):
+    """Métricas de todos os produtos na janela dos últimos `dias` dias."""
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=dias - 1)
+
+    produtos = db.execute(select(Produto.id, Produto.nome, Produto.qtd_disponivel).order_by(Produto.id)).all()
+    if not produtos:
+        return []
+    ids = np.array([p.id for p in produtos], dtype=np.int64)
+    estoque_atual = np.array([p.qtd_disponivel or 0 for p in produtos], dtype=np.float64)
+    n = len(ids)
+
+    produto_id, dia, qtd_com_sinal, faturamento_mov = carregar_colunas(db, inicio)
+
+    # posição de cada movimentação no array de produtos (ids está ordenado)
+    pos = np.searchsorted(ids, produto_id)
+    valido = (pos < n) & (ids[np.minimum(pos, n - 1)] == produto_id)
+    pos, dia, qtd_com_sinal, faturamento_mov = pos[valido], dia[valido], qtd_com_sinal[valido], faturamento_mov[valido]
+
+    saida = np.where(qtd_com_sinal < 0, -qtd_com_sinal, 0.0)
+    faturamento = np.bincount(pos, weights=np.where(qtd_com_sinal < 0, faturamento_mov, 0.0), minlength=n)
+    demanda_total = np.bincount(pos, weights=saida, minlength=n)
+
+    # demanda por semana: matriz produtos x períodos
+    dia_inicio = np.datetime64(inicio, "D").astype(np.int64)
+    n_periodos = max(1, -(-dias // DIAS_POR_PERIODO))
+    periodo = np.clip((dia - dia_inicio) // DIAS_POR_PERIODO, 0, n_periodos - 1)
+    celula = pos * n_periodos + periodo
+    demanda = np.bincount(celula, weights=saida, minlength=n * n_periodos).reshape(n, n_periodos)
+    media = demanda.mean(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cv = np.where(media > 0, demanda.std(axis=1) / media, np.nan)
+
+    # estoque no fim de cada período, reconstruído de trás para frente a partir do saldo atual
+    variacao = np.bincount(celula, weights=qtd_com_sinal, minlength=n * n_periodos).reshape(n, n_periodos)
+    depois = np.cumsum(variacao[:, ::-1], axis=1)[:, ::-1] - variacao  # o que entrou/saiu depois do período
+    estoque_medio = (estoque_atual[:, None] - depois).mean(axis=1)
+
+    demanda_diaria = demanda_total / dias
+    with np.errstate(invalid="ignore", divide="ignore"):
+        giro = np.where(estoque_medio > 0, demanda_total / estoque_medio, np.nan)
+        cobertura = np.where(demanda_diaria > 0, estoque_atual / demanda_diaria, np.nan)
+
+    abc = classificar_abc(faturamento)
+    xyz = classificar_xyz(cv)
+
+    def _numero(valor, casas=3):
+        return None if np.isnan(valor) else round(float(valor), casas)
+
+    return [
+        {
+            "produto_id": int(ids[i]),
+            "nome": produtos[i].nome,
+            "classe_abc": str(abc[i]),
+            "classe_xyz": str(xyz[i]),
+            "faturamento": round(float(faturamento[i]), 2),
+            "demanda_total": round(float(demanda_total[i]), 3),
+            "demanda_diaria": round(float(demanda_diaria[i]), 3),
+            "cv_demanda": _numero(cv[i]),
+            "estoque_atual": round(float(estoque_atual[i]), 3),
+            "estoque_medio": round(float(estoque_medio[i]), 3),
+            "giro": _numero(giro[i]),
+            "dias_cobertura": _numero(cobertura[i], 1),
+        }
+        for i in range(n)
+    ]
+
+
+def obter_analise(db, dias: int):
+    """
+    calcular() com cache: uma entrada por janela (dias), guardada junto com
+    a marca em que foi calculada. A marca muda sempre que movimentações,
+    produtos ou tipos de movimentação mudam (e na virada do dia, que desloca
+    a janela); aí a entrada é recalculada no lugar da antiga.
+    """
+    marca = tuple(obter_versao(db, tabela) for tabela in TABELAS) + (date.today(),)
+    carregar = lambda: (marca, calcular(db, dias))
+    marca_guardada, itens = cache_analise.obter(dias, carregar)
+    if marca_guardada != marca:
+        cache_analise.invalidar(dias)
+        marca_guardada, itens = cache_analise.obter(dias, carregar)
+    return itens
+
+
+def resumo_classes(itens):
+    """Matriz ABC x XYZ: quantos produtos em cada combinação."""
+    matriz = {abc + xyz: 0 for abc in "ABC" for xyz in "XYZ"}
+    for item in itens:
+        matriz[item["classe_abc"] + item["classe_xyz"]] += 1
+    return matriz
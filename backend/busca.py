@@ -0,0 +1,285 @@
+import bisect
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import get_sessionmaker
+from estoque import normalizar
+from logger import get_router_logger
+from models import Produto, Fornecedores, Categoria
+from versoes import obter_versao
+
+# -------------------------------------------------------------------
+# Índice de busca em memória (por processo) para produtos, fornecedores
+# e categorias. Cada texto indexado vira palavras normalizadas (sem
+# acento, minúsculas) e cada palavra é quebrada em trigramas:
+#   - palavra igual ou começando com o termo  -> acerto forte
+#   - palavra parecida (trigramas em comum)   -> acerto aproximado
+# ("racao" acha "Ração"; "fornecdor" ainda acha "Fornecedor").
+#
+# O índice é montado no startup e atualizado pelos routers de registro
+# logo depois de cada commit. Para escritas feitas por OUTROS workers,
+# a busca compara um contador próprio (linha VERSAO_BUSCA da versao_tabela)
+# com o que o índice conhece e remonta o índice se estiver atrasado.
+# Só os routers de produto, fornecedor e categoria somam nesse contador:
+# movimentação também muda a versão de "produtos" (saldo), mas não muda
+# nada do que é indexado. Contador e remontagem vão ao banco principal
+# (réplica atrasada faria o índice remontar com dados velhos).
+#
+# A remontagem fica atrás de uma trava própria: uma só por vez no processo.
+# Com o índice já montado ela roda em segundo plano e as buscas continuam
+# respondendo com o índice atual até o novo ficar pronto.
+# -------------------------------------------------------------------
+
+VERSAO_BUSCA = "busca"
+
+logger_busca = get_router_logger("busca", registro=False)
+
+SIMILARIDADE_MINIMA = 0.3   # trigramas em comum / trigramas no total (Jaccard)
+PESO_EXATO = 1.0
+PESO_PREFIXO = 0.8          # palavra começa com o termo (busca enquanto digita)
+MAX_PREFIXOS = 200          # limite de palavras por prefixo curto ("a", "ra", ...)
+
+_SEPARADORES = re.compile(r"[^a-z0-9]+")
+
+
+def tokenizar(texto) -> list:
+    """'Ração Premium 15kg' -> ['racao', 'premium', '15kg']"""
+    return [palavra for palavra in _SEPARADORES.split(normalizar(str(texto or ""))) if palavra]
+
+
+def trigramas(palavra: str) -> set:
+    # espaços nas pontas valorizam o começo da palavra (igual ao pg_trgm)
+    texto = f"  {palavra} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _palavras_documento(tipo: str, campos: dict) -> set:
+    palavras = set()
+    for valor in campos.values():
+        palavras.update(tokenizar(valor))
+    if tipo == "fornecedor" and campos.get("cnpj"):
+        # CNPJ também entra só com os dígitos (busca por "12345678" ou "12.345.678")
+        digitos = re.sub(r"\D", "", campos["cnpj"])
+        if digitos:
+            palavras.add(digitos)
+    return palavras
+
+
+def _ler_versao(db):
+    # None se a tabela de versões não estiver disponível (aí não dá para saber se o índice está atrasado)
+    try:
+        return obter_versao(db, VERSAO_BUSCA)
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+
+class IndiceBusca:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._trava_reconstrucao = threading.Lock()   # uma remontagem por vez
+        self._limpar()
+
+    def _limpar(self):
+        self._docs = {}                           # (tipo, id) -> {"titulo", "palavras"}
+        self._docs_por_palavra = defaultdict(set) # palavra -> {(tipo, id)}
+        self._palavras_por_trigrama = defaultdict(set)
+        self._n_trigramas = {}                    # palavra -> quantidade de trigramas
+        self._ordenadas = []                      # vocabulário ordenado (busca por prefixo)
+        self._versao = None                       # VERSAO_BUSCA que o índice reflete
+        self.construido = False
+
+    # ---------------------------------------------------------------
+    # Montagem e atualização
+    # ---------------------------------------------------------------
+    def reconstruir(self, db):
+        """Lê as três tabelas e monta o índice do zero (db deve ser do banco principal)."""
+        versao = _ler_versao(db)
+
+        documentos = []
+        for produto in db.execute(select(Produto.id, Produto.nome)):
+            documentos.append(("produto", produto.id, produto.nome, {"nome": produto.nome}))
+        for fornecedor in db.execute(select(Fornecedores.id, Fornecedores.razao_social, Fornecedores.cnpj, Fornecedores.email)):
+            documentos.append(("fornecedor", fornecedor.id, fornecedor.razao_social, {
+                "razao_social": fornecedor.razao_social, "cnpj": fornecedor.cnpj, "email": fornecedor.email
+            }))
+        for categoria in db.execute(select(Categoria.id, Categoria.descricao)):
+            documentos.append(("categoria", categoria.id, categoria.descricao, {"descricao": categoria.descricao}))
+
+        with self._lock:
+            self._limpar()
+            for tipo, id_, titulo, campos in documentos:
+                self._adicionar(tipo, id_, titulo, campos)
+            self._versao = versao
+            self.construido = True
+
+    def atualizar_produto(self, produto):
+        self._atualizar("produto", produto.id, produto.nome, {"nome": produto.nome})
+
+    def atualizar_fornecedor(self, fornecedor):
+        self._atualizar("fornecedor", fornecedor.id, fornecedor.razao_social, {
+            "razao_social": fornecedor.razao_social, "cnpj": fornecedor.cnpj, "email": fornecedor.email
+        })
+
+    def atualizar_categoria(self, categoria):
+        self._atualizar("categoria", categoria.id, categoria.descricao, {"descricao": categoria.descricao})
+
+    def remover(self, tipo: str, id_: int):
+        with self._lock:
+            self._remover((tipo, id_))
+            self._contar_escrita(tipo)
+
+    def _atualizar(self, tipo, id_, titulo, campos):
+        with self._lock:
+            self._remover((tipo, id_))
+            self._adicionar(tipo, id_, titulo, campos)
+            self._contar_escrita(tipo)
+
+    def _contar_escrita(self, tipo):
+        # cada commit dos routers de registro soma 1 em VERSAO_BUSCA:
+        # acompanhando aqui, a escrita deste processo não força remontar o índice
+        if self._versao is not None:
+            self._versao += 1
+
+    def _adicionar(self, tipo, id_, titulo, campos):
+        chave = (tipo, id_)
+        palavras = _palavras_documento(tipo, campos)
+        self._docs[chave] = {"titulo": titulo, "palavras": palavras}
+        for palavra in palavras:
+            if palavra not in self._docs_por_palavra:
+                tris = trigramas(palavra)
+                for tri in tris:
+                    self._palavras_por_trigrama[tri].add(palavra)
+                self._n_trigramas[palavra] = len(tris)
+                bisect.insort(self._ordenadas, palavra)
+            self._docs_por_palavra[palavra].add(chave)
+
+    def _remover(self, chave):
+        doc = self._docs.pop(chave, None)
+        if doc is None:
+            return
+        for palavra in doc["palavras"]:
+            docs = self._docs_por_palavra[palavra]
+            docs.discard(chave)
+            if docs:
+                continue
+            # palavra não aparece em mais nenhum documento: sai do vocabulário
+            del self._docs_por_palavra[palavra]
+            del self._n_trigramas[palavra]
+            for tri in trigramas(palavra):
+                self._palavras_por_trigrama[tri].discard(palavra)
+            posicao = bisect.bisect_left(self._ordenadas, palavra)
+            if posicao < len(self._ordenadas) and self._ordenadas[posicao] == palavra:
+                del self._ordenadas[posicao]
+
+    def garantir_atualizado(self):
+        """
+        Remonta o índice se produto, fornecedor ou categoria mudou fora deste
+        processo. Sem índice ainda, monta agora (quem chegar junto espera a
+        mesma montagem); com índice, remonta em segundo plano.
+        """
+        if not self.construido:
+            with self._trava_reconstrucao:
+                if not self.construido:  # outra requisição pode ter montado enquanto esperávamos
+                    with get_sessionmaker("escrita")() as db:
+                        self.reconstruir(db)
+            return
+
+        with get_sessionmaker("escrita")() as db:
+            atual = _ler_versao(db)
+        if atual is None or atual == self._versao:
+            return
+        if not self._trava_reconstrucao.acquire(blocking=False):
+            return  # já tem uma remontagem em andamento
+        threading.Thread(target=self._reconstruir_em_segundo_plano, name="reconstroi-busca", daemon=True).start()
+
+    def _reconstruir_em_segundo_plano(self):
+        # chamado com _trava_reconstrucao já pega
+        try:
+            with get_sessionmaker("escrita")() as db:
+                # confere de novo: a remontagem anterior pode ter acabado de pegar essa versão
+                if _ler_versao(db) != self._versao:
+                    self.reconstruir(db)
+        except SQLAlchemyError as e:
+            logger_busca.error(
+                "",
+                extra={"ip": "N/A", "status": 500, "method": "N/A", "detail": f"Erro ao remontar o índice de busca: {e}"}
+            )
+        finally:
+            self._trava_reconstrucao.release()
+
+    # ---------------------------------------------------------------
+    # Busca
+    # ---------------------------------------------------------------
+    def _palavras_parecidas(self, termo: str) -> dict:
+        """palavra do vocabulário -> peso do acerto para este termo"""
+        pesos = {}
+
+        if termo in self._docs_por_palavra:
+            pesos[termo] = PESO_EXATO
+
+        # prefixo: faixa do vocabulário ordenado que começa com o termo
+        inicio = bisect.bisect_left(self._ordenadas, termo)
+        for palavra in self._ordenadas[inicio:inicio + MAX_PREFIXOS]:
+            if not palavra.startswith(termo):
+                break
+            pesos.setdefault(palavra, PESO_PREFIXO)
+
+        # aproximado: palavras com trigramas em comum
+        tris = trigramas(termo)
+        em_comum = defaultdict(int)
+        for tri in tris:
+            for palavra in self._palavras_por_trigrama.get(tri, ()):
+                em_comum[palavra] += 1
+        for palavra, comuns in em_comum.items():
+            similaridade = comuns / (len(tris) + self._n_trigramas[palavra] - comuns)
+            if similaridade >= SIMILARIDADE_MINIMA and similaridade * PESO_PREFIXO > pesos.get(palavra, 0):
+                pesos[palavra] = similaridade * PESO_PREFIXO
+
+        return pesos
+
+    def buscar(self, texto: str, tipos=None, limite: int = 10):
+        """
+        Retorna até `limite` documentos [(score, tipo, id, titulo)], do mais
+        relevante para o menos. O score soma, para cada termo da busca, o
+        melhor acerto do documento.
+        """
+        termos = tokenizar(texto)
+        if not termos:
+            return []
+
+        with self._lock:
+            scores = defaultdict(float)
+            for termo in termos:
+                melhor = {}
+                for palavra, peso in self._palavras_parecidas(termo).items():
+                    for chave in self._docs_por_palavra[palavra]:
+                        if peso > melhor.get(chave, 0):
+                            melhor[chave] = peso
+                for chave, peso in melhor.items():
+                    scores[chave] += peso
+
+            candidatos = (
+                (score / len(termos), chave) for chave, score in scores.items()
+                if tipos is None or chave[0] in tipos
+            )
+            top = heapq.nlargest(limite, candidatos, key=lambda item: (item[0], -item[1][1]))
+            return [(round(score, 4), tipo, id_, self._docs[(tipo, id_)]["titulo"]) for score, (tipo, id_) in top]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documentos": len(self._docs),
+                "palavras": len(self._docs_por_palavra),
+                "trigramas": len(self._palavras_por_trigrama),
+                "versao": self._versao,
+            }
+
+
+# índice único do processo (usado pela consulta e pelos routers de registro)
+indice_busca = IndiceBusca()
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+# -------------------------------------------------------------------
+# Cache em memória (por processo) para tabelas pequenas e quase fixas
+# (categoria, tipo_pagamento, tipo_movimentacao).
+# A consulta lê do cache; se não tiver ou se passou do TTL, busca no
+# banco e guarda. Os routers de registro chamam invalidar() depois de
+# cada POST/PUT/DELETE, então a próxima leitura já vem atualizada.
+# Com vários workers do uvicorn cada processo tem o seu cache: nesse
+# caso o TTL é o limite de quanto tempo um worker pode ficar desatualizado.
+# -------------------------------------------------------------------
+TTL_PADRAO = int(os.getenv("CACHE_TTL_REFERENCIA", "300"))  # segundos
+
+
+class CacheTTL:
+    def __init__(self, nome: str, ttl: int = TTL_PADRAO):
+        self.nome = nome
+        self.ttl = ttl
+        self._dados = {}          # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._proxima_limpeza = time.monotonic() + ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave, carregar):
+        """
+        Retorna o valor da chave; em caso de miss chama carregar() e guarda o resultado.
+        """
+        agora = time.monotonic()
+        item = self._dados.get(chave)
+        if item is not None and item[0] > agora:
+            self.hits += 1
+            return item[1]
+
+        with self._lock:
+            # outra thread pode ter carregado enquanto esperávamos o lock
+            item = self._dados.get(chave)
+            if item is not None and item[0] > time.monotonic():
+                self.hits += 1
+                return item[1]
+
+            self.misses += 1
+            valor = carregar()
+            self._guardar(chave, valor)
+            return valor
+
+    async def obter_async(self, chave, carregar):
+        """
+        Versão para os routers async: carregar é uma função async.
+        Roda sempre na thread do event loop, então não usa o lock.
+        """
+        item = self._dados.get(chave)
+        if item is not None and item[0] > time.monotonic():
+            self.hits += 1
+            return item[1]
+
+        self.misses += 1
+        valor = await carregar()
+        self._guardar(chave, valor)
+        return valor
+
+    def _guardar(self, chave, valor):
+        agora = time.monotonic()
+        if agora >= self._proxima_limpeza:
+            # chave que não é mais pedida não passaria por obter() de novo:
+            # uma vez por TTL remove as que já expiraram
+            for antiga, item in list(self._dados.items()):
+                if item[0] > agora:
+                    continue
+                self._dados.pop(antiga, None)
+            self._proxima_limpeza = agora + self.ttl
+        self._dados[chave] = (agora + self.ttl, valor)
+
+    def invalidar(self, chave=None):
+        with self._lock:
+            if chave is None:
+                self._dados.clear()
+            else:
+                self._dados.pop(chave, None)
+            self.invalidacoes += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "chaves": len(self._dados),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "invalidacoes": self.invalidacoes,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(nome: str, ttl: int = TTL_PADRAO) -> CacheTTL:
+    """Retorna o cache com esse nome (criando na primeira vez)."""
+    with _caches_lock:
+        if nome not in _caches:
+            _caches[nome] = CacheTTL(nome, ttl)
+        return _caches[nome]
+
+
+def invalidar(nome: str):
+    """Usado pelos routers de registro depois de alterar a tabela."""
+    get_cache(nome).invalidar()
+
+
+def cache_stats():
+    return {nome: cache.stats() for nome, cache in list(_caches.items())}
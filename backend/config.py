@@ -1,25 +1,71 @@
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-def load_config(env_type: str):
-    """
-    Carrega o .env correto (leitura ou escrita) e retorna a URL do banco
-    e o tipo de ambiente.
-    """
+# DB_ASYNC=1 faz a API subir os routers de consulta assíncronos
+# (AsyncEngine com aiomysql; aiosqlite quando DB_URL for sqlite)
+USAR_ASYNC = os.getenv("DB_ASYNC", "0").strip().lower() in ("1", "true", "sim", "yes")
+
+# Réplicas de leitura (ver database.RoteadorLeitura)
+# DB_REPLICA_ESTRATEGIA = round_robin | menos_conexoes
+# DB_REPLICA_VERIFICAR  = de quantos em quantos segundos testar as réplicas
+# LEITURA_APOS_ESCRITA  = por quantos segundos, depois de uma escrita, as
+#                         consultas do mesmo cliente vão direto ao banco de escrita (0 desliga)
+REPLICA_ESTRATEGIA = os.getenv("DB_REPLICA_ESTRATEGIA", "round_robin").strip().lower()
+REPLICA_VERIFICAR = int(os.getenv("DB_REPLICA_VERIFICAR", "10"))
+LEITURA_APOS_ESCRITA = int(os.getenv("LEITURA_APOS_ESCRITA", "5"))
+
+# Valores padrão do pool de conexões. Podem ser sobrescritos no .env de cada
+# perfil (ex: DB_POOL_SIZE=10 no .env.leitura) ou por variável de ambiente.
+POOL_DEFAULTS = {
+    "DB_POOL_SIZE": 5,         # conexões mantidas abertas no pool
+    "DB_MAX_OVERFLOW": 10,     # conexões extras permitidas em pico
+    "DB_POOL_RECYCLE": 1800,   # segundos até reciclar uma conexão (evita timeout do MySQL)
+    "DB_POOL_TIMEOUT": 30,     # segundos esperando uma conexão livre antes de erro
+    "DB_POOL_PRE_PING": True,  # testa a conexão antes de usar (descarta conexões mortas)
+}
+
+
+def _env_path(env_type: str):
     # Garante que o caminho seja relativo à pasta do projeto
-    base_dir = os.path.dirname(os.path.abspath(__file__))  
-    dotenv_path = os.path.join(base_dir, "envs", f".env.{env_type}")
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "envs", f".env.{env_type}")
 
 
+def _read_env(env_type: str):
+    """
+    Lê o .env do perfil sem jogar os valores no os.environ.
+    Assim cada perfil (leitura, escrita, admin, powerbi) usa as próprias
+    credenciais, mesmo quando vários são carregados no mesmo processo.
+    """
+    dotenv_path = _env_path(env_type)
+
     if not os.path.exists(dotenv_path):
+        if os.getenv("DB_URL"):
+            # banco local (ex: benchmark.py com SQLite) dispensa os .env das credenciais
+            return dotenv_path, os.getenv
         raise FileNotFoundError(f"{dotenv_path} não encontrado")
 
-    load_dotenv(dotenv_path)
+    valores = dotenv_values(dotenv_path)
+    return dotenv_path, lambda chave: valores.get(chave) or os.getenv(chave)
+
+
+def load_config(env_type: str):
+    """
+    Carrega o .env correto (leitura ou escrita) e retorna a URL do banco
+    e o tipo de ambiente.
+    """
+    dotenv_path, getenv = _read_env(env_type)
+
+    # DB_URL (opcional) substitui a URL montada abaixo.
+    # Ex: DB_URL=sqlite:///./dogstock.db para rodar local sem o MySQL da AWS.
+    DB_URL = getenv("DB_URL")
+    if DB_URL:
+        return DB_URL, env_type
 
-    DB_HOST = os.getenv("DB_HOST")
-    DB_NAME = os.getenv("DB_NAME")
-    DB_USER = os.getenv("DB_USER")
-    DB_PASS = os.getenv("DB_PASS")
+    DB_HOST = getenv("DB_HOST")
+    DB_NAME = getenv("DB_NAME")
+    DB_USER = getenv("DB_USER")
+    DB_PASS = getenv("DB_PASS")
 
     if not all([DB_HOST, DB_NAME, DB_USER, DB_PASS]):
         raise ValueError(f"Alguma variável de {dotenv_path} não está definida corretamente.")
@@ -27,7 +73,48 @@ def load_config(env_type: str):
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
 
     return DATABASE_URL, env_type
-    print(f"[DEBUG] carregando env: {dotenv_path}")
 
 
+def load_pool_config(env_type: str):
+    """
+    Retorna as configurações do pool de conexões do perfil, já convertidas
+    para os tipos esperados pelo create_engine.
+    """
+    _, getenv = _read_env(env_type)
+
+    pool = {}
+    for chave, padrao in POOL_DEFAULTS.items():
+        valor = getenv(chave)
+        if valor is None:
+            pool[chave] = padrao
+        elif isinstance(padrao, bool):
+            pool[chave] = str(valor).strip().lower() in ("1", "true", "sim", "yes")
+        else:
+            pool[chave] = int(valor)
+
+    return pool
+
+
+def load_replicas(env_type: str = "leitura"):
+    """
+    URLs das réplicas de leitura do perfil (DB_REPLICAS no .env, separadas
+    por vírgula). Cada item pode ser só o host (mesmo usuário/senha/banco do
+    perfil) ou uma URL completa. Sem DB_REPLICAS retorna lista vazia.
+    """
+    _, getenv = _read_env(env_type)
+    replicas = [item.strip() for item in (getenv("DB_REPLICAS") or "").split(",") if item.strip()]
+    if not replicas:
+        return []
 
+    urls = []
+    for replica in replicas:
+        if "://" in replica:
+            urls.append(replica)
+            continue
+        DB_NAME = getenv("DB_NAME")
+        DB_USER = getenv("DB_USER")
+        DB_PASS = getenv("DB_PASS")
+        if not all([DB_NAME, DB_USER, DB_PASS]):
+            raise ValueError(f"Réplica '{replica}' informada só pelo host, mas faltam DB_NAME/DB_USER/DB_PASS do perfil {env_type}")
+        urls.append(f"mysql+pymysql://{DB_USER}:{DB_PASS}@{replica}/{DB_NAME}")
+    return urls
@@ -1,20 +1,347 @@
 # database.py
 
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+import warnings
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SAWarning, SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import load_config
+from config import (
+    load_config, load_pool_config, load_replicas,
+    REPLICA_ESTRATEGIA, REPLICA_VERIFICAR, LEITURA_APOS_ESCRITA,
+)
+from logger import get_router_logger
+
+# -------------------------------------------------------------------
+# Perfis de credencial disponíveis (cada um tem seu .env em envs/)
+# -------------------------------------------------------------------
+PERFIS = ("leitura", "escrita", "admin", "powerbi")
+
+# -------------------------------------------------------------------
+# Registro de engines do processo
+# Cada perfil ganha UMA engine (com seu pool de conexões) criada na
+# primeira vez que for usada. Depois disso todas as requisições
+# reaproveitam as conexões que já estão abertas no pool, em vez de
+# criar engine + conexão nova a cada GET.
+# -------------------------------------------------------------------
+_engines = {}
+_sessionmakers = {}
+_lock = threading.Lock()
+
+
+def engine_kwargs(perfil: str, url: str):
+    """
+    Parâmetros do pool para o create_engine (também usados pela engine async).
+    """
+    pool = load_pool_config(perfil)
+    if url.startswith("sqlite"):
+        # SQLite (testes locais) não usa pool por tamanho nem recycle
+        return {"pool_pre_ping": pool["DB_POOL_PRE_PING"]}
+    return {
+        "pool_size": pool["DB_POOL_SIZE"],
+        "max_overflow": pool["DB_MAX_OVERFLOW"],
+        "pool_recycle": pool["DB_POOL_RECYCLE"],
+        "pool_timeout": pool["DB_POOL_TIMEOUT"],
+        "pool_pre_ping": pool["DB_POOL_PRE_PING"],
+    }
+
+
+def get_engine(perfil: str = "escrita"):
+    """
+    Retorna a engine do perfil, criando-a (uma única vez) se necessário.
+    """
+    engine = _engines.get(perfil)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        # confere de novo: outra thread pode ter criado enquanto esperávamos o lock
+        engine = _engines.get(perfil)
+        if engine is None:
+            if perfil not in PERFIS:
+                raise ValueError(f"Perfil de banco desconhecido: {perfil}")
+
+            engine = _criar_engine(perfil, perfil, load_config(perfil)[0])
+
+    return engine
+
+
+def _criar_engine(chave: str, perfil: str, url: str):
+    # chamar com _lock; `chave` é o perfil ou "perfil@réplica"
+    engine = create_engine(url, **engine_kwargs(perfil, url))
+    _engines[chave] = engine
+    _sessionmakers[chave] = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    return engine
+
+
+def get_sessionmaker(perfil: str = "escrita"):
+    """
+    Retorna a fábrica de sessões ligada à engine do perfil
+    (aceita também as chaves das réplicas, ex: "leitura@1").
+    """
+    get_engine(perfil)
+    return _sessionmakers[perfil]
+
+
+def pool_stats():
+    """
+    Estatísticas dos pools já criados (perfis nunca usados não aparecem).
+    """
+    stats = {}
+    for perfil, engine in list(_engines.items()):
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue  # pool sem contagem (ex: SQLite em memória)
+        stats[perfil] = {
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "status": pool.status(),
+        }
+    return stats
+
+
+def criar_tabelas(perfil: str = "admin"):
+    """
+    Cria as tabelas declaradas nos models que ainda não existem no banco
+    (ex: tabelas auxiliares novas), as colunas novas de migracoes.py e os
+    índices declarados que ainda faltam nas tabelas que já existem.
+    """
+    import models  # registra todos os models no Base.metadata
+    import migracoes
+
+    engine = get_engine(perfil)
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    migracoes.aplicar(engine)  # colunas novas em tabelas que já existiam
+
+    insp = inspect(engine)
+    for tabela in Base.metadata.sorted_tables:
+        with warnings.catch_warnings():
+            # índices de expressão não são refletidos (só geram aviso)
+            warnings.simplefilter("ignore", SAWarning)
+            existentes = {indice["name"] for indice in insp.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name in existentes:
+                continue
+            try:
+                indice.create(bind=engine)
+            except SQLAlchemyError:
+                # já existe (índice de expressão não aparece na reflexão) ou o banco não suporta
+                pass
+
+
+def verificar_tabelas(perfil: str = "escrita"):
+    """
+    Confere se o banco tem todas as tabelas e colunas dos models (sem DDL).
+    Usado na subida da aplicação: se faltar algo, a subida falha pedindo
+    para rodar as migrações (python migracoes.py) com o perfil admin.
+    """
+    import models  # registra todos os models no Base.metadata
+
+    engine = get_engine(perfil)
+    dialeto = engine.dialect.name
+    if dialeto not in DIALETOS_SUPORTADOS:
+        raise RuntimeError(
+            f"Banco '{dialeto}' não suportado (use {' ou '.join(DIALETOS_SUPORTADOS)}): "
+            "as escritas dependem do upsert de cada banco"
+        )
+
+    insp = inspect(engine)
+    existentes = set(insp.get_table_names())
+    faltando = []
+    for tabela in Base.metadata.sorted_tables:
+        if tabela.name not in existentes:
+            faltando.append(tabela.name)
+            continue
+        colunas = {coluna["name"] for coluna in insp.get_columns(tabela.name)}
+        faltando += [f"{tabela.name}.{coluna.name}" for coluna in tabela.columns if coluna.name not in colunas]
+    if faltando:
+        raise RuntimeError(
+            f"Banco desatualizado (faltando: {', '.join(faltando)}). "
+            "Rode as migrações antes de subir a aplicação: python migracoes.py"
+        )
+
+
+# -------------------------------------------------------------------
+# Upsert (INSERT que vira UPDATE quando a chave já existe)
+# Usado por versao_tabela, log_alteracoes e bi_resumo_movimentacoes.
+# MySQL usa ON DUPLICATE KEY UPDATE e SQLite ON CONFLICT DO UPDATE; outros
+# bancos são recusados uma vez só, na subida (verificar_tabelas), e não
+# no meio de uma transação.
+# -------------------------------------------------------------------
+DIALETOS_SUPORTADOS = ("mysql", "sqlite")
+
+
+def upsert(db, tabela, chaves, set_):
+    """
+    Monta o INSERT com upsert para a tabela (Table ou model); os valores vão
+    no execute (uma linha ou executemany).
+    `chaves` são as colunas da chave única (o alvo do conflito no SQLite) e
+    `set_(novo)` devolve {coluna: expressão} para o UPDATE, onde `novo` é a
+    linha que se tentou inserir (inserted no MySQL, excluded no SQLite).
+    """
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(tabela)
+        return stmt.on_duplicate_key_update(set_(stmt.inserted))
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    stmt = sqlite_insert(tabela)
+    return stmt.on_conflict_do_update(index_elements=list(chaves), set_=set_(stmt.excluded))
+
+
+def dispose_engines():
+    """
+    Fecha todas as conexões de todos os pools (usado no shutdown da aplicação).
+    """
+    global _roteador, _roteador_carregado
+    if _roteador is not None:
+        _roteador.parar()
+    with _lock:
+        _roteador = None
+        _roteador_carregado = False
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _sessionmakers.clear()
+
 
 # -------------------------------------------------------------------
-# Carrega a URL do banco a partir do config (que lê o .env)
-# Aqui você escolhe qual ambiente (ex: "escrita", "leitura", etc.)
+# Réplicas de leitura
+# Com DB_REPLICAS no .env.leitura, as consultas se dividem entre o banco
+# de leitura principal e as réplicas (round robin ou a de menos conexões
+# em uso). Uma thread testa cada uma com SELECT 1 a cada
+# DB_REPLICA_VERIFICAR segundos; a que falhar sai da escolha até voltar.
+# Se todas falharem, as consultas ficam no banco de leitura principal.
 # -------------------------------------------------------------------
-DATABASE_URL = load_config("escrita")[0]   # retorna a URL do banco
+logger_replicas = get_router_logger("replicas", registro=False)
+
+
+class RoteadorLeitura:
+    def __init__(self, chaves, estrategia: str = REPLICA_ESTRATEGIA, intervalo: int = REPLICA_VERIFICAR):
+        self.chaves = list(chaves)               # chaves em _engines (a primeira é o principal)
+        self.estrategia = estrategia
+        self.intervalo = intervalo
+        self._saudaveis = set(self.chaves)
+        self._proxima = itertools.count()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def escolher(self) -> str:
+        candidatas = [chave for chave in self.chaves if chave in self._saudaveis] or self.chaves[:1]
+        if self.estrategia == "menos_conexoes":
+            return min(candidatas, key=self._em_uso)
+        return candidatas[next(self._proxima) % len(candidatas)]
+
+    @staticmethod
+    def _em_uso(chave) -> int:
+        # pools sem contagem (ex: SQLite em memória) contam como vazios
+        checkedout = getattr(_engines[chave].pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+    def verificar(self):
+        for chave in self.chaves:
+            engine = _engines.get(chave)
+            if engine is None:
+                continue
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except SQLAlchemyError as e:
+                if chave in self._saudaveis:
+                    logger_replicas.warning(
+                        "",
+                        extra={"ip": "N/A", "status": 503, "method": "N/A", "detail": f"Réplica de leitura {chave} fora do ar: {e}"}
+                    )
+                self._saudaveis.discard(chave)
+            else:
+                self._saudaveis.add(chave)
+
+    def status(self):
+        return {chave: chave in self._saudaveis for chave in self.chaves}
+
+    def iniciar(self):
+        if self.intervalo <= 0 or self._thread is not None:
+            return
+
+        def _loop():
+            while not self._parar.wait(self.intervalo):
+                self.verificar()
+
+        self._thread = threading.Thread(target=_loop, name="verifica-replicas", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+
+_roteador = None
+_roteador_carregado = False
+
+
+def get_roteador():
+    """Roteador das réplicas do perfil leitura (None se não houver DB_REPLICAS)."""
+    global _roteador, _roteador_carregado
+    if _roteador_carregado:
+        return _roteador
+
+    get_engine("leitura")
+    with _lock:
+        if not _roteador_carregado:
+            chaves = ["leitura"]
+            for i, url in enumerate(load_replicas("leitura"), start=1):
+                chave = f"leitura@{i}"
+                _criar_engine(chave, "leitura", url)
+                chaves.append(chave)
+            if len(chaves) > 1:
+                _roteador = RoteadorLeitura(chaves)
+                _roteador.iniciar()
+            _roteador_carregado = True
+    return _roteador
+
+
+def escolher_leitura() -> str:
+    """Chave da engine que deve atender a próxima consulta."""
+    roteador = get_roteador()
+    return roteador.escolher() if roteador is not None else "leitura"
+
 
 # -------------------------------------------------------------------
-# Cria a "engine" = a conexão com o banco em si
-# Ela é responsável por traduzir os comandos Python -> SQL real
+# Ler o que acabou de escrever
+# A réplica pode estar alguns instantes atrás do banco de escrita. Toda
+# requisição de registro marca o cliente com um cookie; enquanto ele vale
+# (LEITURA_APOS_ESCRITA segundos), as consultas desse cliente vão para o
+# banco de escrita e já enxergam o que foi gravado. Por ser cookie, vale
+# entre workers.
 # -------------------------------------------------------------------
-engine = create_engine(DATABASE_URL)
+COOKIE_ESCRITA = "ultima_escrita"
+
+
+def marcar_escrita(response: Response):
+    if LEITURA_APOS_ESCRITA > 0:
+        response.set_cookie(COOKIE_ESCRITA, str(int(time.time())), max_age=LEITURA_APOS_ESCRITA, httponly=True, samesite="lax")
+
+
+def escreveu_recentemente(request: Request) -> bool:
+    if LEITURA_APOS_ESCRITA <= 0:
+        return False
+    try:
+        return time.time() - int(request.cookies.get(COOKIE_ESCRITA, "0")) < LEITURA_APOS_ESCRITA
+    except ValueError:
+        return False
+
+
+# -------------------------------------------------------------------
+# Engine e SessionLocal padrão (perfil de escrita)
+# Mantidos para quem já importa `engine`/`SessionLocal` direto daqui.
+# -------------------------------------------------------------------
+engine = get_engine("escrita")
 
 # -------------------------------------------------------------------
 # Cria a "SessionLocal"
@@ -23,7 +350,7 @@ engine = create_engine(DATABASE_URL)
 # "autoflush=False" = não manda query automática antes da hora
 # "autocommit=False" = só confirma quando chamamos db.commit()
 # -------------------------------------------------------------------
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+SessionLocal = get_sessionmaker("escrita")
 
 # -------------------------------------------------------------------
 # Declarative Base
@@ -33,14 +360,43 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 # -------------------------------------------------------------------
-# Função de dependência do FastAPI
+# Funções de dependência do FastAPI
 # Toda vez que um endpoint precisar acessar o banco,
-# ele chama get_db(), que abre uma sessão e depois fecha.
+# ele pede a dependência do perfil certo, que abre uma sessão
+# no pool daquele perfil e depois fecha (devolvendo a conexão ao pool).
 # Assim não deixamos conexões penduradas.
 # -------------------------------------------------------------------
-def get_db():
-    db = SessionLocal()
+def db_dependency(perfil: str):
+    def _get_db():
+        db = get_sessionmaker(perfil)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    _get_db.__name__ = f"get_db_{perfil}"
+    return _get_db
+
+
+def get_db(response: Response):
+    """Sessão de escrita (registro: POST/PUT/DELETE); marca o cliente para ler do escritor."""
+    marcar_escrita(response)
+    db = get_sessionmaker("escrita")()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_db_leitura(request: Request):
+    """Sessão de consulta (GET): réplica escolhida pelo roteador, ou o escritor logo após uma escrita."""
+    chave = "escrita" if escreveu_recentemente(request) else escolher_leitura()
+    db = get_sessionmaker(chave)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+get_db_admin = db_dependency("admin")
+get_db_powerbi = db_dependency("powerbi")
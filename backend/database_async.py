@@ -0,0 +1,95 @@
+# database_async.py
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from config import load_config
+from database import PERFIS, engine_kwargs, escreveu_recentemente
+
+# -------------------------------------------------------------------
+# Acesso assíncrono ao banco (opcional, ligado com DB_ASYNC=1)
+# Mesma ideia do database.py: uma AsyncEngine (com pool) por perfil,
+# criada na primeira vez que for usada. A diferença é que enquanto
+# espera a resposta do MySQL a requisição libera o event loop, em vez
+# de ocupar uma thread do threadpool do Starlette (limitado a 40).
+# -------------------------------------------------------------------
+
+# driver síncrono -> driver assíncrono equivalente
+DRIVERS_ASYNC = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",   # para testes locais (DB_URL=sqlite:///...)
+}
+
+_engines = {}
+_sessionmakers = {}
+
+
+def async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS_ASYNC:
+        raise ValueError(f"Banco '{backend}' sem driver assíncrono configurado")
+    return url.set(drivername=DRIVERS_ASYNC[backend])
+
+
+def get_async_engine(perfil: str = "leitura"):
+    """
+    Retorna a AsyncEngine do perfil, criando-a (uma única vez) se necessário.
+    Só é chamada dentro do event loop, então não precisa de lock.
+    """
+    engine = _engines.get(perfil)
+    if engine is None:
+        if perfil not in PERFIS:
+            raise ValueError(f"Perfil de banco desconhecido: {perfil}")
+
+        DATABASE_URL = load_config(perfil)[0]
+        engine = create_async_engine(async_url(DATABASE_URL), **engine_kwargs(perfil, DATABASE_URL))
+        _engines[perfil] = engine
+        _sessionmakers[perfil] = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    return engine
+
+
+def get_async_sessionmaker(perfil: str = "leitura"):
+    get_async_engine(perfil)
+    return _sessionmakers[perfil]
+
+
+def async_pool_stats():
+    stats = {}
+    for perfil, engine in list(_engines.items()):
+        pool = engine.pool
+        stats[perfil] = {
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "status": pool.status(),
+        }
+    return stats
+
+
+async def dispose_async_engines():
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
+    _sessionmakers.clear()
+
+
+# -------------------------------------------------------------------
+# Dependências do FastAPI (versão async do get_db_leitura)
+# -------------------------------------------------------------------
+def async_db_dependency(perfil: str):
+    async def _get_db():
+        async with get_async_sessionmaker(perfil)() as db:
+            yield db
+
+    _get_db.__name__ = f"get_async_db_{perfil}"
+    return _get_db
+
+
+async def get_async_db_leitura(request: Request):
+    # logo depois de uma escrita do mesmo cliente lê do banco de escrita (ver database.escreveu_recentemente)
+    perfil = "escrita" if escreveu_recentemente(request) else "leitura"
+    async with get_async_sessionmaker(perfil)() as db:
+        yield db
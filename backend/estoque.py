@@ -0,0 +1,88 @@
+import unicodedata
+from collections import defaultdict
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+
+from models import Produto, TipoMovimentacao
+from eventos import publicar  # feed de alterações (/consulta/eventos)
+from alteracoes import registrar_linhas  # log do /consulta/changes
+
+# -------------------------------------------------------------------
+# Saldo de estoque (produtos.qtd_disponivel)
+# Toda movimentação registrada altera o saldo do produto na MESMA
+# transação. Assim o estoque atual é só ler a coluna, sem precisar
+# somar o histórico inteiro de movimentações. O sentido (entrada/saída)
+# é o tipo_movimentacao.sinal, cadastrado junto com o tipo.
+# -------------------------------------------------------------------
+
+def normalizar(texto: str) -> str:
+    """Remove acentos e deixa em minúsculas ('Saída' -> 'saida')."""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return sem_acento.strip().lower()
+
+
+def sinais_por_tipo(db) -> dict:
+    """tipo_mov_id -> +1 (entrada) / -1 (saída) / 0 (não altera o saldo)."""
+    return dict(db.execute(select(TipoMovimentacao.id, TipoMovimentacao.sinal)).all())
+
+
+def calcular_delta(db, tipo_mov_id: int, quantidade) -> Decimal:
+    """
+    Quanto a movimentação soma (entrada) ou subtrai (saída) do saldo do produto,
+    pelo sinal cadastrado no tipo de movimentação.
+    """
+    sinal = db.scalar(select(TipoMovimentacao.sinal).where(TipoMovimentacao.id == tipo_mov_id))
+    if sinal is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipo de movimentação com ID {tipo_mov_id} não encontrado"
+        )
+    return sinal * Decimal(quantidade)
+
+
+def aplicar_deltas(db, deltas: dict):
+    """
+    Aplica {produto_id: delta} nos saldos dos produtos.
+
+    Os produtos são travados com SELECT ... FOR UPDATE (sempre na ordem do id,
+    para duas transações concorrentes não se travarem mutuamente) e o saldo é
+    alterado na sessão atual. Quem chama é responsável pelo commit/rollback.
+    """
+    deltas = {produto_id: delta for produto_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    produtos = (
+        db.query(Produto)
+        .filter(Produto.id.in_(deltas.keys()))
+        .order_by(Produto.id)
+        .with_for_update()
+        .all()
+    )
+    encontrados = {produto.id: produto for produto in produtos}
+
+    faltando = sorted(set(deltas) - set(encontrados))
+    if faltando:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Produto(s) com ID {', '.join(map(str, faltando))} não encontrado(s)"
+        )
+
+    for produto_id, delta in deltas.items():
+        produto = encontrados[produto_id]
+        produto.qtd_disponivel = Decimal(produto.qtd_disponivel or 0) + delta
+
+    # saldo novo no feed de alterações (só é enviado se a transação for confirmada)
+    publicar(db, "estoque.saldo", {"saldos": [
+        {"produto_id": produto_id, "qtd_disponivel": encontrados[produto_id].qtd_disponivel}
+        for produto_id in sorted(deltas)
+    ]})
+    registrar_linhas(db, "produtos", sorted(deltas))   # e no log do /consulta/changes
+    return encontrados
+
+
+def novo_acumulador():
+    """Dicionário produto_id -> delta que já começa em zero."""
+    return defaultdict(Decimal)
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# -------------------------------------------------------------------
+# Feed de alterações (SSE / WebSocket)
+# Os routers de registro chamam publicar(db, tipo, dados) antes do commit;
+# os eventos ficam guardados na sessão e só vão para o broker depois que
+# o commit deu certo (rollback descarta). O broker é em memória, por
+# processo: com vários workers, cada um avisa os seus assinantes das
+# escritas que ele mesmo fez.
+#
+# Assinante parado não custa nada: todos esperam no MESMO asyncio.Event,
+# que é trocado a cada publicação (publicar é O(1), sem uma fila por
+# assinante). Acordado, cada um lê do histórico o que veio depois do
+# último id que enviou, então o histórico também serve para retomar a
+# conexão (Last-Event-ID). Se o cliente ficou para trás mais do que
+# EVENTOS_HISTORICO eventos, recebe um "reset" e deve recarregar as listas.
+#
+# Tipos: produto.criado | produto.atualizado | produto.removido
+#        movimentacao.registrada | movimentacao.atualizada |
+#        movimentacao.removida | movimentacao.lote | estoque.saldo
+# -------------------------------------------------------------------
+HISTORICO = int(os.getenv("EVENTOS_HISTORICO", "1000"))
+HEARTBEAT = float(os.getenv("EVENTOS_HEARTBEAT", "15"))   # segundos sem evento até mandar um ping
+
+
+class Evento(NamedTuple):
+    id: int
+    tipo: str
+    dados: dict
+
+
+class Broker:
+    def __init__(self, historico: int = HISTORICO):
+        self._lock = threading.Lock()
+        self._eventos = deque(maxlen=historico)
+        # ids começam no relógio (ms) para continuarem crescendo depois de um
+        # restart: um Last-Event-ID de antes do restart cai no "reset"
+        self._ultimo_id = int(time.time() * 1000)
+        self._primeiro_id = self._ultimo_id + 1
+        self._loop = None
+        self._novo = None    # asyncio.Event da espera atual (só mexido na thread do loop)
+        self.assinantes = 0
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    def publicar(self, tipo: str, dados: dict) -> Evento:
+        """Pode ser chamado de qualquer thread (os routers síncronos rodam no threadpool)."""
+        with self._lock:
+            self._ultimo_id += 1
+            evento = Evento(self._ultimo_id, tipo, dados)
+            self._eventos.append(evento)
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._acordar)
+        return evento
+
+    def _acordar(self):
+        if self._novo is not None:
+            self._novo.set()
+            self._novo = None
+
+    def desde(self, ultimo_id: int):
+        """
+        Eventos com id > ultimo_id. None se alguns deles já saíram do
+        histórico (ou o id é de outro processo/restart): o cliente precisa recarregar.
+        """
+        with self._lock:
+            if ultimo_id == self._ultimo_id:
+                return []
+            primeiro = self._eventos[0].id if self._eventos else self._primeiro_id
+            if ultimo_id > self._ultimo_id or ultimo_id < primeiro - 1:
+                return None
+            # ids são consecutivos: a posição no deque sai da conta
+            return list(islice(self._eventos, ultimo_id - primeiro + 1, None))
+
+    async def _esperar(self, timeout: float) -> bool:
+        if self._novo is None:
+            self._novo = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._novo.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def assinar(self, ultimo_id: int = None, heartbeat: float = HEARTBEAT):
+        """
+        Gerador assíncrono com os eventos a partir de ultimo_id (None = só os
+        novos). Devolve None quando passa `heartbeat` segundos sem nada.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._novo = loop, None   # o Event antigo é de outro loop
+        if ultimo_id is None:
+            ultimo_id = self.ultimo_id
+        self.assinantes += 1
+        try:
+            while True:
+                eventos = self.desde(ultimo_id)
+                if eventos is None:
+                    ultimo_id = self.ultimo_id
+                    yield Evento(ultimo_id, "reset", {"motivo": "eventos fora do histórico, recarregue as listas"})
+                    continue
+                for evento in eventos:
+                    ultimo_id = evento.id
+                    yield evento
+                if not eventos and not await self._esperar(heartbeat):
+                    yield None
+        finally:
+            self.assinantes -= 1
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ultimo_id": self._ultimo_id,
+                "no_historico": len(self._eventos),
+                "historico_maximo": self._eventos.maxlen,
+                "assinantes": self.assinantes,
+            }
+
+
+broker = Broker()
+
+
+# -------------------------------------------------------------------
+# Publicação junto com a transação
+# -------------------------------------------------------------------
+def publicar(db: Session, tipo: str, dados: dict):
+    """Agenda o evento para depois do commit da sessão (chamar antes do commit)."""
+    db.info.setdefault("eventos_pendentes", []).append((tipo, dados))
+
+
+@event.listens_for(Session, "after_commit")
+def _publicar_apos_commit(session):
+    for tipo, dados in session.info.pop("eventos_pendentes", ()):
+        broker.publicar(tipo, dados)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_apos_rollback(session):
+    session.info.pop("eventos_pendentes", None)
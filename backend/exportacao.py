@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from serializacao import decimal_json
+
+# -------------------------------------------------------------------
+# Exportação em streaming (NDJSON / CSV)
+# Em vez de fazer fetchall() e montar uma lista gigante na memória,
+# o banco devolve as linhas aos poucos (cursor no servidor) e cada lote
+# já é enviado ao cliente. A memória fica constante e o primeiro byte
+# chega logo, mesmo em tabelas grandes (ex: carga do Power BI).
+# -------------------------------------------------------------------
+FORMATOS = ("ndjson", "csv")
+FORMATO_PATTERN = "^(json|ndjson|csv)$"   # usado no Query(...) dos routers
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+TAMANHO_LOTE = 1000  # linhas buscadas do banco por vez
+
+
+def _json_default(valor):
+    # mesmo resultado que as listagens em JSON (serializacao)
+    if isinstance(valor, Decimal):
+        return decimal_json(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _linhas_ndjson(colunas, lote):
+    return "".join(
+        json.dumps(dict(zip(colunas, row)), default=_json_default, ensure_ascii=False) + "\n"
+        for row in lote
+    )
+
+
+def _linhas_csv(lote, cabecalho=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if cabecalho:
+        writer.writerow(cabecalho)
+    writer.writerows(lote)
+    return buffer.getvalue()
+
+
+def _statement(sql):
+    # SQL em texto ou um select() já montado (leitor.py)
+    return text(sql) if isinstance(sql, str) else sql
+
+
+def stream_query(sql, params: dict, formato: str, nome: str, db):
+    """
+    Executa a query com cursor no servidor (stream_results) e devolve um
+    StreamingResponse no formato pedido.
+
+    db é a sessão da dependência do router: só a engine dela é usada, então a
+    exportação vai para o mesmo banco que a consulta normal iria (réplica
+    escolhida pelo roteador, escritor logo depois de uma escrita do cliente,
+    powerbi no BI). A conexão é aberta dentro do gerador, porque a sessão da
+    dependência é fechada antes do corpo ser enviado.
+    """
+    engine = db.get_bind()
+
+    def gerar():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=TAMANHO_LOTE).execute(_statement(sql), params)
+            colunas = list(result.keys())
+
+            primeiro = True
+            for lote in result.partitions():
+                if formato == "csv":
+                    yield _linhas_csv(lote, colunas if primeiro else None)
+                else:
+                    yield _linhas_ndjson(colunas, lote)
+                primeiro = False
+
+            # tabela vazia: o CSV ainda leva o cabeçalho
+            if primeiro and formato == "csv":
+                yield _linhas_csv([], colunas)
+
+    return _resposta(gerar(), formato, nome)
+
+
+def stream_query_async(sql, params: dict, formato: str, nome: str, db):
+    """
+    Mesmo que stream_query, usando a AsyncEngine da AsyncSession do router
+    (routers de consulta async): enquanto espera o próximo lote do banco o
+    event loop fica livre.
+    """
+    engine = db.bind
+
+    async def gerar():
+        async with engine.connect() as conn:
+            result = await conn.stream(_statement(sql), params, execution_options={"yield_per": TAMANHO_LOTE})
+            colunas = list(result.keys())
+
+            primeiro = True
+            async for lote in result.partitions():
+                if formato == "csv":
+                    yield _linhas_csv(lote, colunas if primeiro else None)
+                else:
+                    yield _linhas_ndjson(colunas, lote)
+                primeiro = False
+
+            if primeiro and formato == "csv":
+                yield _linhas_csv([], colunas)
+
+    return _resposta(gerar(), formato, nome)
+
+
+def _resposta(gerador, formato: str, nome: str):
+    headers = {}
+    if formato == "csv":
+        headers["Content-Disposition"] = f'attachment; filename="{nome}.csv"'
+
+    return StreamingResponse(gerador, media_type=MEDIA_TYPES[formato], headers=headers)
@@ -0,0 +1,128 @@
+import re
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, update, select, exists, literal
+from sqlalchemy.exc import IntegrityError
+
+from models import Produto, TipoMovimentacao, Fornecedores, TipoPagamento
+
+# -------------------------------------------------------------------
+# Escritas com uma ida ao banco
+# A unicidade (nome do produto, razão social, descrição...) fica a cargo
+# das constraints UNIQUE do banco: o INSERT/UPDATE é feito direto e, se
+# violar alguma, o IntegrityError vira 409 (duplicado) ou 400 (chave
+# estrangeira inexistente). Sem o SELECT de verificação antes (que além
+# de custar uma ida ao banco não impede duas requisições simultâneas de
+# passarem juntas) e sem o refresh depois: o id vem do próprio INSERT.
+# -------------------------------------------------------------------
+_DUPLICADO_MYSQL = 1062
+_FK_MYSQL = (1451, 1452)
+
+# de onde tirar a coluna na mensagem de erro de cada banco
+_CAMPO_DUPLICADO = (
+    re.compile(r"for key '(?:[\w$]+\.)?([\w$]+)'"),                  # MySQL: Duplicate entry 'x' for key 'produtos.nome'
+    re.compile(r"UNIQUE constraint failed: [\w$]+\.([\w$]+)"),       # SQLite
+)
+_CAMPO_FK = re.compile(r"FOREIGN KEY \(`?([\w$]+)`?\)")               # MySQL: ... FOREIGN KEY (`categoria_id`) REFERENCES ...
+
+
+def _codigo_mysql(e: IntegrityError):
+    args = getattr(e.orig, "args", ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def erro_de_integridade(e: IntegrityError, entidade: str, valores: dict) -> HTTPException:
+    """
+    Converte o IntegrityError de um INSERT/UPDATE na resposta HTTP:
+    409 para valor duplicado em coluna UNIQUE, 400 para chave estrangeira
+    inexistente (ou em uso, no DELETE) e 400 para o resto (NOT NULL etc).
+    """
+    codigo = _codigo_mysql(e)
+    mensagem = str(e.orig)
+
+    if codigo == _DUPLICADO_MYSQL or "UNIQUE constraint" in mensagem or "Duplicate entry" in mensagem:
+        campo = next((m.group(1) for regex in _CAMPO_DUPLICADO if (m := regex.search(mensagem))), None)
+        if campo in valores:
+            detalhe = f"{entidade} com {campo} '{valores[campo]}' já existe"
+        else:
+            detalhe = f"{entidade} já existe"
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detalhe)
+
+    if codigo in _FK_MYSQL or "FOREIGN KEY constraint" in mensagem:
+        m = _CAMPO_FK.search(mensagem)
+        if m and m.group(1) in valores:
+            detalhe = f"{entidade}: {m.group(1)} {valores[m.group(1)]} não encontrado"
+        else:
+            detalhe = f"{entidade}: registro relacionado não encontrado ou em uso"
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detalhe)
+
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{entidade}: dados inválidos ({mensagem})")
+
+
+def inserir(db, modelo, valores: dict) -> int:
+    """
+    INSERT de uma linha devolvendo o id gerado. O SQLAlchemy usa RETURNING
+    onde o banco suporta (SQLite, MariaDB) e o lastrowid do cursor no MySQL,
+    então não precisa de SELECT depois (db.refresh).
+    """
+    resultado = db.execute(insert(modelo.__table__).values(**valores))
+    return resultado.inserted_primary_key[0]
+
+
+def atualizar(db, modelo, id_, valores: dict) -> bool:
+    """
+    UPDATE ... WHERE id = :id direto, sem carregar a linha antes.
+    Retorna False se o id não existe (no MySQL o driver conta as linhas
+    encontradas, não só as alteradas, então reenviar os mesmos valores é True).
+    """
+    tabela = modelo.__table__
+    resultado = db.execute(update(tabela).where(tabela.c.id == id_).values(**valores))
+    return resultado.rowcount > 0
+
+
+# -------------------------------------------------------------------
+# Movimentações: todas as chaves estrangeiras numa query só
+# -------------------------------------------------------------------
+def converter_data(valor) -> datetime:
+    """
+    Data da movimentação (texto ISO vindo do schema) como datetime, que é o
+    que a coluna TIMESTAMP espera. Levanta ValueError se o texto for inválido.
+    """
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor).strip())
+
+
+def validar_referencias(db, mov) -> int:
+    """
+    Confere produto, tipo de movimentação, fornecedor e tipo de pagamento da
+    movimentação com um único SELECT (um subselect por tabela) e devolve o
+    sinal do tipo de movimentação (+1 entrada, -1 saída, 0 não altera o saldo).
+    Levanta 400 listando todas as referências inexistentes.
+    """
+    def _existe(modelo, id_):
+        if id_ is None:
+            return literal(True)
+        return exists().where(modelo.id == id_)
+
+    linha = db.execute(select(
+        _existe(Produto, mov.produto_id).label("produto"),
+        select(TipoMovimentacao.sinal).where(TipoMovimentacao.id == mov.tipo_mov_id).scalar_subquery().label("tipo_mov"),
+        _existe(Fornecedores, mov.fornecedor_id).label("fornecedor"),
+        _existe(TipoPagamento, mov.tipo_pag_id).label("tipo_pag"),
+    )).one()
+
+    erros = []
+    if not linha.produto:
+        erros.append(f"Produto com ID {mov.produto_id} não encontrado")
+    if linha.tipo_mov is None:
+        erros.append(f"Tipo de movimentação com ID {mov.tipo_mov_id} não encontrado")
+    if not linha.fornecedor:
+        erros.append(f"Fornecedor com ID {mov.fornecedor_id} não encontrado")
+    if not linha.tipo_pag:
+        erros.append(f"Tipo de pagamento com ID {mov.tipo_pag_id} não encontrado")
+    if erros:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="; ".join(erros))
+
+    return linha.tipo_mov
@@ -0,0 +1,463 @@
+import base64
+import operator
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple, Optional
+
+import orjson
+from fastapi import HTTPException, Request, Query
+from sqlalchemy import and_, or_, select, func, bindparam, String
+
+# -------------------------------------------------------------------
+# Leitor de tabelas (listagens do /consulta)
+# Todas as listagens de tabela passam por aqui em vez de cada router
+# montar o seu "SELECT * ... ORDER BY". A URL aceita:
+#   ?filter[campo]=valor  ?filter[campo][op]=valor   (só campos liberados)
+#       op: eq, ne, gt, gte, lt, lte, in (a,b,c), like (contém), null (true/false)
+#   ?sort=-data,id        (só campos liberados; o id sempre fecha a ordem)
+#   ?fields=id,nome       (só essas colunas são lidas e serializadas)
+#   ?limite=100&offset=200  ou  ?limite=100&cursor=...   (offset ou keyset)
+#   ?total=true           (COUNT(*) com os mesmos filtros, no X-Total-Count)
+# Com limite, se houver mais linhas o cursor da próxima página vai no
+# header X-Proximo-Cursor (o corpo continua sendo a lista de sempre).
+# Na exportação (formato=ndjson/csv) o corpo sai em streaming, sem esses
+# headers: só limite/offset valem, e cursor/total dão 400.
+#
+# O SELECT montado é guardado por "forma" da consulta (campos, filtros e
+# operadores, ordem, tipo de paginação); os valores vão sempre como
+# parâmetros, então a mesma forma com outros valores reaproveita o
+# statement pronto (e o SQL compilado que o SQLAlchemy guarda para ele).
+# -------------------------------------------------------------------
+LIMITE_MAXIMO = 1000         # linhas por página
+MAXIMO_VALORES_IN = 500      # valores em filter[campo][in]
+TAMANHO_CACHE_SQL = 256      # formas de consulta guardadas por tabela
+
+OPERADORES = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+OPERADORES_ESPECIAIS = ("in", "like", "null")
+
+FILTRO_URL = re.compile(r"^filter\[(\w+)\](?:\[(\w+)\])?$")
+
+
+class Relacao(NamedTuple):
+    tabela: object     # tabela relacionada (com alias), entra por LEFT JOIN
+    condicao: object   # ON do JOIN
+    campos: dict       # campo devolvido -> coluna da tabela relacionada
+
+
+class Parametros(NamedTuple):
+    """Parâmetros da URL como vieram (validados depois, pelo leitor da tabela)."""
+    filtros: tuple = ()            # ((campo, operador, valor), ...)
+    sort: Optional[str] = None
+    fields: Optional[str] = None
+    limite: Optional[int] = None
+    offset: int = 0
+    cursor: Optional[str] = None
+    total: bool = False
+
+
+class Consulta(NamedTuple):
+    campos: tuple      # campos devolvidos, na ordem
+    filtros: tuple     # ((campo, operador, valor já convertido), ...)
+    ordem: tuple       # ((campo, desc), ...), sempre terminando no id
+    limite: Optional[int]
+    offset: int
+    cursor: Optional[tuple]
+    total: bool
+    padrao: bool       # sem nada na URL: a listagem de sempre (pode sair do cache)
+
+
+class Pagina(NamedTuple):
+    linhas: list
+    campos: tuple
+    total: Optional[int]
+    proximo_cursor: Optional[str]
+
+
+def parametros_leitura(
+    request: Request,
+    sort: Optional[str] = Query(None, description="Ordenação, ex: -data,id (- = decrescente)"),
+    fields: Optional[str] = Query(None, description="Campos devolvidos, separados por vírgula"),
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO, description="Máximo de linhas (sem limite = todas)"),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Proximo-Cursor da página anterior"),
+    total: bool = Query(False, description="Devolve o total de linhas (com os filtros) no X-Total-Count"),
+) -> Parametros:
+    """Dependência dos routers de consulta: lê os parâmetros do leitor (filter[...] vem da query string)."""
+    return Parametros(filtros_da_url(request), sort, fields, limite, offset, cursor, total)
+
+
+def filtros_da_url(request: Request) -> tuple:
+    filtros = []
+    for chave, valor in request.query_params.multi_items():
+        if not chave.startswith("filter"):
+            continue
+        encontrado = FILTRO_URL.match(chave)
+        if not encontrado:
+            raise HTTPException(status_code=400, detail=f"Filtro inválido: '{chave}' (use filter[campo] ou filter[campo][op])")
+        filtros.append((encontrado.group(1), encontrado.group(2) or "eq", valor))
+    return tuple(filtros)
+
+
+def aplicar_cabecalhos(response, pagina: Pagina):
+    """Total e próximo cursor vão nos headers, para o corpo ser a mesma lista de sempre."""
+    if pagina.total is not None:
+        response.headers["X-Total-Count"] = str(pagina.total)
+    if pagina.proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = pagina.proximo_cursor
+
+
+def _lista(texto: Optional[str]):
+    return [parte.strip() for parte in (texto or "").split(",") if parte.strip()]
+
+
+def _converter(campo: str, coluna, valor):
+    """Texto da URL -> valor no tipo da coluna (400 se não converter)."""
+    if not isinstance(valor, str):
+        return valor   # já veio tipado (parâmetro declarado no router)
+    tipo = coluna.type.python_type
+    try:
+        if tipo is bool:
+            if valor.lower() not in ("true", "false", "1", "0"):
+                raise ValueError(valor)
+            return valor.lower() in ("true", "1")
+        if tipo is datetime:
+            return datetime.fromisoformat(valor)
+        if tipo is date:
+            return date.fromisoformat(valor)
+        if tipo is Decimal:
+            numero = Decimal(valor)
+            if not numero.is_finite():
+                raise ValueError(valor)
+            return numero
+        if tipo is int:
+            return int(valor)
+        return valor
+    except (ValueError, InvalidOperation):
+        raise HTTPException(status_code=400, detail=f"Valor inválido para {campo}: '{valor}'")
+
+
+def _escapar_like(texto: str) -> str:
+    return "%" + texto.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+
+
+def _cursor_default(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)   # sem passar por float: o keyset compara o valor exato
+    raise TypeError(f"Tipo não serializável no cursor: {type(valor).__name__}")
+
+
+class LeitorTabela:
+    """
+    Leitura de uma tabela com filtros, ordenação, campos e paginação da URL.
+
+    campos: colunas devolvidas por padrão (os nomes que o JS usa)
+    ordem: ordenação padrão, no formato do ?sort=
+    filtros / ordenacao: campos liberados em filter[...] e em sort
+        (só os que têm índice; ordenação só em colunas NOT NULL, por causa do keyset)
+    relacoes: tabelas ligadas por LEFT JOIN, cujos campos podem ser pedidos
+        em fields (ou por ?expand=, no router)
+    """
+
+    def __init__(self, tabela, campos, ordem="id", filtros=(), ordenacao=(), relacoes=None):
+        self.tabela = tabela
+        self.campos = tuple(campos)
+        self.relacoes = relacoes or {}
+        self.colunas = {campo: tabela.c[campo] for campo in self.campos}
+        self._relacao_do_campo = {}
+        for nome, relacao in self.relacoes.items():
+            for campo, coluna in relacao.campos.items():
+                self.colunas[campo] = coluna
+                self._relacao_do_campo[campo] = nome
+        self.filtraveis = tuple(filtros)
+        self.ordenaveis = tuple(dict.fromkeys(("id",) + tuple(ordenacao)))
+        for campo in self.ordenaveis:
+            if self.colunas[campo].nullable:
+                raise ValueError(f"{tabela.name}.{campo} aceita NULL e não pode ser usado na ordenação (keyset)")
+        self.ordem_padrao = self._ordem(ordem)
+        self._statements = OrderedDict()
+        self._trava = threading.Lock()
+
+    # ---------------------------------------------------------------
+    # Validação dos parâmetros
+    # ---------------------------------------------------------------
+    def consulta(self, parametros: Parametros = Parametros(), filtros=(), expansoes=(), exportacao: bool = False) -> Consulta:
+        """
+        Valida os parâmetros contra os campos liberados (400 no que não for).
+        filtros: filtros extras já tipados, ex: (("produto_id", "eq", 3),)
+        expansoes: relações que entram nos campos padrão (?expand=)
+        exportacao: formato ndjson/csv (ver montar_exportacao)
+        """
+        if exportacao and (parametros.cursor or parametros.total):
+            raise HTTPException(
+                status_code=400,
+                detail="Na exportação (ndjson/csv) não há X-Total-Count nem X-Proximo-Cursor: use limite/offset, sem total nem cursor"
+            )
+        if parametros.fields:
+            campos = tuple(dict.fromkeys(_lista(parametros.fields)))
+            invalidos = [campo for campo in campos if campo not in self.colunas]
+            if invalidos:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Campo(s) inválido(s) em fields: {', '.join(invalidos)}. Use: {', '.join(self.colunas)}"
+                )
+        else:
+            campos = self.campos + tuple(
+                campo for nome in expansoes for campo in self.relacoes[nome].campos
+            )
+
+        filtros_validos = tuple(
+            self._filtro(campo, operador, valor)
+            for campo, operador, valor in tuple(filtros) + parametros.filtros
+        )
+        ordem = self._ordem(parametros.sort) if parametros.sort else self.ordem_padrao
+
+        if parametros.cursor and parametros.offset:
+            raise HTTPException(status_code=400, detail="Use cursor ou offset, não os dois")
+        cursor = self._decodificar_cursor(parametros.cursor, ordem) if parametros.cursor else None
+
+        padrao = not (
+            parametros.fields or filtros_validos or parametros.sort or parametros.limite
+            or parametros.offset or cursor or parametros.total or expansoes
+        )
+        return Consulta(campos, filtros_validos, ordem, parametros.limite, parametros.offset, cursor, parametros.total, padrao)
+
+    def _filtro(self, campo, operador, valor):
+        if campo not in self.filtraveis:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Filtro não permitido: {campo}. Use: {', '.join(self.filtraveis)}"
+            )
+        if operador not in OPERADORES and operador not in OPERADORES_ESPECIAIS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Operador inválido em filter[{campo}]: {operador}. Use: {', '.join((*OPERADORES, *OPERADORES_ESPECIAIS))}"
+            )
+        coluna = self.colunas[campo]
+        if operador == "null":
+            if str(valor).lower() not in ("true", "false", "1", "0"):
+                raise HTTPException(status_code=400, detail=f"filter[{campo}][null] aceita true ou false")
+            return campo, operador, str(valor).lower() in ("true", "1")
+        if operador == "like":
+            if not isinstance(coluna.type, String):
+                raise HTTPException(status_code=400, detail=f"filter[{campo}][like] só vale para campos de texto")
+            return campo, operador, _escapar_like(valor)
+        if operador == "in":
+            valores = _lista(valor)
+            if not valores or len(valores) > MAXIMO_VALORES_IN:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"filter[{campo}][in] aceita de 1 a {MAXIMO_VALORES_IN} valores separados por vírgula"
+                )
+            return campo, operador, [_converter(campo, coluna, item) for item in valores]
+        return campo, operador, _converter(campo, coluna, valor)
+
+    def _ordem(self, sort: str):
+        ordem = []
+        for item in _lista(sort):
+            desc = item.startswith("-")
+            campo = item.lstrip("+-")
+            if campo not in self.ordenaveis:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Ordenação não permitida: {campo}. Use: {', '.join(self.ordenaveis)}"
+                )
+            if campo not in (c for c, _ in ordem):
+                ordem.append((campo, desc))
+        if not ordem:
+            raise HTTPException(status_code=400, detail="sort vazio")
+        if "id" not in (campo for campo, _ in ordem):
+            # desempate pelo id, no mesmo sentido do primeiro campo (usa o índice (campo, id) inteiro)
+            ordem.append(("id", ordem[0][1]))
+        return tuple(ordem)
+
+    # ---------------------------------------------------------------
+    # Cursor (keyset): valores da ordenação na última linha da página
+    # ---------------------------------------------------------------
+    def _codificar_cursor(self, linha, ordem) -> str:
+        valores = [getattr(linha, campo) for campo, _ in ordem]
+        return base64.urlsafe_b64encode(orjson.dumps(valores, default=_cursor_default)).decode()
+
+    def _decodificar_cursor(self, cursor: str, ordem):
+        try:
+            valores = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(valores, list) or len(valores) != len(ordem):
+                raise ValueError(cursor)
+            return tuple(
+                _converter(campo, self.colunas[campo], valor if isinstance(valor, int) else str(valor))
+                for (campo, _), valor in zip(ordem, valores)
+            )
+        except (ValueError, HTTPException):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido (ou de outra ordenação)")
+
+    # ---------------------------------------------------------------
+    # Montagem dos statements (guardados por forma da consulta)
+    # ---------------------------------------------------------------
+    def _guardado(self, forma, montar):
+        with self._trava:
+            stmt = self._statements.get(forma)
+            if stmt is not None:
+                self._statements.move_to_end(forma)
+                return stmt
+        stmt = montar()
+        with self._trava:
+            self._statements[forma] = stmt
+            while len(self._statements) > TAMANHO_CACHE_SQL:
+                self._statements.popitem(last=False)
+        return stmt
+
+    def _forma_filtros(self, consulta: Consulta):
+        # o valor só muda o SQL no null (IS NULL / IS NOT NULL); nos demais vira parâmetro
+        return tuple(
+            (campo, operador, valor if operador == "null" else None)
+            for campo, operador, valor in consulta.filtros
+        )
+
+    def _origem(self, campos):
+        # LEFT JOIN só das relações que a consulta usa
+        usadas = dict.fromkeys(
+            self._relacao_do_campo[campo] for campo in campos if campo in self._relacao_do_campo
+        )
+        origem = self.tabela
+        for nome in usadas:
+            relacao = self.relacoes[nome]
+            origem = origem.outerjoin(relacao.tabela, relacao.condicao)
+        return origem
+
+    def _condicoes(self, forma_filtros):
+        condicoes = []
+        for i, (campo, operador, nulo) in enumerate(forma_filtros):
+            coluna = self.colunas[campo]
+            if operador == "null":
+                condicoes.append(coluna.is_(None) if nulo else coluna.is_not(None))
+            elif operador == "in":
+                condicoes.append(coluna.in_(bindparam(f"f{i}", expanding=True, type_=coluna.type)))
+            elif operador == "like":
+                condicoes.append(coluna.like(bindparam(f"f{i}", type_=String()), escape="/"))
+            else:
+                condicoes.append(OPERADORES[operador](coluna, bindparam(f"f{i}", type_=coluna.type)))
+        return condicoes
+
+    def _depois_do_cursor(self, ordem):
+        # (a, b, id) depois de (x, y, z): a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        valores = [bindparam(f"c{i}", type_=self.colunas[campo].type) for i, (campo, _) in enumerate(ordem)]
+        alternativas = []
+        for i, (campo, desc) in enumerate(ordem):
+            coluna = self.colunas[campo]
+            iguais = [self.colunas[ordem[j][0]] == valores[j] for j in range(i)]
+            alternativas.append(and_(*iguais, coluna < valores[i] if desc else coluna > valores[i]))
+        return or_(*alternativas)
+
+    def _montar_select(self, forma, colunas_do_cursor: bool = True):
+        campos, forma_filtros, ordem, com_limite, com_offset, com_cursor = forma
+        selecionados = list(campos)
+        if com_limite and colunas_do_cursor:
+            # o cursor da próxima página sai da última linha: precisa das colunas da ordenação
+            selecionados += [campo for campo, _ in ordem if campo not in campos]
+        usados = selecionados + [campo for campo, _, _ in forma_filtros] + [campo for campo, _ in ordem]
+
+        stmt = select(*(self.colunas[campo].label(campo) for campo in selecionados)).select_from(self._origem(usados))
+        condicoes = self._condicoes(forma_filtros)
+        if com_cursor:
+            condicoes.append(self._depois_do_cursor(ordem))
+        if condicoes:
+            stmt = stmt.where(*condicoes)
+        stmt = stmt.order_by(*(
+            self.colunas[campo].desc() if desc else self.colunas[campo].asc() for campo, desc in ordem
+        ))
+        if com_limite:
+            stmt = stmt.limit(bindparam("limite"))
+        if com_offset:
+            stmt = stmt.offset(bindparam("offset"))
+        return stmt
+
+    def _montar_total(self, forma_filtros):
+        origem = self._origem([campo for campo, _, _ in forma_filtros])
+        stmt = select(func.count()).select_from(origem)
+        condicoes = self._condicoes(forma_filtros)
+        return stmt.where(*condicoes) if condicoes else stmt
+
+    def _valores_filtros(self, consulta: Consulta) -> dict:
+        return {
+            f"f{i}": valor
+            for i, (_, operador, valor) in enumerate(consulta.filtros)
+            if operador != "null"
+        }
+
+    def montar(self, consulta: Consulta):
+        """(statement, parâmetros) da listagem. Com limite busca uma linha a mais (existe próxima página?)."""
+        forma = (
+            consulta.campos, self._forma_filtros(consulta), consulta.ordem,
+            consulta.limite is not None, consulta.offset > 0, consulta.cursor is not None,
+        )
+        stmt = self._guardado(forma, lambda: self._montar_select(forma))
+
+        params = self._valores_filtros(consulta)
+        if consulta.cursor is not None:
+            params.update({f"c{i}": valor for i, valor in enumerate(consulta.cursor)})
+        if consulta.limite is not None:
+            params["limite"] = consulta.limite + 1
+        if consulta.offset:
+            params["offset"] = consulta.offset
+        return stmt, params
+
+    def montar_exportacao(self, consulta: Consulta):
+        """
+        (statement, parâmetros) da exportação: só os campos pedidos e LIMIT
+        limite exato (sem a linha a mais nem as colunas da ordenação, que
+        só servem para o cursor da próxima página).
+        """
+        forma = (
+            consulta.campos, self._forma_filtros(consulta), consulta.ordem,
+            consulta.limite is not None, consulta.offset > 0, False,
+        )
+        stmt = self._guardado(("exportacao",) + forma, lambda: self._montar_select(forma, colunas_do_cursor=False))
+
+        params = self._valores_filtros(consulta)
+        if consulta.limite is not None:
+            params["limite"] = consulta.limite
+        if consulta.offset:
+            params["offset"] = consulta.offset
+        return stmt, params
+
+    def montar_total(self, consulta: Consulta):
+        forma_filtros = self._forma_filtros(consulta)
+        stmt = self._guardado(("total", forma_filtros), lambda: self._montar_total(forma_filtros))
+        return stmt, self._valores_filtros(consulta)
+
+    def tabelas(self, consulta: Consulta):
+        """Tabelas lidas pela consulta (entram no ETag: renomear um produto muda a lista expandida)."""
+        usados = consulta.campos + tuple(campo for campo, _, _ in consulta.filtros)
+        relacoes = dict.fromkeys(
+            self._relacao_do_campo[campo] for campo in usados if campo in self._relacao_do_campo
+        )
+        return (self.tabela.name,) + tuple(self.relacoes[nome].tabela.element.name for nome in relacoes)
+
+    # ---------------------------------------------------------------
+    # Execução
+    # ---------------------------------------------------------------
+    def _pagina(self, consulta: Consulta, linhas, total) -> Pagina:
+        proximo = None
+        if consulta.limite is not None and len(linhas) > consulta.limite:
+            linhas = linhas[:consulta.limite]
+            proximo = self._codificar_cursor(linhas[-1], consulta.ordem)
+        return Pagina(linhas, consulta.campos, total, proximo)
+
+    def executar(self, db, consulta: Consulta) -> Pagina:
+        linhas = db.execute(*self.montar(consulta)).all()
+        total = db.execute(*self.montar_total(consulta)).scalar() if consulta.total else None
+        return self._pagina(consulta, linhas, total)
+
+    async def executar_async(self, db, consulta: Consulta) -> Pagina:
+        linhas = (await db.execute(*self.montar(consulta))).all()
+        total = (await db.execute(*self.montar_total(consulta))).scalar() if consulta.total else None
+        return self._pagina(consulta, linhas, total)
@@ -1,6 +1,13 @@
+import atexit
+import glob
+import json
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 
 # Caminhos das pastas dentro de 'consulta'
 LOGS_DIR = "logs/consulta"         # Logs de leitura (GET)
@@ -10,6 +17,189 @@ REGISTRO_DIR = "logs/registro" # Logs de escrita (POST/PUT/DELETE)
 os.makedirs(LOGS_DIR, exist_ok=True)
 os.makedirs(REGISTRO_DIR, exist_ok=True)
 
+# -------------------------------------------------------------------
+# Configurações (variáveis de ambiente)
+# LOG_FORMATO=json grava uma linha JSON por registro (em vez do texto padrão)
+# LOG_LOTE = quantas linhas acumular antes de gravar no disco
+# LOG_FLUSH_INTERVALO = no máximo quantos segundos uma linha fica no buffer
+# LOG_DIAS_RETENCAO = quantos dias de arquivos manter (igual ao antigo backupCount)
+# -------------------------------------------------------------------
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")
+LOG_LOTE = int(os.getenv("LOG_LOTE", "100"))
+LOG_FLUSH_INTERVALO = float(os.getenv("LOG_FLUSH_INTERVALO", "1"))
+LOG_DIAS_RETENCAO = int(os.getenv("LOG_DIAS_RETENCAO", "7"))
+
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - IP: %(ip)s - Método: %(method)s - Status: %(status)s - Mensagem: %(detail)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os mesmos campos do formato texto."""
+
+    def format(self, record):
+        return json.dumps({
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "ip": getattr(record, "ip", None),
+            "method": getattr(record, "method", None),
+            "status": getattr(record, "status", None),
+            "detail": getattr(record, "detail", None),
+            "mensagem": record.getMessage() or None,
+        }, ensure_ascii=False, default=str)
+
+
+class ArquivoDiarioHandler(logging.Handler):
+    """
+    Grava cada logger no seu arquivo do dia: <pasta>/<router>.log.AAAA-MM-DD.
+
+    Não existe renomeação de arquivo à meia-noite (que era o que dava
+    conflito entre vários workers do uvicorn com o TimedRotatingFileHandler):
+    cada processo só abre o arquivo do dia em modo append, e o sistema
+    operacional garante que linhas de processos diferentes não se misturam.
+    As linhas ficam num buffer e são gravadas em lote.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.destinos = {}   # nome do logger -> (pasta, nome do router)
+        self.arquivos = {}   # caminho -> arquivo aberto
+        self.buffer = {}     # caminho -> lista de linhas pendentes
+        self.pendentes = 0
+        self.primeira_pendente = None  # time.monotonic() da linha mais antiga do buffer
+        self.dia = date.today()
+
+    def registrar(self, logger_name: str, folder: str, router_name: str):
+        self.destinos[logger_name] = (folder, router_name)
+
+    def _caminho(self, logger_name: str):
+        folder, router_name = self.destinos[logger_name]
+        return os.path.join(folder, f"{router_name}.log.{self.dia.isoformat()}")
+
+    def emit(self, record):
+        try:
+            if date.today() != self.dia:
+                self._virar_dia()
+            caminho = self._caminho(record.name)
+            self.buffer.setdefault(caminho, []).append(self.format(record) + "\n")
+            self.pendentes += 1
+            if self.primeira_pendente is None:
+                self.primeira_pendente = time.monotonic()
+            # erros vão para o disco na hora; o resto espera completar o lote
+            # ou a linha mais antiga passar de LOG_FLUSH_INTERVALO
+            if self.pendentes >= LOG_LOTE or record.levelno >= logging.ERROR or self.prazo_vencido():
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def prazo_vencido(self) -> bool:
+        return self.primeira_pendente is not None and time.monotonic() - self.primeira_pendente >= LOG_FLUSH_INTERVALO
+
+    def flush(self):
+        for caminho, linhas in self.buffer.items():
+            if not linhas:
+                continue
+            arquivo = self.arquivos.get(caminho)
+            if arquivo is None:
+                arquivo = open(caminho, "a", encoding="utf-8")
+                self.arquivos[caminho] = arquivo
+            arquivo.write("".join(linhas))
+            arquivo.flush()
+        self.buffer.clear()
+        self.pendentes = 0
+        self.primeira_pendente = None
+
+    def _virar_dia(self):
+        self.flush()
+        for arquivo in self.arquivos.values():
+            arquivo.close()
+        self.arquivos.clear()
+        self.dia = date.today()
+        self._limpar_antigos()
+
+    def _limpar_antigos(self):
+        limite = (self.dia - timedelta(days=LOG_DIAS_RETENCAO)).isoformat()
+        for folder, router_name in set(self.destinos.values()):
+            for caminho in glob.glob(os.path.join(folder, f"{router_name}.log.*")):
+                if caminho.rsplit(".", 1)[-1] < limite:
+                    try:
+                        os.remove(caminho)
+                    except OSError:
+                        pass  # outro worker já removeu
+
+    def close(self):
+        self.flush()
+        for arquivo in self.arquivos.values():
+            arquivo.close()
+        self.arquivos.clear()
+        super().close()
+
+
+class _LogListener(QueueListener):
+    """
+    QueueListener que grava o buffer no prazo da linha mais antiga: espera
+    o próximo registro só até LOG_FLUSH_INTERVALO depois da primeira linha
+    pendente (um fluxo contínuo de registros não adia a gravação).
+    """
+
+    def dequeue(self, block):
+        while True:
+            pendentes = [h.primeira_pendente for h in self.handlers if h.primeira_pendente is not None]
+            espera = max(0.0, min(pendentes) + LOG_FLUSH_INTERVALO - time.monotonic()) if pendentes else None
+            try:
+                return self.queue.get(block=block, timeout=espera)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+# -------------------------------------------------------------------
+# Um único escritor em segundo plano por processo: os routers só colocam
+# o registro numa fila (sem I/O de disco na thread da requisição) e a
+# thread do listener formata e grava.
+# -------------------------------------------------------------------
+_fila = queue.SimpleQueue()
+_handler = ArquivoDiarioHandler()
+_handler.setFormatter(JsonFormatter() if LOG_FORMATO == "json" else logging.Formatter(FORMATO_TEXTO))
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _garantir_listener():
+    global _listener, _listener_pid
+    with _listener_lock:
+        # depois de um fork a thread do pai não existe no filho: sobe outra
+        if _listener is None or _listener_pid != os.getpid():
+            _listener = _LogListener(_fila, _handler)
+            _listener.start()
+            _listener_pid = os.getpid()
+
+
+def _apos_fork():
+    global _listener_lock
+    _listener_lock = threading.Lock()
+    _handler.arquivos.clear()  # não reaproveita os arquivos abertos pelo pai
+    _handler.buffer.clear()    # nem grava de novo as linhas que eram do pai
+    _handler.pendentes = 0
+    _handler.primeira_pendente = None
+    if _listener is not None:
+        _garantir_listener()
+
+
+def parar_logs():
+    """Grava o que estiver pendente e encerra a thread de escrita."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _handler.flush()
+        _listener = None
+
+
+atexit.register(parar_logs)
+os.register_at_fork(after_in_child=_apos_fork)
+
+
 def get_router_logger(router_name: str, registro: bool = False):
     """
     Cria um logger específico para cada router, garantindo que não compartilhe handlers
@@ -17,7 +207,7 @@ def get_router_logger(router_name: str, registro: bool = False):
     """
     # Garante nome único por tipo de logger
     logger_full_name = f"{router_name}_registro" if registro else f"{router_name}_consulta"
-    
+
     logger = logging.getLogger(logger_full_name)
     logger.setLevel(logging.INFO)
 
@@ -25,20 +215,11 @@ def get_router_logger(router_name: str, registro: bool = False):
     if not logger.hasHandlers():
         folder = REGISTRO_DIR if registro else LOGS_DIR
         os.makedirs(folder, exist_ok=True)
-        file_path = os.path.join(folder, f"{router_name}.log")
-
-        handler = TimedRotatingFileHandler(
-            filename=file_path,
-            when="midnight",
-            interval=1,
-            backupCount=7,
-            encoding="utf-8"
-        )
-
-        formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - IP: %(ip)s - Método: %(method)s - Status: %(status)s - Mensagem: %(detail)s'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-
-    return logger
\ No newline at end of file
+
+        # o logger só enfileira; o arquivo de destino é resolvido pelo listener
+        _handler.registrar(logger_full_name, folder, router_name)
+        logger.addHandler(QueueHandler(_fila))
+        logger.propagate = False
+
+    _garantir_listener()
+    return logger
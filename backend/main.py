@@ -1,15 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
+from config import USAR_ASYNC
+
 # imports dos routers de consulta
+# DB_ASYNC=1 troca pelos routers async (mesmas rotas, AsyncEngine no lugar do threadpool)
 from routers.consulta import testeBanco
-from routers.consulta import categorias as con_categorias
-from routers.consulta import produtos as con_produtos
-from routers.consulta import movimentacoes as con_movimentacoes
-from routers.consulta import fornecedores as con_fornecedores
-from routers.consulta import tipoPagamento as con_tipoPagamento
-from routers.consulta import tipoMovimentacao as con_tipoMovimentacao
+from routers.consulta import busca as con_busca
+from routers.consulta import estoque as con_estoque
+from routers.consulta import bi as con_bi
+from routers.consulta import analytics as con_analytics
+from routers.consulta import reposicao as con_reposicao
+from routers.consulta import metricas as con_metricas
+from routers.consulta import eventos as con_eventos
+from routers.consulta import alteracoes as con_alteracoes
+from routers.consulta import bootstrap as con_bootstrap
+if USAR_ASYNC:
+    from routers.consulta_async import categorias as con_categorias
+    from routers.consulta_async import produtos as con_produtos
+    from routers.consulta_async import movimentacoes as con_movimentacoes
+    from routers.consulta_async import fornecedores as con_fornecedores
+    from routers.consulta_async import tipoPagamento as con_tipoPagamento
+    from routers.consulta_async import tipoMovimentacao as con_tipoMovimentacao
+else:
+    from routers.consulta import categorias as con_categorias
+    from routers.consulta import produtos as con_produtos
+    from routers.consulta import movimentacoes as con_movimentacoes
+    from routers.consulta import fornecedores as con_fornecedores
+    from routers.consulta import tipoPagamento as con_tipoPagamento
+    from routers.consulta import tipoMovimentacao as con_tipoMovimentacao
 
 # imports dos routers de registro
 from routers.registro import fornecedores as reg_fornecedores
@@ -17,25 +39,76 @@ from routers.registro import categoria as reg_categoria
 from routers.registro import produtos as reg_produtos
 from routers.registro import movimentacoes as reg_movimentacoes
 from routers.registro import tipomovimentacao as reg_tipoMovimentacao
+from routers.registro import reposicao as reg_reposicao
 
 from routers.registro.tipoPagamento import router as registro_tipo_pagamento_router
 
+from database import verificar_tabelas, dispose_engines, get_sessionmaker
+from busca import indice_busca
+from snapshots import iniciar_snapshots, parar_snapshots
+from resumos import preencher_em_segundo_plano
+from previsao import iniciar_previsao, parar_previsao
+from metricas import MetricasMiddleware, RespostaJSON
+
 import os
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # só confere o schema: a DDL roda à parte (python migracoes.py).
+    # Banco desatualizado derruba a subida em vez de falhar depois nas rotas
+    verificar_tabelas()
+    # monta o índice da /consulta/busca (se falhar, é montado na primeira busca)
+    try:
+        with get_sessionmaker("escrita")() as db:
+            indice_busca.reconstruir(db)
+    except Exception as e:
+        print(f"⚠️  Não foi possível montar o índice de busca: {e}")
+    # job que grava o saldo de fechamento dos produtos (estoque_snapshot)
+    iniciar_snapshots()
+    # soma nos resumos de BI as movimentações anteriores a eles (só na primeira vez)
+    preencher_em_segundo_plano()
+    # job da previsão de demanda / ponto de pedido (sugestao_reposicao)
+    iniciar_previsao()
+    yield
+    parar_previsao()
+    parar_snapshots()
+    # no desligamento fecha as conexões abertas nos pools de todos os perfis
+    dispose_engines()
+    if USAR_ASYNC:
+        from database_async import dispose_async_engines
+        await dispose_async_engines()
+
+
+# RespostaJSON / MetricasMiddleware: queries, tempo de banco e de serialização
+# por requisição (cabeçalho Server-Timing e /metrics)
+app = FastAPI(lifespan=lifespan, default_response_class=RespostaJSON)
+app.add_middleware(MetricasMiddleware)
 
 # routers das apis.
 app.include_router(testeBanco.router)
+app.include_router(con_metricas.router)
 app.include_router(con_categorias.router)
 app.include_router(con_produtos.router)
 app.include_router(con_movimentacoes.router)
 app.include_router(con_fornecedores.router)
 app.include_router(con_tipoPagamento.router)
 app.include_router(con_tipoMovimentacao.router)
+app.include_router(con_busca.router)
+app.include_router(con_estoque.router)
+app.include_router(con_bi.router)
+app.include_router(con_analytics.router)
+app.include_router(con_reposicao.router)
+app.include_router(con_eventos.router)
+app.include_router(con_alteracoes.router)
+app.include_router(con_bootstrap.router)
 app.include_router(reg_fornecedores.router)
 app.include_router(reg_categoria.router)
 app.include_router(reg_produtos.router)
 app.include_router(reg_movimentacoes.router)
+app.include_router(reg_tipoMovimentacao.router)
+app.include_router(registro_tipo_pagamento_router)
+app.include_router(reg_reposicao.router)
 
 # Detecta se está rodando no Docker ou local
 if os.path.exists("/frontend"):
@@ -0,0 +1,232 @@
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from logger import get_router_logger
+
+# -------------------------------------------------------------------
+# Métricas por requisição
+# Os eventos do SQLAlchemy (before/after_cursor_execute) somam quantas
+# queries a requisição fez e quanto tempo ficou esperando o banco; a
+# RespostaJSON mede a serialização. O middleware junta tudo e devolve no
+# cabeçalho Server-Timing (aparece na aba Network do navegador):
+#
+#   db;dur=12.4;desc="5 queries", serializacao;dur=0.8, handler;dur=3.1, total;dur=16.3
+#
+# handler = total - db - serialização (código Python do endpoint, validação etc).
+# Os acumulados por rota ficam em /metrics (formato Prometheus, por processo).
+#
+# Requisições acima dos limites vão para o log "metricas" como aviso:
+# METRICAS_LIMITE_MS      = tempo total em ms
+# METRICAS_LIMITE_QUERIES = quantidade de queries (sinal de N+1)
+# -------------------------------------------------------------------
+LIMITE_MS = float(os.getenv("METRICAS_LIMITE_MS", "500"))
+LIMITE_QUERIES = int(os.getenv("METRICAS_LIMITE_QUERIES", "20"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # segundos
+
+logger_metricas = get_router_logger("metricas", registro=False)
+
+
+class Medicao:
+    __slots__ = ("inicio", "queries", "tempo_db", "tempo_serializacao")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.tempo_serializacao = 0.0
+
+
+# a medição da requisição atual (o contexto é copiado para o threadpool e para
+# os greenlets do SQLAlchemy async, e como o objeto é o mesmo, todos somam nele)
+_medicao_atual = contextvars.ContextVar("medicao_atual", default=None)
+
+
+def medicao_atual():
+    return _medicao_atual.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_da_query(conn, cursor, statement, parameters, context, executemany):
+    if _medicao_atual.get() is not None:
+        conn.info.setdefault("inicio_query", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_da_query(conn, cursor, statement, parameters, context, executemany):
+    medicao = _medicao_atual.get()
+    inicios = conn.info.get("inicio_query")
+    if medicao is None or not inicios:
+        return
+    medicao.queries += 1
+    medicao.tempo_db += time.perf_counter() - inicios.pop()
+
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse que conta o tempo de serialização na medição da requisição."""
+
+    def render(self, content) -> bytes:
+        medicao = _medicao_atual.get()
+        if medicao is None:
+            return self.serializar(content)
+        inicio = time.perf_counter()
+        try:
+            return self.serializar(content)
+        finally:
+            medicao.tempo_serializacao += time.perf_counter() - inicio
+
+    def serializar(self, content) -> bytes:
+        # subclasses trocam o serializador (serializacao.RespostaRapida usa orjson)
+        return super().render(content)
+
+
+# -------------------------------------------------------------------
+# Acumulados por rota (lidos pelo /metrics)
+# -------------------------------------------------------------------
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requisicoes = defaultdict(int)       # (metodo, rota, status) -> n
+        self.duracao = defaultdict(lambda: [0] * (len(BUCKETS) + 1) + [0.0])  # (metodo, rota) -> buckets, +Inf, soma
+        self.queries = defaultdict(int)           # (metodo, rota) -> total de queries
+        self.tempo_db = defaultdict(float)
+        self.tempo_serializacao = defaultdict(float)
+        self.lentas = defaultdict(int)            # (metodo, rota, motivo) -> n
+
+    def registrar(self, metodo, rota, status, medicao: Medicao, total: float, motivos):
+        with self._lock:
+            self.requisicoes[(metodo, rota, status)] += 1
+            histograma = self.duracao[(metodo, rota)]
+            for i, limite in enumerate(BUCKETS):
+                if total <= limite:
+                    histograma[i] += 1
+            histograma[len(BUCKETS)] += 1
+            histograma[-1] += total
+            self.queries[(metodo, rota)] += medicao.queries
+            self.tempo_db[(metodo, rota)] += medicao.tempo_db
+            self.tempo_serializacao[(metodo, rota)] += medicao.tempo_serializacao
+            for motivo in motivos:
+                self.lentas[(metodo, rota, motivo)] += 1
+
+    def prometheus(self) -> str:
+        def _rotulos(**valores):
+            return "{" + ",".join(f'{chave}="{str(valor)}"' for chave, valor in valores.items()) + "}"
+
+        linhas = []
+        with self._lock:
+            linhas += ["# HELP dogstock_http_requisicoes_total Requisições atendidas",
+                       "# TYPE dogstock_http_requisicoes_total counter"]
+            for (metodo, rota, status), n in sorted(self.requisicoes.items()):
+                linhas.append(f"dogstock_http_requisicoes_total{_rotulos(metodo=metodo, rota=rota, status=status)} {n}")
+
+            linhas += ["# HELP dogstock_http_duracao_segundos Tempo total da requisição",
+                       "# TYPE dogstock_http_duracao_segundos histogram"]
+            for (metodo, rota), histograma in sorted(self.duracao.items()):
+                for i, limite in enumerate(BUCKETS):
+                    linhas.append(f"dogstock_http_duracao_segundos_bucket{_rotulos(metodo=metodo, rota=rota, le=limite)} {histograma[i]}")
+                linhas.append(f"dogstock_http_duracao_segundos_bucket{_rotulos(metodo=metodo, rota=rota, le='+Inf')} {histograma[len(BUCKETS)]}")
+                linhas.append(f"dogstock_http_duracao_segundos_sum{_rotulos(metodo=metodo, rota=rota)} {histograma[-1]:.6f}")
+                linhas.append(f"dogstock_http_duracao_segundos_count{_rotulos(metodo=metodo, rota=rota)} {histograma[len(BUCKETS)]}")
+
+            for nome, ajuda, valores, formato in (
+                ("dogstock_db_queries_total", "Queries executadas", self.queries, "{}"),
+                ("dogstock_db_duracao_segundos_total", "Tempo esperando o banco", self.tempo_db, "{:.6f}"),
+                ("dogstock_serializacao_segundos_total", "Tempo serializando o JSON", self.tempo_serializacao, "{:.6f}"),
+            ):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+                for (metodo, rota), valor in sorted(valores.items()):
+                    linhas.append(f"{nome}{_rotulos(metodo=metodo, rota=rota)} {formato.format(valor)}")
+
+            linhas += ["# HELP dogstock_requisicoes_lentas_total Requisições acima de METRICAS_LIMITE_MS / METRICAS_LIMITE_QUERIES",
+                       "# TYPE dogstock_requisicoes_lentas_total counter"]
+            for (metodo, rota, motivo), n in sorted(self.lentas.items()):
+                linhas.append(f"dogstock_requisicoes_lentas_total{_rotulos(metodo=metodo, rota=rota, motivo=motivo)} {n}")
+
+        return "\n".join(linhas) + "\n"
+
+
+registro_metricas = Registro()
+
+
+def _server_timing(medicao: Medicao, total: float) -> str:
+    db_ms = medicao.tempo_db * 1000
+    serializacao_ms = medicao.tempo_serializacao * 1000
+    total_ms = total * 1000
+    handler_ms = max(total_ms - db_ms - serializacao_ms, 0)
+    return (
+        f'db;dur={db_ms:.1f};desc="{medicao.queries} queries", '
+        f"serializacao;dur={serializacao_ms:.1f}, handler;dur={handler_ms:.1f}, total;dur={total_ms:.1f}"
+    )
+
+
+# -------------------------------------------------------------------
+# Middleware (ASGI puro: funciona também com StreamingResponse)
+# -------------------------------------------------------------------
+class MetricasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        status = [500]
+        continuo = [False]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                # SSE (/consulta/eventos) fica aberto indefinidamente: não é "requisição lenta"
+                continuo[0] = any(
+                    nome == b"content-type" and valor.startswith(b"text/event-stream")
+                    for nome, valor in message.get("headers", [])
+                )
+                # Server-Timing vai com o que foi medido até o início da resposta
+                # (em exportações por streaming as queries continuam depois)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(medicao, time.perf_counter() - medicao.inicio).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _medicao_atual.reset(token)
+            if not continuo[0]:
+                self._registrar(scope, status[0], medicao, time.perf_counter() - medicao.inicio)
+
+    @staticmethod
+    def _registrar(scope, status, medicao: Medicao, total: float):
+        route = scope.get("route")
+        rota = getattr(route, "path", None) or "(sem rota)"   # template (/registro/produtos/{produto_id}), não o caminho
+        metodo = scope["method"]
+
+        motivos = []
+        if total * 1000 > LIMITE_MS:
+            motivos.append("tempo")
+        if medicao.queries > LIMITE_QUERIES:
+            motivos.append("queries")
+        registro_metricas.registrar(metodo, rota, status, medicao, total, motivos)
+
+        if motivos:
+            client = scope.get("client")
+            logger_metricas.warning(
+                "",
+                extra={
+                    "ip": client[0] if client else "N/A",
+                    "status": status,
+                    "method": metodo,
+                    "detail": (
+                        f"Requisição lenta ({', '.join(motivos)}): {rota} - {total * 1000:.0f} ms, "
+                        f"{medicao.queries} queries ({medicao.tempo_db * 1000:.0f} ms no banco)"
+                    )
+                }
+            )
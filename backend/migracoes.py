@@ -0,0 +1,70 @@
+from sqlalchemy import inspect, text
+
+from estoque import normalizar
+
+# -------------------------------------------------------------------
+# Migrações de colunas
+# O create_all só cria tabelas que não existem; coluna nova em tabela
+# que já existe entra aqui. Cada migração confere se já foi aplicada
+# (pela própria coluna), então rodar de novo não faz nada.
+#
+# Roda separado da aplicação, com o perfil admin (DDL):
+#     python migracoes.py
+# A aplicação só confere o schema na subida (database.verificar_tabelas).
+# -------------------------------------------------------------------
+
+# Regra usada só para preencher tipo_movimentacao.sinal dos tipos que já
+# existiam quando a coluna foi criada. Depois disso o sinal é cadastrado
+# junto com o tipo. (sem acento, minúsculas)
+SAIDAS_COM_PALAVRA_DE_ENTRADA = ("devolucao ao fornecedor", "devolucao para fornecedor", "devolucao para o fornecedor")
+TIPOS_ENTRADA = ("entrada", "compra", "devolucao")
+TIPOS_SAIDA = ("saida", "venda", "perda", "baixa", "consumo")
+
+
+def sinal_pela_descricao(descricao: str) -> int:
+    """+1 entrada, -1 saída, 0 quando não dá para saber pelo nome (não altera o saldo)."""
+    descricao = normalizar(descricao)
+    if descricao.startswith(SAIDAS_COM_PALAVRA_DE_ENTRADA):
+        return -1
+    if descricao.startswith(TIPOS_ENTRADA):
+        return 1
+    if descricao.startswith(TIPOS_SAIDA):
+        return -1
+    return 0
+
+
+def _colunas(engine, tabela: str) -> set:
+    return {coluna["name"] for coluna in inspect(engine).get_columns(tabela)}
+
+
+def sinal_tipo_movimentacao(engine):
+    """tipo_movimentacao.sinal (+1/-1/0), preenchido a partir da descrição dos tipos existentes."""
+    if "sinal" in _colunas(engine, "tipo_movimentacao"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE tipo_movimentacao ADD COLUMN sinal SMALLINT NOT NULL DEFAULT 0"))
+        tipos = conn.execute(text("SELECT id, descricao FROM tipo_movimentacao")).all()
+        for tipo in tipos:
+            sinal = sinal_pela_descricao(tipo.descricao)
+            if sinal:
+                conn.execute(text("UPDATE tipo_movimentacao SET sinal = :sinal WHERE id = :id"), {"sinal": sinal, "id": tipo.id})
+            else:
+                print(f"⚠️  Tipo de movimentação '{tipo.descricao}' (ID {tipo.id}) ficou com sinal 0 (não altera o saldo): ajuste em PUT /registro/tipomovimentacao/{tipo.id}")
+
+
+MIGRACOES = (
+    sinal_tipo_movimentacao,
+)
+
+
+def aplicar(engine):
+    for migracao in MIGRACOES:
+        migracao(engine)
+
+
+if __name__ == "__main__":
+    from database import criar_tabelas, dispose_engines
+
+    criar_tabelas("admin")
+    dispose_engines()
+    print("✅ Tabelas, colunas e índices atualizados")
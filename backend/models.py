@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Numeric, ForeignKey, TIMESTAMP, Date, Index, Boolean
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -15,7 +15,14 @@ class Produto(Base):
     status = Column(String(50), nullable=False, default="ativo")
     
     categoria = relationship("Categoria") #relacionamento entre tabelas, colocar nome da CLASSE
-    
+
+
+# índices funcionais sobre a falta (qtd_minima - qtd_disponivel), usados pelo
+# /consulta/produtos/estoque-baixo. MySQL 8.0.13+ (e SQLite) suportam índice em expressão.
+Index("ix_produtos_falta", (Produto.qtd_minima - Produto.qtd_disponivel))
+Index("ix_produtos_categoria_falta", Produto.categoria_id, (Produto.qtd_minima - Produto.qtd_disponivel))
+
+
 class Fornecedores(Base):
     __tablename__ = "fornecedores"
 
@@ -59,9 +66,100 @@ class Movimentacoes(Base):
     tipo_movimentacao = relationship("TipoMovimentacao")
     fornecedor = relationship("Fornecedores")
     tipo_pagamento = relationship("TipoPagamento")
+
+    # índices compostos para a paginação por cursor (data, id) e para os filtros
+    # do /consulta/movimentacoes: o filtro vem na frente e (data, id) completa a ordenação
+    __table_args__ = (
+        Index("ix_movimentacoes_data_id", "data", "id"),
+        Index("ix_movimentacoes_produto_data_id", "produto_id", "data", "id"),
+        Index("ix_movimentacoes_tipo_mov_data_id", "tipo_mov_id", "data", "id"),
+        Index("ix_movimentacoes_fornecedor_data_id", "fornecedor_id", "data", "id"),
+        Index("ix_movimentacoes_tipo_pag_data_id", "tipo_pag_id", "data", "id"),
+    )
   
 class TipoMovimentacao(Base):
     __tablename__ = "tipo_movimentacao"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     descricao = Column(String(255), nullable=False, unique=True)
+    # efeito no saldo do produto: +1 entrada, -1 saída, 0 não altera (ex: transferência)
+    sinal = Column(SmallInteger, nullable=False, default=0, server_default="0")
+
+
+# versão de cada tabela, incrementada pelos routers de registro na mesma transação
+# da alteração. Usada para montar o ETag das consultas (GET condicional / 304)
+class VersaoTabela(Base):
+    __tablename__ = "versao_tabela"
+
+    tabela = Column(String(64), primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+
+
+# última alteração de cada linha das tabelas de cadastro (gravado por alteracoes.py
+# no commit dos routers de registro). Uma linha por registro: a versão é a da última
+# transação que mexeu nele e removido=True é a lápide de um DELETE.
+# É o que o /consulta/changes?since= lê para devolver só o que mudou.
+class LogAlteracao(Base):
+    __tablename__ = "log_alteracoes"
+
+    tabela = Column(String(64), primary_key=True)
+    registro_id = Column(Integer, primary_key=True)
+    versao = Column(BigInteger, nullable=False)
+    removido = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_log_alteracoes_versao", "versao"),
+        Index("ix_log_alteracoes_tabela_versao", "tabela", "versao"),
+    )
+
+
+# saldo de fechamento de cada produto em um dia (gerado pelo job de snapshots.py).
+# Estoque em uma data passada = snapshot mais próximo + movimentações desde ele
+class EstoqueSnapshot(Base):
+    __tablename__ = "estoque_snapshot"
+
+    data = Column(Date, primary_key=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE"), primary_key=True)
+    qtd = Column(Numeric(14, 3), nullable=False)
+
+    __table_args__ = (
+        Index("ix_estoque_snapshot_produto_data", "produto_id", "data"),
+    )
+
+
+# totais de movimentações por período (dia/semana/mês) e dimensão (produto,
+# categoria, fornecedor, tipo_pagamento), mantidos por resumos.py a cada escrita.
+# É daqui que o Power BI lê, sem varrer a tabela de movimentações.
+class ResumoMovimentacao(Base):
+    __tablename__ = "bi_resumo_movimentacoes"
+
+    periodo = Column(String(10), primary_key=True)     # dia | semana | mes
+    inicio = Column(Date, primary_key=True)            # primeiro dia do período
+    dimensao = Column(String(20), primary_key=True)    # produto | categoria | fornecedor | tipo_pagamento
+    chave = Column(Integer, primary_key=True)          # id na dimensão (0 = sem fornecedor/pagamento)
+    tipo_mov_id = Column(Integer, primary_key=True)
+    qtd_movimentacoes = Column(Integer, nullable=False, default=0)
+    soma_quantidade = Column(Numeric(16, 3), nullable=False, default=0)
+    soma_preco_compra = Column(Numeric(16, 2), nullable=False, default=0)
+    soma_preco_venda = Column(Numeric(16, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_bi_resumo_dimensao_periodo_inicio", "dimensao", "periodo", "inicio"),
+    )
+
+
+# previsão de demanda e ponto de pedido por produto (gerado por previsao.py).
+# Guarda o estado da suavização exponencial até `ultimo_dia`, para a próxima
+# execução só processar os dias novos. ultimo_dia NULL = recalcular do zero.
+class SugestaoReposicao(Base):
+    __tablename__ = "sugestao_reposicao"
+
+    produto_id = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE"), primary_key=True)
+    demanda_diaria = Column(Numeric(16, 4), nullable=False, default=0)     # nível suavizado
+    variancia_diaria = Column(Numeric(16, 4), nullable=False, default=0)   # erro quadrático suavizado
+    ultimo_dia = Column(Date, nullable=True)
+    prazo_entrega_dias = Column(Integer, nullable=False)
+    estoque_seguranca = Column(Numeric(14, 3), nullable=False, default=0)
+    ponto_pedido = Column(Numeric(14, 3), nullable=False, default=0)
+    qtd_sugerida = Column(Numeric(14, 3), nullable=False, default=0)
+    calculado_em = Column(TIMESTAMP, nullable=False)
@@ -0,0 +1,265 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import case, select, insert, update, func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from analise import carregar_colunas
+from database import get_sessionmaker
+from logger import get_router_logger
+from models import Produto, SugestaoReposicao
+from versoes import registrar_alteracao
+
+# -------------------------------------------------------------------
+# Previsão de demanda e ponto de pedido (tabela sugestao_reposicao)
+# A demanda diária (saídas) de cada produto é prevista com suavização
+# exponencial simples, calculada para todos os produtos de uma vez: cada
+# dia do histórico é uma operação sobre o vetor de produtos.
+#
+#   demanda_diaria   nível suavizado da demanda
+#   variancia_diaria erro quadrático suavizado (incerteza da previsão)
+#   estoque_seguranca = Z x sqrt(variancia x prazo)
+#   ponto_pedido      = demanda x prazo + estoque_seguranca
+#   qtd_sugerida      = se o estoque chegou no ponto de pedido, o que falta
+#                       para cobrir o prazo + um ciclo de reposição
+#
+# O estado da suavização fica gravado até `ultimo_dia` (último dia fechado
+# processado): a próxima execução só passa pelos dias novos. Movimentação
+# com data retroativa zera o ultimo_dia do produto (marcar_recalculo) e
+# ele é recalculado do zero na próxima execução.
+#
+# REPOSICAO_PRAZO_DIAS   = prazo de entrega do fornecedor (lead time)
+# REPOSICAO_CICLO_DIAS   = de quantos em quantos dias se faz pedido
+# REPOSICAO_HISTORICO_DIAS = dias de histórico no cálculo do zero
+# REPOSICAO_INTERVALO    = de quantos em quantos segundos o job roda (0 desliga)
+# -------------------------------------------------------------------
+PRAZO_DIAS = int(os.getenv("REPOSICAO_PRAZO_DIAS", "7"))
+CICLO_DIAS = int(os.getenv("REPOSICAO_CICLO_DIAS", "7"))
+HISTORICO_DIAS = int(os.getenv("REPOSICAO_HISTORICO_DIAS", "180"))
+INTERVALO = int(os.getenv("REPOSICAO_INTERVALO", "3600"))
+ALFA = float(os.getenv("REPOSICAO_ALFA", "0.1"))   # peso do dia mais recente na suavização
+Z_SERVICO = 1.65                                   # ~95% de nível de serviço
+TAMANHO_LOTE = 1000
+
+
+def demanda_por_dia(db, ids: np.ndarray, desde: date, ate: date) -> np.ndarray:
+    """Matriz produtos x dias [desde, ate] com a quantidade que SAIU de cada produto no dia."""
+    n_dias = (ate - desde).days + 1
+    n = len(ids)
+    if n == 0 or n_dias <= 0:
+        return np.zeros((n, max(n_dias, 0)))
+
+    produto_id, dia, qtd_com_sinal, _ = carregar_colunas(db, desde)
+    coluna = dia - np.datetime64(desde, "D").astype(np.int64)
+    pos = np.searchsorted(ids, produto_id)
+    valido = (
+        (qtd_com_sinal < 0) & (coluna < n_dias)
+        & (pos < n) & (ids[np.minimum(pos, n - 1)] == produto_id)
+    )
+    celula = pos[valido] * n_dias + coluna[valido]
+    return np.bincount(celula, weights=-qtd_com_sinal[valido], minlength=n * n_dias).reshape(n, n_dias)
+
+
+def suavizar(demanda: np.ndarray, nivel: np.ndarray, variancia: np.ndarray, alfa: float = ALFA):
+    """Passa os dias (colunas) pela suavização exponencial, todos os produtos juntos."""
+    nivel, variancia = nivel.copy(), variancia.copy()
+    for t in range(demanda.shape[1]):
+        erro = demanda[:, t] - nivel
+        nivel += alfa * erro
+        variancia += alfa * (erro * erro - variancia)
+    return nivel, variancia
+
+
+def ajustar_do_zero(demanda: np.ndarray, alfa: float = ALFA):
+    """Estado inicial pela média/variância do histórico, depois suaviza o histórico inteiro."""
+    if demanda.shape[1] == 0:
+        zeros = np.zeros(demanda.shape[0])
+        return zeros, zeros.copy()
+    return suavizar(demanda, demanda.mean(axis=1), demanda.var(axis=1), alfa)
+
+
+def pontos_de_pedido(nivel: np.ndarray, variancia: np.ndarray, estoque: np.ndarray, prazo: int = PRAZO_DIAS):
+    estoque_seguranca = Z_SERVICO * np.sqrt(np.maximum(variancia, 0) * prazo)
+    ponto_pedido = nivel * prazo + estoque_seguranca
+    estoque_maximo = ponto_pedido + nivel * CICLO_DIAS
+    qtd_sugerida = np.where(estoque <= ponto_pedido, np.maximum(estoque_maximo - estoque, 0), 0)
+    return estoque_seguranca, ponto_pedido, qtd_sugerida
+
+
+def qtd_sugerida_atual():
+    """
+    Mesma regra da qtd_sugerida de pontos_de_pedido, como expressão SQL com o
+    saldo ATUAL do produto (a coluna gravada é a do momento em que o job rodou).
+    Usar numa query com join de Produto e SugestaoReposicao.
+    """
+    estoque = func.coalesce(Produto.qtd_disponivel, 0)
+    estoque_maximo = SugestaoReposicao.ponto_pedido + SugestaoReposicao.demanda_diaria * CICLO_DIAS
+    return case(
+        (estoque <= SugestaoReposicao.ponto_pedido, func.round(estoque_maximo - estoque, 3)),
+        else_=0,
+    )
+
+
+# -------------------------------------------------------------------
+# Execução (incremental) e gravação
+# -------------------------------------------------------------------
+def calcular_sugestoes(db, hoje: date = None) -> dict:
+    """
+    Atualiza sugestao_reposicao para todos os produtos e faz o commit.
+    Produtos já calculados só processam os dias depois do seu ultimo_dia;
+    os novos (ou marcados para recalcular) usam HISTORICO_DIAS de histórico.
+    """
+    ontem = (hoje or date.today()) - timedelta(days=1)
+
+    # Trava as linhas até o commit, e antes de qualquer outra leitura: uma
+    # movimentação retroativa que chegue durante o cálculo espera no
+    # marcar_recalculo e zera o ultimo_dia DEPOIS da gravação (em vez de ser
+    # sobrescrita por ela), e as que já foram confirmadas entram no snapshot
+    # usado para ler o histórico.
+    estados = {
+        linha.produto_id: linha
+        for linha in db.execute(select(
+            SugestaoReposicao.produto_id, SugestaoReposicao.demanda_diaria,
+            SugestaoReposicao.variancia_diaria, SugestaoReposicao.ultimo_dia
+        ).with_for_update())
+    }
+
+    produtos = db.execute(select(Produto.id, Produto.qtd_disponivel).order_by(Produto.id)).all()
+    ids = np.array([p.id for p in produtos], dtype=np.int64)
+    estoque = np.array([float(p.qtd_disponivel or 0) for p in produtos])
+    n = len(ids)
+
+    nivel = np.zeros(n)
+    variancia = np.zeros(n)
+    ultimo = np.full(n, None, dtype=object)
+    for i, produto_id in enumerate(ids.tolist()):
+        estado = estados.get(produto_id)
+        if estado is not None and estado.ultimo_dia is not None:
+            nivel[i] = float(estado.demanda_diaria)
+            variancia[i] = float(estado.variancia_diaria)
+            ultimo[i] = estado.ultimo_dia
+
+    # do zero: todos com a mesma janela, uma matriz só
+    do_zero = np.flatnonzero(ultimo == None)  # noqa: E711 (comparação elemento a elemento)
+    if len(do_zero):
+        demanda = demanda_por_dia(db, ids[do_zero], ontem - timedelta(days=HISTORICO_DIAS - 1), ontem)
+        nivel[do_zero], variancia[do_zero] = ajustar_do_zero(demanda)
+
+    # incremental: agrupado pelo último dia processado (normalmente um grupo só)
+    dias_processados = 0
+    for dia in set(ultimo[ultimo != None]):  # noqa: E711
+        if dia >= ontem:
+            continue  # nada de dia novo fechado (o estado continua valendo até `dia`)
+        grupo = np.flatnonzero(ultimo == dia)
+        demanda = demanda_por_dia(db, ids[grupo], dia + timedelta(days=1), ontem)
+        nivel[grupo], variancia[grupo] = suavizar(demanda, nivel[grupo], variancia[grupo])
+        dias_processados = max(dias_processados, demanda.shape[1])
+        ultimo[grupo] = ontem
+    ultimo[do_zero] = ontem
+
+    estoque_seguranca, ponto_pedido, qtd_sugerida = pontos_de_pedido(nivel, variancia, estoque)
+
+    agora = datetime.now()
+    linhas = [
+        {
+            "produto_id": int(ids[i]),
+            "demanda_diaria": round(float(nivel[i]), 4),
+            "variancia_diaria": round(float(variancia[i]), 4),
+            "ultimo_dia": ultimo[i],
+            "prazo_entrega_dias": PRAZO_DIAS,
+            "estoque_seguranca": round(float(estoque_seguranca[i]), 3),
+            "ponto_pedido": round(float(ponto_pedido[i]), 3),
+            "qtd_sugerida": round(float(qtd_sugerida[i]), 3),
+            "calculado_em": agora,
+        }
+        for i in range(n)
+    ]
+    novas = [linha for linha in linhas if linha["produto_id"] not in estados]
+    existentes = [linha for linha in linhas if linha["produto_id"] in estados]
+
+    for inicio in range(0, len(existentes), TAMANHO_LOTE):
+        db.execute(update(SugestaoReposicao), existentes[inicio:inicio + TAMANHO_LOTE])  # UPDATE pela chave primária
+    for inicio in range(0, len(novas), TAMANHO_LOTE):
+        db.execute(insert(SugestaoReposicao), novas[inicio:inicio + TAMANHO_LOTE])
+    registrar_alteracao(db, "sugestao_reposicao")  # versão da tabela (ETag da consulta)
+    db.commit()
+
+    return {
+        "produtos": n,
+        "calculados_do_zero": len(do_zero),
+        "dias_incrementais": dias_processados,
+        "abaixo_do_ponto": int((qtd_sugerida > 0).sum()),
+        "ultimo_dia": ontem,
+    }
+
+
+def marcar_recalculo(db, ajustes):
+    """
+    Movimentação com data já processada pela previsão (retroativa): o produto
+    volta a ser calculado do zero na próxima execução. ajustes = {(produto_id, dia): ...}
+    (o mesmo dict passado para ajustar_snapshots). Chamar antes do commit.
+    """
+    ultimo = db.scalar(select(func.max(SugestaoReposicao.ultimo_dia)))
+    if ultimo is None:
+        return
+
+    primeiro_dia = {}
+    for produto_id, dia in ajustes:
+        if dia <= ultimo and (produto_id not in primeiro_dia or dia < primeiro_dia[produto_id]):
+            primeiro_dia[produto_id] = dia
+    for produto_id, dia in primeiro_dia.items():
+        db.execute(
+            update(SugestaoReposicao)
+            .where(SugestaoReposicao.produto_id == produto_id, SugestaoReposicao.ultimo_dia >= dia)
+            .values(ultimo_dia=None)
+        )
+
+
+# -------------------------------------------------------------------
+# Job em segundo plano (mesma ideia do snapshots.py; se dois workers
+# gravarem ao mesmo tempo, o segundo recebe IntegrityError e ignora)
+# -------------------------------------------------------------------
+_parar = threading.Event()
+_thread = None
+logger_previsao = get_router_logger("previsao", registro=True)
+
+
+def executar_previsao():
+    with get_sessionmaker("escrita")() as db:
+        try:
+            return calcular_sugestoes(db)
+        except IntegrityError:
+            db.rollback()
+            return None
+
+
+def _loop():
+    while True:
+        try:
+            executar_previsao()
+        except SQLAlchemyError as e:
+            logger_previsao.error(
+                "",
+                extra={"ip": "N/A", "status": 500, "method": "N/A", "detail": f"Falha ao calcular sugestões de reposição: {e}"}
+            )
+        if _parar.wait(INTERVALO):
+            return
+
+
+def iniciar_previsao():
+    global _thread
+    if INTERVALO <= 0 or _thread is not None:
+        return
+    _parar.clear()
+    _thread = threading.Thread(target=_loop, name="previsao-reposicao", daemon=True)
+    _thread.start()
+
+
+def parar_previsao():
+    global _thread
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+    _thread = None
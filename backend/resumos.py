@@ -0,0 +1,217 @@
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import get_sessionmaker, upsert
+from logger import get_router_logger
+from models import Movimentacoes, Produto, ResumoMovimentacao, VersaoTabela
+from snapshots import dia_da_movimentacao
+from versoes import registrar_alteracao
+
+# -------------------------------------------------------------------
+# Resumos de BI (tabela bi_resumo_movimentacoes)
+# Cada movimentação soma (ou, ao ser excluída/alterada, subtrai) nos
+# totais do seu dia, semana e mês, para o produto, a categoria do
+# produto, o fornecedor e o tipo de pagamento. Tudo na mesma transação
+# da movimentação, então os totais nunca ficam "no meio do caminho".
+#
+# As movimentações que já existiam antes da tabela são somadas uma única
+# vez (preencher_resumos). A linha "bi_resumo" da versao_tabela marca que
+# esse preenchimento já foi feito e serve também de ETag para o /consulta/bi.
+# -------------------------------------------------------------------
+TABELA_VERSAO = "bi_resumo"
+PERIODOS = ("dia", "semana", "mes")
+DIMENSOES = ("produto", "categoria", "fornecedor", "tipo_pagamento")
+CAMPOS = ("produto_id", "data", "tipo_mov_id", "fornecedor_id", "tipo_pag_id", "quantidade", "preco_compra", "preco_venda")
+TAMANHO_LOTE = 1000
+
+_ativo = False   # True depois que o preenchimento inicial foi confirmado
+
+logger_resumos = get_router_logger("resumos", registro=True)
+
+
+def inicio_periodo(dia: date, periodo: str) -> date:
+    if periodo == "semana":
+        return dia - timedelta(days=dia.weekday())  # segunda-feira
+    if periodo == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def campos_movimentacao(mov) -> dict:
+    """Os campos que entram nos resumos (de um objeto Movimentacoes ou de um dict)."""
+    if isinstance(mov, dict):
+        return {campo: mov.get(campo) for campo in CAMPOS}
+    return {campo: getattr(mov, campo) for campo in CAMPOS}
+
+
+def novo_acumulador():
+    # (periodo, inicio, dimensao, chave, tipo_mov_id) -> [qtd, quantidade, preco_compra, preco_venda]
+    return defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+
+
+def acumular(acumulador, mov: dict, categoria_id, sinal: int = 1):
+    """Soma a movimentação (sinal=-1 para estornar) em todas as combinações período x dimensão."""
+    dia = dia_da_movimentacao(mov["data"])
+    chaves = {
+        "produto": mov["produto_id"],
+        "categoria": categoria_id or 0,
+        "fornecedor": mov["fornecedor_id"] or 0,
+        "tipo_pagamento": mov["tipo_pag_id"] or 0,
+    }
+    quantidade = Decimal(mov["quantidade"] or 0)
+    preco_compra = Decimal(mov["preco_compra"] or 0)
+    preco_venda = Decimal(mov["preco_venda"] or 0)
+
+    for periodo in PERIODOS:
+        inicio = inicio_periodo(dia, periodo)
+        for dimensao, chave in chaves.items():
+            totais = acumulador[(periodo, inicio, dimensao, chave, mov["tipo_mov_id"])]
+            totais[0] += sinal
+            totais[1] += sinal * quantidade
+            totais[2] += sinal * preco_compra
+            totais[3] += sinal * preco_venda
+
+
+def categorias_dos_produtos(db, produto_ids) -> dict:
+    produto_ids = {pid for pid in produto_ids if pid is not None}
+    if not produto_ids:
+        return {}
+    return dict(db.execute(select(Produto.id, Produto.categoria_id).where(Produto.id.in_(produto_ids))).all())
+
+
+def _stmt_somar(db):
+    # upsert que soma nos totais existentes (executemany: uma linha por chave)
+    tabela = ResumoMovimentacao.__table__
+    medidas = ("qtd_movimentacoes", "soma_quantidade", "soma_preco_compra", "soma_preco_venda")
+    return upsert(
+        db, tabela, [c.name for c in tabela.primary_key.columns],
+        lambda novo: {m: tabela.c[m] + novo[m] for m in medidas}
+    )
+
+
+def _gravar(db, acumulador):
+    linhas = [
+        {"periodo": periodo, "inicio": inicio, "dimensao": dimensao, "chave": chave, "tipo_mov_id": tipo_mov_id,
+         "qtd_movimentacoes": qtd, "soma_quantidade": quantidade,
+         "soma_preco_compra": preco_compra, "soma_preco_venda": preco_venda}
+        for (periodo, inicio, dimensao, chave, tipo_mov_id), (qtd, quantidade, preco_compra, preco_venda) in acumulador.items()
+        if qtd or quantidade or preco_compra or preco_venda
+    ]
+    if not linhas:
+        return
+    stmt = _stmt_somar(db)
+    for inicio in range(0, len(linhas), TAMANHO_LOTE):
+        db.execute(stmt, linhas[inicio:inicio + TAMANHO_LOTE])
+    registrar_alteracao(db, TABELA_VERSAO)
+
+
+def _resumos_ativos(db) -> bool:
+    """
+    True se o preenchimento inicial já foi feito. Enquanto ele roda, a linha
+    de versão fica travada: a escrita espera e só então soma a sua parte.
+    """
+    global _ativo
+    if not _ativo:
+        _ativo = db.scalar(
+            select(VersaoTabela.versao).where(VersaoTabela.tabela == TABELA_VERSAO).with_for_update()
+        ) is not None
+    return _ativo
+
+
+def atualizar_resumos(db, incluir=(), estornar=()):
+    """
+    Soma as movimentações de `incluir` e subtrai as de `estornar` (dicts
+    de campos_movimentacao). Chamar antes do commit da movimentação.
+    """
+    if not incluir and not estornar:
+        return
+    if not _resumos_ativos(db):
+        return  # o preenchimento inicial ainda vai somar essas movimentações
+
+    categorias = categorias_dos_produtos(db, [m["produto_id"] for m in (*incluir, *estornar)])
+    acumulador = novo_acumulador()
+    for mov in incluir:
+        acumular(acumulador, mov, categorias.get(mov["produto_id"]), 1)
+    for mov in estornar:
+        acumular(acumulador, mov, categorias.get(mov["produto_id"]), -1)
+    _gravar(db, acumulador)
+
+
+def mover_categoria(db, produto_id: int, categoria_antiga, categoria_nova):
+    """
+    Produto trocou de categoria: os totais dele saem da categoria antiga e
+    entram na nova (assim estornos futuros batem com o que foi somado).
+    """
+    if categoria_antiga == categoria_nova or not _resumos_ativos(db):
+        return
+
+    acumulador = novo_acumulador()
+    linhas = db.execute(
+        select(ResumoMovimentacao).where(
+            ResumoMovimentacao.dimensao == "produto", ResumoMovimentacao.chave == produto_id
+        )
+    ).scalars()
+    for linha in linhas:
+        totais = (linha.qtd_movimentacoes, linha.soma_quantidade, linha.soma_preco_compra, linha.soma_preco_venda)
+        for categoria, sinal in ((categoria_nova or 0, 1), (categoria_antiga or 0, -1)):
+            destino = acumulador[(linha.periodo, linha.inicio, "categoria", categoria, linha.tipo_mov_id)]
+            for i, valor in enumerate(totais):
+                destino[i] += sinal * valor
+    _gravar(db, acumulador)
+
+
+# -------------------------------------------------------------------
+# Preenchimento inicial (movimentações que existiam antes dos resumos)
+# -------------------------------------------------------------------
+def preencher_resumos(db) -> bool:
+    """
+    Soma todo o histórico nos resumos, uma única vez. A linha de versão é
+    incrementada primeiro (travada até o commit): outro worker que tente ao
+    mesmo tempo espera e depois vê que já foi feito. Retorna True se preencheu.
+
+    O incremento vem ANTES de qualquer leitura: no REPEATABLE READ do MySQL
+    um SELECT antes dele fixaria o snapshot da transação, e a conferência
+    depois da trava ainda veria a versão antiga.
+    """
+    global _ativo
+    registrar_alteracao(db, TABELA_VERSAO)
+    if db.scalar(select(VersaoTabela.versao).where(VersaoTabela.tabela == TABELA_VERSAO)) > 1:
+        # já preenchido (antes ou por outro worker enquanto esperávamos a trava):
+        # desfaz o incremento
+        db.rollback()
+        _ativo = True
+        return False
+
+    acumulador = novo_acumulador()
+    result = db.execute(
+        select(*(getattr(Movimentacoes, campo) for campo in CAMPOS), Produto.categoria_id)
+        .join(Produto, Produto.id == Movimentacoes.produto_id, isouter=True)
+        .execution_options(yield_per=TAMANHO_LOTE)
+    )
+    for row in result:
+        acumular(acumulador, campos_movimentacao(row._asdict()), row.categoria_id)
+
+    _gravar(db, acumulador)
+    db.commit()
+    _ativo = True
+    return True
+
+
+def preencher_em_segundo_plano():
+    """Roda o preenchimento inicial sem segurar o startup da API."""
+    def _executar():
+        try:
+            with get_sessionmaker("escrita")() as db:
+                preencher_resumos(db)
+        except SQLAlchemyError as e:
+            logger_resumos.error(
+                "",
+                extra={"ip": "N/A", "status": 500, "method": "N/A", "detail": f"Falha ao preencher os resumos de BI: {e}"}
+            )
+
+    threading.Thread(target=_executar, name="preencher-resumos-bi", daemon=True).start()
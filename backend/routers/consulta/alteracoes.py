@@ -0,0 +1,134 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Query, Depends
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
+from logger import get_router_logger
+from alteracoes import MODELOS, versao_atual, alteracoes_desde
+from serializacao import formatar, resposta, FORMATO_PAGINA_PATTERN
+
+router = APIRouter(
+    prefix="/consulta/changes",
+    tags=["Consulta - Alterações (sincronização incremental)"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("alteracoes", registro=False)
+
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 10000
+BLOCO_IDS = 500  # ids por SELECT ... WHERE id IN (...)
+
+
+def _tabelas(tabelas: Optional[str]):
+    if not tabelas:
+        return list(MODELOS)
+    pedidas = [t.strip() for t in tabelas.split(",") if t.strip()]
+    invalidas = [t for t in pedidas if t not in MODELOS]
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tabela(s) inválida(s): {', '.join(invalidas)}. Use: {', '.join(MODELOS)}"
+        )
+    return pedidas
+
+
+def _campos(modelo):
+    return tuple(coluna.name for coluna in modelo.__table__.columns)
+
+
+def _linhas(db: Session, modelo, ids=None):
+    """Linhas atuais da tabela (todas, ou só os ids pedidos, em blocos)."""
+    tabela = modelo.__table__
+    if ids is None:
+        return db.execute(select(tabela).order_by(tabela.c.id)).all()
+    ids = sorted(ids)
+    linhas = []
+    for inicio in range(0, len(ids), BLOCO_IDS):
+        bloco = ids[inicio:inicio + BLOCO_IDS]
+        linhas += db.execute(select(tabela).where(tabela.c.id.in_(bloco)).order_by(tabela.c.id)).all()
+    return linhas
+
+
+@router.get("/")
+def listar_alteracoes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Token da última sincronização (0 = carga completa)"),
+    tabelas: Optional[str] = Query(None, description="Tabelas separadas por vírgula (padrão: todas)"),
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO, description="Máximo de registros alterados por página"),
+    formato: str = Query("json", pattern=FORMATO_PAGINA_PATTERN),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Sincronização incremental: devolve só os registros alterados depois do
+    token `since`, com as linhas atuais ("alterados") e os ids apagados
+    ("removidos") de cada tabela, e o `token` para a próxima chamada.
+
+    since=0 é a carga completa (todas as linhas das tabelas pedidas).
+    Com mais=true ainda há alterações: chamar de novo com o token devolvido.
+    Como a página sempre corta entre duas transações e cada registro aparece
+    com o estado atual, reaplicar uma página é inofensivo.
+    """
+    pedidas = _tabelas(tabelas)
+    try:
+        # o token é lido antes das linhas, na mesma transação: o que for
+        # confirmado depois entra na próxima sincronização
+        token = versao_atual(db)
+        if since == 0:
+            resultado = {
+                tabela: {"alterados": formatar(_linhas(db, MODELOS[tabela]), _campos(MODELOS[tabela]), formato), "removidos": []}
+                for tabela in pedidas
+            }
+            mais = False
+        else:
+            entradas, mais = alteracoes_desde(db, since, pedidas, limite)
+            if mais:
+                token = entradas[-1].versao
+            elif entradas:
+                token = max(token, entradas[-1].versao)
+            else:
+                token = max(token, since)
+
+            alterados = {tabela: set() for tabela in pedidas}
+            removidos = {tabela: [] for tabela in pedidas}
+            for entrada in entradas:
+                if entrada.removido:
+                    removidos[entrada.tabela].append(entrada.registro_id)
+                else:
+                    alterados[entrada.tabela].add(entrada.registro_id)
+
+            resultado = {}
+            for tabela in pedidas:
+                modelo = MODELOS[tabela]
+                linhas = _linhas(db, modelo, alterados[tabela]) if alterados[tabela] else []
+                # marcada como alterada mas já não existe (apagada sem passar pelo log): vai como removida
+                removidos[tabela] += sorted(alterados[tabela] - {linha.id for linha in linhas})
+                resultado[tabela] = {
+                    "alterados": formatar(linhas, _campos(modelo), formato),
+                    "removidos": sorted(removidos[tabela]),
+                }
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Alterações consultadas desde {since} até {token} ({', '.join(pedidas)})"
+            }
+        )
+
+        return resposta({"token": token, "completo": since == 0, "mais": mais, "tabelas": resultado})
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao consultar alterações: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar alterações: {str(e)}")
@@ -0,0 +1,102 @@
+from typing import Optional, Literal
+
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
+from logger import get_router_logger
+from analise import obter_analise, resumo_classes
+
+router = APIRouter(
+    prefix="/consulta/analytics",
+    tags=["Consulta - Analytics"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("analytics", registro=False)
+
+
+@router.get("/produtos")
+def consultar_analytics_produtos(
+    request: Request,
+    dias: int = Query(90, ge=7, le=730, description="Janela de análise (últimos N dias)"),
+    classe_abc: Optional[Literal["A", "B", "C"]] = None,
+    classe_xyz: Optional[Literal["X", "Y", "Z"]] = None,
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Métricas por produto na janela: classe ABC (faturamento das saídas,
+    preco_venda x quantidade), classe XYZ (variação da demanda semanal),
+    giro de estoque e dias de cobertura (estoque atual / demanda diária média).
+    """
+    try:
+        itens = obter_analise(db, dias)
+        if classe_abc:
+            itens = [item for item in itens if item["classe_abc"] == classe_abc]
+        if classe_xyz:
+            itens = [item for item in itens if item["classe_xyz"] == classe_xyz]
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Analytics de produtos consultado ({dias} dias, {len(itens)} produto(s))"
+            }
+        )
+
+        return {"dias": dias, "itens": itens}
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao consultar analytics de produtos: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar analytics: {str(e)}")
+
+
+@router.get("/resumo")
+def consultar_analytics_resumo(
+    request: Request,
+    dias: int = Query(90, ge=7, le=730, description="Janela de análise (últimos N dias)"),
+    db: Session = Depends(get_db_leitura)
+):
+    """Quantidade de produtos em cada combinação ABC x XYZ e totais da janela."""
+    try:
+        itens = obter_analise(db, dias)
+        resumo = {
+            "dias": dias,
+            "produtos": len(itens),
+            "faturamento_total": round(sum(item["faturamento"] for item in itens), 2),
+            "matriz": resumo_classes(itens),
+            "sem_demanda": sum(1 for item in itens if not item["demanda_total"]),
+        }
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Resumo de analytics consultado ({dias} dias)"
+            }
+        )
+
+        return resumo
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao consultar resumo de analytics: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar analytics: {str(e)}")
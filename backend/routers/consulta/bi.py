@@ -0,0 +1,122 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import get_db_powerbi  # pool do perfil powerbi (credencial só de leitura do BI)
+from logger import get_router_logger
+from exportacao import stream_query, FORMATOS, FORMATO_PATTERN
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from resumos import TABELA_VERSAO
+
+router = APIRouter(
+    prefix="/consulta/bi",
+    tags=["Consulta - BI"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("bi", registro=False)
+
+
+def _row_to_dict(row):
+    return {
+        "periodo": row.periodo,
+        "inicio": row.inicio,
+        "dimensao": row.dimensao,
+        "chave": row.chave,
+        "tipo_mov_id": row.tipo_mov_id,
+        "qtd_movimentacoes": row.qtd_movimentacoes,
+        "soma_quantidade": row.soma_quantidade,
+        "soma_preco_compra": row.soma_preco_compra,
+        "soma_preco_venda": row.soma_preco_venda,
+    }
+
+
+@router.get("/resumo")
+def listar_resumo(
+    request: Request,
+    response: Response,
+    periodo: str = Query("mes", pattern="^(dia|semana|mes)$"),
+    dimensao: str = Query("produto", pattern="^(produto|categoria|fornecedor|tipo_pagamento)$"),
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    chave: Optional[int] = None,
+    tipo_mov_id: Optional[int] = None,
+    formato: str = Query("json", pattern=FORMATO_PATTERN),
+    db: Session = Depends(get_db_powerbi)
+):
+    """
+    Totais de movimentações (quantidade de movimentações, soma da quantidade,
+    de preco_compra e de preco_venda) por período e dimensão, já agregados.
+    'chave' é o id na dimensão escolhida (0 = sem fornecedor / sem pagamento).
+    Para carga do Power BI use formato=csv ou ndjson.
+    """
+    # linhas zeradas (todas as movimentações do período foram excluídas) ficam de fora
+    condicoes = ["periodo = :periodo", "dimensao = :dimensao", "qtd_movimentacoes <> 0"]
+    params = {"periodo": periodo, "dimensao": dimensao}
+    if inicio is not None:
+        condicoes.append("inicio >= :inicio")
+        params["inicio"] = inicio
+    if fim is not None:
+        condicoes.append("inicio <= :fim")
+        params["fim"] = fim
+    if chave is not None:
+        condicoes.append("chave = :chave")
+        params["chave"] = chave
+    if tipo_mov_id is not None:
+        condicoes.append("tipo_mov_id = :tipo_mov_id")
+        params["tipo_mov_id"] = tipo_mov_id
+    sql = (
+        "SELECT periodo, inicio, dimensao, chave, tipo_mov_id, qtd_movimentacoes, "
+        "soma_quantidade, soma_preco_compra, soma_preco_venda "
+        f"FROM bi_resumo_movimentacoes WHERE {' AND '.join(condicoes)} "
+        "ORDER BY inicio, chave, tipo_mov_id"
+    )
+
+    try:
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação do resumo por {dimensao}/{periodo} em {formato} iniciada"
+                }
+            )
+            return stream_query(sql, params, formato, f"resumo_{dimensao}_{periodo}", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, TABELA_VERSAO)
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        result = db.execute(text(sql), params).fetchall()
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Resumo por {dimensao}/{periodo} ({len(result)} linhas) realizado com sucesso"
+            }
+        )
+
+        return [_row_to_dict(row) for row in result]
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar resumo por {dimensao}/{periodo}: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar resumo de BI: {str(e)}")
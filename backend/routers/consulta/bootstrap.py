@@ -0,0 +1,173 @@
+import asyncio
+import os
+from typing import Callable, NamedTuple, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from database import get_sessionmaker, escolher_leitura, escreveu_recentemente
+from logger import get_router_logger
+from models import VersaoTabela
+from serializacao import RespostaComprimida, aceita_gzip, objetos
+from routers.consulta import categorias as con_categorias
+from routers.consulta import produtos as con_produtos
+from routers.consulta import fornecedores as con_fornecedores
+from routers.consulta import movimentacoes as con_movimentacoes
+from routers.consulta import tipoPagamento as con_tipoPagamento
+from routers.consulta import tipoMovimentacao as con_tipoMovimentacao
+
+router = APIRouter(
+    prefix="/consulta/bootstrap",
+    tags=["Consulta - Bootstrap (várias listagens de uma vez)"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("bootstrap", registro=False)
+
+# -------------------------------------------------------------------
+# Bootstrap das telas
+# Em vez de um GET por tabela, a tela pede as listagens que precisa numa
+# requisição só. Cada listagem é carregada numa thread com a sua própria
+# sessão (conexões do pool de leitura, todas na mesma réplica), no máximo
+# BOOTSTRAP_PARALELO ao mesmo tempo; as tabelas de referência saem do
+# mesmo cache em memória das listagens e só abrem sessão no miss.
+#
+# A versão de cada listagem é a da versao_tabela (a mesma do ETag). O
+# cliente manda as que já tem (?versoes=produtos:12,categorias:3) e as
+# que não mudaram voltam só em "inalterados", sem os dados.
+# -------------------------------------------------------------------
+PARALELO = int(os.getenv("BOOTSTRAP_PARALELO", "4"))
+
+
+class Dataset(NamedTuple):
+    tabela: str                    # linha da versao_tabela
+    carregar: Callable             # (fábrica de sessões) -> lista pronta para serializar
+
+
+def _com_sessao(fabrica, funcao):
+    with fabrica() as db:
+        return funcao(db)
+
+
+def _referencia(modulo):
+    # tabelas pequenas: mesmo cache da listagem (invalidado pelos routers de registro)
+    return lambda fabrica: modulo.cache_tabela.obter("lista", lambda: _com_sessao(fabrica, modulo._carregar))
+
+
+def _listagem(modulo):
+    # listagem completa (sem filtros), pelo mesmo leitor do GET da tabela
+    def carregar(db):
+        pagina = modulo.leitor.executar(db, modulo.leitor.consulta())
+        return objetos(pagina.linhas, pagina.campos)
+    return lambda fabrica: _com_sessao(fabrica, carregar)
+
+
+DATASETS = {
+    "categorias": Dataset("categoria", _referencia(con_categorias)),
+    "produtos": Dataset("produtos", _listagem(con_produtos)),
+    "fornecedores": Dataset("fornecedores", _listagem(con_fornecedores)),
+    "movimentacoes": Dataset("movimentacoes", _listagem(con_movimentacoes)),
+    "tipopagamento": Dataset("tipo_pagamento", _referencia(con_tipoPagamento)),
+    "tipomovimentacao": Dataset("tipo_movimentacao", _referencia(con_tipoMovimentacao)),
+}
+
+
+def _nomes(datasets: Optional[str]):
+    if not datasets:
+        return list(DATASETS)
+    nomes = list(dict.fromkeys(d.strip() for d in datasets.split(",") if d.strip()))
+    invalidos = [nome for nome in nomes if nome not in DATASETS]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Listagem(ns) inválida(s): {', '.join(invalidos)}. Use: {', '.join(DATASETS)}"
+        )
+    return nomes
+
+
+def _versoes_do_cliente(versoes: Optional[str]) -> dict:
+    """'produtos:12,categorias:3' -> {"produtos": 12, "categorias": 3}"""
+    conhecidas = {}
+    for item in (versoes or "").split(","):
+        if not item.strip():
+            continue
+        nome, _, versao = item.partition(":")
+        try:
+            conhecidas[nome.strip()] = int(versao)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Versão inválida em '{item}' (use listagem:versao)")
+    return conhecidas
+
+
+def _ler_versoes(fabrica, tabelas) -> dict:
+    """Versão atual de todas as tabelas numa query (vazio se a versao_tabela não existir)."""
+    try:
+        with fabrica() as db:
+            return dict(db.execute(
+                select(VersaoTabela.tabela, VersaoTabela.versao).where(VersaoTabela.tabela.in_(tabelas))
+            ).all())
+    except SQLAlchemyError:
+        return {}
+
+
+@router.get("/")
+async def bootstrap(
+    request: Request,
+    datasets: Optional[str] = Query(None, description=f"Listagens separadas por vírgula (padrão: todas). Opções: {', '.join(DATASETS)}"),
+    versoes: Optional[str] = Query(None, description="Versões que o cliente já tem, ex: produtos:12,categorias:3"),
+):
+    """
+    Várias listagens de consulta numa resposta só (gzip quando o cliente
+    aceita): {"versoes": {...}, "dados": {...}, "inalterados": [...]}.
+    Guardar "versoes" e mandá-las de volta na próxima chamada.
+    """
+    nomes = _nomes(datasets)
+    conhecidas = _versoes_do_cliente(versoes)
+    # todas as listagens na mesma engine (réplica, ou o escritor logo após uma escrita do cliente)
+    fabrica = get_sessionmaker("escrita" if escreveu_recentemente(request) else escolher_leitura())
+
+    try:
+        # versões antes dos dados: o que mudar no meio vem de novo na próxima chamada
+        atuais = await run_in_threadpool(_ler_versoes, fabrica, [DATASETS[nome].tabela for nome in nomes])
+        versoes_resposta = {nome: atuais.get(DATASETS[nome].tabela, 0) for nome in nomes}
+        inalterados = [
+            nome for nome in nomes
+            if atuais and nome in conhecidas and conhecidas[nome] == versoes_resposta[nome]
+        ]
+        pendentes = [nome for nome in nomes if nome not in inalterados]
+
+        limite = asyncio.Semaphore(PARALELO)
+
+        async def _carregar(nome):
+            async with limite:
+                return await run_in_threadpool(DATASETS[nome].carregar, fabrica)
+
+        resultados = await asyncio.gather(*(_carregar(nome) for nome in pendentes))
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Bootstrap: {', '.join(pendentes) or 'nada'} carregado(s), {len(inalterados)} inalterado(s)"
+            }
+        )
+
+        return RespostaComprimida(
+            {"versoes": versoes_resposta, "dados": dict(zip(pendentes, resultados)), "inalterados": inalterados},
+            comprimir=aceita_gzip(request),
+        )
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro no bootstrap: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro no bootstrap: {str(e)}")
@@ -0,0 +1,117 @@
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
+from logger import get_router_logger
+from models import Produto, Fornecedores, Categoria
+from busca import indice_busca
+
+router = APIRouter(
+    prefix="/consulta/busca",
+    tags=["Consulta - Busca"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("busca", registro=False)
+
+
+def _produto(row):
+    return {"id": row.id, "nome": row.nome, "medida": row.medida, "qtd_disponivel": row.qtd_disponivel,
+            "qtd_minima": row.qtd_minima, "categoria_id": row.categoria_id, "status": row.status}
+
+
+def _fornecedor(row):
+    return {"id": row.id, "razao_social": row.razao_social, "contato": row.contato, "email": row.email,
+            "cnpj": row.cnpj, "status": row.status}
+
+
+def _categoria(row):
+    return {"id": row.id, "descricao": row.descricao}
+
+
+# tipo -> (model, conversão da linha)
+MODELOS = {
+    "produto": (Produto, _produto),
+    "fornecedor": (Fornecedores, _fornecedor),
+    "categoria": (Categoria, _categoria),
+}
+
+
+def _carregar_dados(db: Session, encontrados):
+    """
+    Busca os registros completos só dos ids encontrados (consulta por chave
+    primária), assim o estoque e o contato vêm sempre atualizados do banco.
+    """
+    ids_por_tipo = {}
+    for _, tipo, id_, _ in encontrados:
+        ids_por_tipo.setdefault(tipo, []).append(id_)
+
+    dados = {}
+    for tipo, ids in ids_por_tipo.items():
+        model, converter = MODELOS[tipo]
+        for row in db.execute(select(model.__table__).where(model.id.in_(ids))):
+            dados[(tipo, row.id)] = converter(row)
+    return dados
+
+
+@router.get("/")
+def buscar(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    tipo: Optional[str] = Query(None, pattern="^(produto|fornecedor|categoria)$"),
+    limite: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Busca por nome de produto, razão social / CNPJ / e-mail de fornecedor e
+    descrição de categoria. Ignora acentos e maiúsculas, aceita pedaço do
+    começo da palavra e pequenos erros de digitação. Resultados do mais
+    relevante para o menos relevante.
+    """
+    try:
+        indice_busca.garantir_atualizado()
+
+        inicio = time.perf_counter()
+        encontrados = indice_busca.buscar(q, tipos={tipo} if tipo else None, limite=limite)
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+
+        dados = _carregar_dados(db, encontrados)
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Busca '{q}' retornou {len(encontrados)} resultado(s) em {tempo_ms:.3f} ms"
+            }
+        )
+
+        return {
+            "itens": [
+                {"tipo": tipo_doc, "id": id_, "titulo": titulo, "score": score, "dados": dados.get((tipo_doc, id_))}
+                for score, tipo_doc, id_, titulo in encontrados
+                if (tipo_doc, id_) in dados  # removido por outro worker e o índice ainda não viu
+            ],
+            "tempo_ms": round(tempo_ms, 3),
+        }
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar '{q}': {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar: {str(e)}")
+
+
+@router.get("/stats")
+def status_indice():
+    """Tamanho do índice de busca deste processo"""
+    return indice_busca.stats()
@@ -0,0 +1,72 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
+from logger import get_router_logger
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from snapshots import estoque_em
+
+router = APIRouter(
+    prefix="/consulta/estoque",
+    tags=["Consulta - Estoque"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("estoque", registro=False)
+
+
+@router.get("/em")
+def consultar_estoque_em(
+    request: Request,
+    response: Response,
+    data: date,
+    produto_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Estoque de fechamento dos produtos no dia informado (ex: ?data=2024-05-31).
+
+    Parte do snapshot diário mais próximo e soma só as movimentações entre
+    ele e o dia pedido, sem percorrer todo o histórico.
+    """
+    try:
+        # GET condicional: o resultado só muda quando há movimentação/produto novo
+        etag = calcular_etag(db, request, "movimentacoes", "produtos")
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        itens = estoque_em(db, data, produto_id=produto_id, categoria_id=categoria_id)
+        if produto_id is not None and not itens:
+            raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado")
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Estoque em {data.isoformat()} consultado ({len(itens)} produto(s))"
+            }
+        )
+
+        return {"data": data, "itens": itens}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao consultar estoque em {data}: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar estoque: {str(e)}")
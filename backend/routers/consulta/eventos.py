@@ -0,0 +1,94 @@
+from typing import Optional
+
+from fastapi import APIRouter, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from logger import get_router_logger
+from eventos import broker, HEARTBEAT
+from serializacao import dumps
+
+router = APIRouter(
+    prefix="/consulta/eventos",
+    tags=["Consulta - Eventos (feed de alterações)"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("eventos", registro=False)
+
+RETRY_MS = 3000  # quanto o EventSource do navegador espera para reconectar
+
+
+def _ultimo_id(valor: Optional[str]):
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return 0  # id inválido: cai no "reset" e o cliente recarrega
+
+
+def _filtro(tipos: Optional[str]):
+    """tipos=produto,estoque -> só eventos desses grupos (reset e ping passam sempre)."""
+    grupos = {t.strip() for t in (tipos or "").split(",") if t.strip()}
+    if not grupos:
+        return lambda evento: True
+    return lambda evento: evento.tipo == "reset" or evento.tipo.split(".", 1)[0] in grupos
+
+
+@router.get("/")
+async def assinar_sse(
+    request: Request,
+    tipos: Optional[str] = Query(None, description="Grupos de eventos separados por vírgula (produto, movimentacao, estoque)"),
+    ultimo_id: Optional[str] = Query(None, description="Retoma depois deste id (o navegador manda Last-Event-ID sozinho)"),
+):
+    """
+    Feed de alterações em Server-Sent Events (EventSource no navegador).
+    Cada evento vem com id, event (tipo) e data (JSON); a cada
+    EVENTOS_HEARTBEAT segundos sem nada vai um comentário de ping.
+    """
+    inicio = _ultimo_id(request.headers.get("last-event-id") or ultimo_id)
+    aceita = _filtro(tipos)
+
+    async def gerar():
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        async for evento in broker.assinar(inicio, HEARTBEAT):
+            if evento is None:
+                yield b": ping\n\n"
+            elif aceita(evento):
+                yield b"id: %d\nevent: %s\ndata: %s\n\n" % (evento.id, evento.tipo.encode(), dumps(evento.dados))
+
+    logger_consulta.info(
+        "",
+        extra={
+            "ip": request.client.host,
+            "status": 200,
+            "method": request.method,
+            "detail": f"Assinatura SSE do feed de alterações (a partir de {inicio or 'agora'})"
+        }
+    )
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # sem buffer no nginx
+    )
+
+
+@router.websocket("/ws")
+async def assinar_websocket(websocket: WebSocket, tipos: Optional[str] = None, ultimo_id: Optional[str] = None):
+    """
+    O mesmo feed por WebSocket: cada mensagem é {"id", "tipo", "dados"}
+    (pings como {"tipo": "ping"}). Para retomar, conectar com ?ultimo_id=.
+    """
+    await websocket.accept()
+    aceita = _filtro(tipos)
+    try:
+        async for evento in broker.assinar(_ultimo_id(ultimo_id), HEARTBEAT):
+            if evento is None:
+                await websocket.send_text('{"tipo":"ping"}')
+            elif aceita(evento):
+                await websocket.send_text(dumps({"id": evento.id, "tipo": evento.tipo, "dados": evento.dados}).decode())
+    except (WebSocketDisconnect, RuntimeError, OSError):
+        pass  # cliente desconectou (o ping seguinte falha e encerra a assinatura)
+
+
+@router.get("/status")
+def status_eventos():
+    """Último id publicado, eventos no histórico e assinantes conectados neste processo."""
+    return broker.status()
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, Request
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from config import load_config
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
 from logger import get_router_logger
+from exportacao import stream_query, FORMATOS
+from serializacao import listagem, FORMATO_LISTAGEM_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from leitor import LeitorTabela, Parametros, parametros_leitura, aplicar_cabecalhos  # filter/sort/fields/paginação
+from models import Fornecedores
 
 
 router = APIRouter(
@@ -13,22 +17,47 @@ router = APIRouter(
 # Logger de consulta - manter registro=false para não cair na pasta de logs de registro
 logger_consulta = get_router_logger("fornecedores", registro=False)
 
-def create_db_session(env_type: str):
-    DATABASE_URL, ENV_TYPE = load_config(env_type)
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal, ENV_TYPE
+
+# campos devolvidos, nessa ordem (são os nomes que o JS usa)
+CAMPOS = ("id", "razao_social", "contato", "email", "cnpj", "status")
+
+leitor = LeitorTabela(
+    Fornecedores.__table__, CAMPOS, ordem="razao_social",
+    filtros=("id", "razao_social", "contato", "email", "cnpj", "status"),
+    ordenacao=("razao_social", "cnpj", "status"),
+)
+
 
 @router.get("/")
 
 
-def listar_fornecedores(request: Request):  # request necessário para pegar IP e método
-    SessionLocal, ENV_TYPE = create_db_session("leitura")
-    db = SessionLocal()
+def listar_fornecedores(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: Session = Depends(get_db_leitura)):  # request necessário para pegar IP e método
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
     try:
-        
-        result = db.execute(text("SELECT * FROM fornecedores ORDER BY razao_social")).fetchall()
-        
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de fornecedores em {formato} iniciada"
+                }
+            )
+            return stream_query(*leitor.montar_exportacao(consulta), formato, "fornecedores", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = leitor.executar(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
         logger_consulta.info(
             "",  # mensagem principal vazia porque usamos 'extra' para detalhes
             extra={
@@ -39,17 +68,8 @@ def listar_fornecedores(request: Request):  # request necessário para pegar IP
             }
         )
 
-        return [
-            {
-                "id": row.id,  # o nome definido nas aspas é o nome final que vai ser encontrado pelo JS
-                "razao_social": row.razao_social,
-                "contato": row.contato,
-                "email": row.email,
-                "cnpj": row.cnpj,
-                "status": row.status
-            } 
-            for row in result
-        ]
+        # direto para bytes (orjson), sem o jsonable_encoder; formato=colunar manda colunas + linhas
+        return listagem(pagina.linhas, pagina.campos, formato, response)
 
     except Exception as e:
         logger_consulta.error(
@@ -62,6 +82,3 @@ def listar_fornecedores(request: Request):  # request necessário para pegar IP
             }
         )
         raise HTTPException(status_code=500, detail=f"Erro ao buscar fornecedores: {str(e)}")
-
-    finally:
-        db.close()  # fecha a sessão do banco para liberar recursos
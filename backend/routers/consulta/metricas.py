@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from database import pool_stats
+from metricas import registro_metricas
+
+router = APIRouter(tags=["Métricas"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metricas_prometheus():
+    """
+    Métricas deste processo no formato texto do Prometheus: requisições,
+    duração (histograma), queries, tempo de banco e de serialização por
+    rota, requisições acima dos limites e uso dos pools de conexão.
+    """
+    linhas = [
+        "# HELP dogstock_pool_conexoes_em_uso Conexões emprestadas do pool",
+        "# TYPE dogstock_pool_conexoes_em_uso gauge",
+    ]
+    for perfil, stats in pool_stats().items():
+        linhas.append(f'dogstock_pool_conexoes_em_uso{{perfil="{perfil}"}} {stats["em_uso"]}')
+    return registro_metricas.prometheus() + "\n".join(linhas) + "\n"
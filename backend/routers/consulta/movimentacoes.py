@@ -1,29 +1,144 @@
-from fastapi import APIRouter, HTTPException, Request
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from config import load_config
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
 from logger import get_router_logger
+from exportacao import stream_query, FORMATOS
+from serializacao import listagem, formatar, resposta, FORMATO_LISTAGEM_PATTERN, FORMATO_PAGINA_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from leitor import LeitorTabela, Relacao, Parametros, parametros_leitura, filtros_da_url, aplicar_cabecalhos  # filter/sort/fields/paginação
+from models import Movimentacoes, Produto, Fornecedores, TipoPagamento, TipoMovimentacao
 
 router = APIRouter(
-    prefix="/consulta/movimentacoes", 
-    tags=["Consulta - Tabela movimentacoes"]) 
+    prefix="/consulta/movimentacoes",
+    tags=["Consulta - Tabela movimentacoes"])
 
 # Logger de consulta - manter registro=false para não cair na pasta de logs de registro
 logger_consulta = get_router_logger("movimentacoes", registro=False)
 
-def create_db_session(env_type: str):
-    DATABASE_URL, ENV_TYPE = load_config(env_type)
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal, ENV_TYPE
+# Limite máximo de linhas por página (o cliente não consegue pedir mais que isso)
+LIMITE_MAXIMO = 500
+
+# campos devolvidos, nessa ordem (são os nomes que o JS usa)
+CAMPOS = ("id", "produto_id", "quantidade", "data", "tipo_mov_id", "preco_venda", "preco_compra", "fornecedor_id", "tipo_pag_id")
+
+# ?expand=produto,fornecedor,...: nomes das tabelas relacionadas no MESMO SELECT
+# (LEFT JOIN pela chave, sem uma query por linha). Cada expansão acrescenta só as
+# colunas de rótulo, com o prefixo da relação: produto_nome, fornecedor_razao_social...
+# Os mesmos campos também podem ser pedidos direto em ?fields=.
+_movimentacoes = Movimentacoes.__table__
+_produtos = Produto.__table__.alias("p")
+_fornecedores = Fornecedores.__table__.alias("f")
+_tipo_pagamento = TipoPagamento.__table__.alias("tp")
+_tipo_movimentacao = TipoMovimentacao.__table__.alias("tm")
+
+RELACOES = {
+    "produto": Relacao(_produtos, _produtos.c.id == _movimentacoes.c.produto_id,
+                       {"produto_nome": _produtos.c.nome, "produto_medida": _produtos.c.medida}),
+    "fornecedor": Relacao(_fornecedores, _fornecedores.c.id == _movimentacoes.c.fornecedor_id,
+                          {"fornecedor_razao_social": _fornecedores.c.razao_social}),
+    "tipo_pagamento": Relacao(_tipo_pagamento, _tipo_pagamento.c.id == _movimentacoes.c.tipo_pag_id,
+                              {"tipo_pagamento_descricao": _tipo_pagamento.c.descricao}),
+    "tipo_movimentacao": Relacao(_tipo_movimentacao, _tipo_movimentacao.c.id == _movimentacoes.c.tipo_mov_id,
+                                 {"tipo_movimentacao_descricao": _tipo_movimentacao.c.descricao}),
+}
+EXPAND_DESCRICAO = f"Relações com o nome resolvido, separadas por vírgula: {', '.join(RELACOES)}"
+
+# filtros e ordenação só nas colunas cobertas pelos índices (filtro, data, id) do model
+leitor = LeitorTabela(
+    _movimentacoes, CAMPOS, ordem="id",
+    filtros=("id", "produto_id", "tipo_mov_id", "fornecedor_id", "tipo_pag_id", "data"),
+    ordenacao=("data",),
+    relacoes=RELACOES,
+)
+
+
+def _expansoes(expand: Optional[str]):
+    """'produto,fornecedor' -> ("produto", "fornecedor") na ordem de RELACOES; 400 se vier uma desconhecida."""
+    pedidas = {e.strip() for e in (expand or "").split(",") if e.strip()}
+    invalidas = sorted(pedidas - set(RELACOES))
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expansão inválida: {', '.join(invalidas)}. Use: {', '.join(RELACOES)}"
+        )
+    return tuple(nome for nome in RELACOES if nome in pedidas)
+
+
+def _filtros(produto_id, tipo_mov_id, fornecedor_id, tipo_pag_id, data_inicio, data_fim):
+    """Parâmetros antigos da URL (?produto_id=...&data_inicio=...) como filtros do leitor."""
+    filtros = [
+        (campo, "eq", valor)
+        for campo, valor in (
+            ("produto_id", produto_id),
+            ("tipo_mov_id", tipo_mov_id),
+            ("fornecedor_id", fornecedor_id),
+            ("tipo_pag_id", tipo_pag_id),
+        )
+        if valor is not None
+    ]
+    if data_inicio is not None:
+        filtros.append(("data", "gte", data_inicio))
+    if data_fim is not None:
+        filtros.append(("data", "lte", data_fim))
+    return tuple(filtros)
+
+
+def _consulta_pagina(request: Request, cursor, limite, ordem, filtros, expansoes):
+    """Consulta do /pagina: keyset em (data, id) no sentido pedido (desc = mais recentes primeiro)."""
+    parametros = Parametros(
+        filtros_da_url(request),
+        sort="-data" if ordem == "desc" else "data",
+        limite=limite,
+        cursor=cursor,
+    )
+    return leitor.consulta(parametros, filtros, expansoes)
+
 
 @router.get("/")
-def listar_movimentacoes(request: Request):
-    SessionLocal, ENV_TYPE = create_db_session("leitura")
-    db = SessionLocal()
+def listar_movimentacoes(
+    request: Request,
+    response: Response,
+    produto_id: Optional[int] = None,
+    tipo_mov_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    tipo_pag_id: Optional[int] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRICAO),
+    parametros: Parametros = Depends(parametros_leitura),
+    db: Session = Depends(get_db_leitura)
+):
+    filtros = _filtros(produto_id, tipo_mov_id, fornecedor_id, tipo_pag_id, data_inicio, data_fim)
+    consulta = leitor.consulta(parametros, filtros, _expansoes(expand), exportacao=formato in FORMATOS)
     try:
-        result = db.execute(text("SELECT * FROM movimentacoes ORDER BY id")).fetchall() 
-        
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de movimentacoes em {formato} iniciada"
+                }
+            )
+            return stream_query(*leitor.montar_exportacao(consulta), formato, "movimentacoes", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = leitor.executar(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
         logger_consulta.info(
             "",  #mensagem principal vazia porque usamos 'extra' para detalhes
             extra={
@@ -33,20 +148,9 @@ def listar_movimentacoes(request: Request):
                 "detail": "Listagem de movimentacoes realizada com sucesso"  # descrição detalhada
             }
         )
-        
-        return [
-            {
-                "id": row.id, #o nome definido nas aspas é o nome final que vai ser encontrado pelo JS, independentemente do nome da tabela.
-                "produto_id": row.produto_id, 
-                "quantidade": row.quantidade, 
-                "data": row.data,
-                "tipo_mov_id": row.tipo_mov_id, 
-                "preco_venda": row.preco_venda,
-                "preco_compra": row.preco_compra,  
-                "fornecedor_id": row.fornecedor_id, 
-                "tipo_pag_id": row.tipo_pag_id
-            } for row in result
-        ]
+
+        # direto para bytes (orjson), sem o jsonable_encoder; formato=colunar manda colunas + linhas
+        return listagem(pagina.linhas, pagina.campos, formato, response)
     except Exception as e:
         logger_consulta.error(
             "",  # mensagem principal vazia porque usamos 'extra' para detalhes
@@ -59,5 +163,73 @@ def listar_movimentacoes(request: Request):
         )
         raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentacoes: {str(e)}")
 
-    finally:
-        db.close()
+
+@router.get("/pagina")
+def paginar_movimentacoes(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limite: int = Query(100, ge=1, le=LIMITE_MAXIMO),
+    ordem: str = Query("desc", pattern="^(asc|desc)$"),
+    produto_id: Optional[int] = None,
+    tipo_mov_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    tipo_pag_id: Optional[int] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    formato: str = Query("json", pattern=FORMATO_PAGINA_PATTERN),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRICAO),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Lista movimentações em páginas usando paginação por cursor (keyset) em (data, id).
+
+    Em vez de OFFSET (que obriga o banco a ler e descartar todas as linhas
+    anteriores), cada página continua exatamente de onde a anterior parou:
+    o cliente devolve o 'proximo_cursor' recebido e o banco usa o índice
+    (data, id) para pular direto até lá.
+
+    expand=produto,tipo_pagamento,... traz junto o nome das relações
+    (produto_nome, tipo_pagamento_descricao...) com JOIN na mesma query.
+    Aceita também os filter[...] das listagens.
+    """
+    filtros = _filtros(produto_id, tipo_mov_id, fornecedor_id, tipo_pag_id, data_inicio, data_fim)
+    consulta = _consulta_pagina(request, cursor, limite, ordem, filtros, _expansoes(expand))
+
+    try:
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = leitor.executar(db, consulta)
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Página de movimentacoes ({len(pagina.linhas)} itens) realizada com sucesso"
+            }
+        )
+
+        return resposta({
+            "itens": formatar(pagina.linhas, pagina.campos, formato),
+            "proximo_cursor": pagina.proximo_cursor,
+            "limite": limite,
+        }, response)
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao paginar movimentacoes: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentacoes: {str(e)}")
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException, Request
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from config import load_config
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy import text, bindparam, Numeric
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
 from logger import get_router_logger
+from exportacao import stream_query, FORMATOS
+from serializacao import listagem, FORMATO_LISTAGEM_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from leitor import LeitorTabela, Parametros, parametros_leitura, aplicar_cabecalhos  # filter/sort/fields/paginação
+from models import Produto
 
 router = APIRouter(
     prefix="/consulta/produtos", 
@@ -12,21 +20,58 @@ router = APIRouter(
 # Logger de consulta - manter registro=false para não cair na pasta de logs de registro
 logger_consulta = get_router_logger("produtos", registro=False)
 
-def create_db_session(env_type: str):
-    DATABASE_URL, ENV_TYPE = load_config(env_type)
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal, ENV_TYPE
+
+# campos devolvidos, nessa ordem (são os nomes que o JS usa)
+CAMPOS = ("id", "nome", "medida", "qtd_disponivel", "qtd_minima", "categoria_id", "status")
+
+leitor = LeitorTabela(
+    Produto.__table__, CAMPOS, ordem="id",
+    filtros=("id", "nome", "medida", "qtd_disponivel", "qtd_minima", "categoria_id", "status"),
+    ordenacao=("nome", "qtd_disponivel", "qtd_minima", "categoria_id", "status"),
+)
+
+
+def _row_to_dict(row):
+    return {"id": row.id,  #o nome definido nas aspas é o nome final que vai ser encontrado pelo JS, independentemente do nome da tabela.
+            "nome": row.nome,
+            "medida": row.medida,
+            "qtd_disponivel": row.qtd_disponivel,
+            "qtd_minima": row.qtd_minima,
+            "categoria_id": row.categoria_id,
+            "status": row.status
+            }
+
 
 @router.get("/")
 
 
-def listar_produtos(request: Request):
-    SessionLocal, ENV_TYPE = create_db_session("leitura")
-    db = SessionLocal()
+def listar_produtos(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: Session = Depends(get_db_leitura)):
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
     try:
-        result = db.execute(text("SELECT * FROM produtos ORDER BY id")).fetchall()
-        
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de produtos em {formato} iniciada"
+                }
+            )
+            return stream_query(*leitor.montar_exportacao(consulta), formato, "produtos", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = leitor.executar(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
         logger_consulta.info(
             "",  #mensagem principal vazia porque usamos 'extra' para detalhes
             extra={
@@ -36,16 +81,9 @@ def listar_produtos(request: Request):
                 "detail": "Listagem de produtos realizada com sucesso"  
             }
         )
-        
-        
-        return [{"id": row.id,  #o nome definido nas aspas é o nome final que vai ser encontrado pelo JS, independentemente do nome da tabela.
-                 "nome": row.nome, 
-                 "medida": row.medida, 
-                 "qtd_disponivel": row.qtd_disponivel,
-                 "qtd_minima": row.qtd_minima, 
-                 "categoria_id": row.categoria_id,
-                 "status": row.status
-                 } for row in result]
+
+        # direto para bytes (orjson), sem o jsonable_encoder; formato=colunar manda colunas + linhas
+        return listagem(pagina.linhas, pagina.campos, formato, response)
     except Exception as e:
         logger_consulta.error(
             "",  #mensagem principal vazia porque usamos 'extra' para detalhes
@@ -58,5 +96,86 @@ def listar_produtos(request: Request):
         )
         raise HTTPException(status_code=500, detail=f"Erro ao buscar produtos: {str(e)}")
 
-    finally:
-        db.close()
\ No newline at end of file
+
+# "falta" = quanto o produto está abaixo do mínimo. A expressão é exatamente
+# a mesma do índice funcional declarado no model (ix_produtos_falta), senão
+# o MySQL não usa o índice.
+EXPR_FALTA = "(qtd_minima - qtd_disponivel)"
+
+
+def _sql_estoque_baixo(margem: Decimal, categoria_id: Optional[int], pagina: int, limite: int):
+    """Monta as queries (total e página) do estoque baixo e os parâmetros."""
+    # qtd_disponivel <= qtd_minima + margem  <=>  falta >= -margem
+    condicoes = [f"{EXPR_FALTA} >= :limiar"]
+    params = {"limiar": -margem, "limite": limite, "offset": (pagina - 1) * limite}
+    if categoria_id is not None:
+        condicoes.append("categoria_id = :categoria_id")
+        params["categoria_id"] = categoria_id
+    where = " AND ".join(condicoes)
+
+    # tipa o parâmetro decimal (o driver recebe o valor já convertido)
+    limiar = bindparam("limiar", type_=Numeric(10, 3))
+    sql_total = text(f"SELECT COUNT(*) FROM produtos WHERE {where}").bindparams(limiar)
+    sql_itens = text(
+        f"SELECT id, nome, medida, qtd_disponivel, qtd_minima, categoria_id, status, {EXPR_FALTA} AS falta "
+        f"FROM produtos WHERE {where} "
+        f"ORDER BY {EXPR_FALTA} DESC, id LIMIT :limite OFFSET :offset"
+    ).bindparams(limiar)
+    return sql_total, sql_itens, params
+
+
+@router.get("/estoque-baixo")
+def listar_estoque_baixo(
+    request: Request,
+    response: Response,
+    margem: Decimal = Query(Decimal("0"), ge=0),
+    categoria_id: Optional[int] = None,
+    pagina: int = Query(1, ge=1),
+    limite: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Produtos com qtd_disponivel <= qtd_minima + margem, do maior para o menor déficit.
+
+    O filtro e a ordenação rodam no banco (usando o índice sobre a falta),
+    em vez de baixar todos os produtos e filtrar no navegador.
+    """
+    try:
+        etag = calcular_etag(db, request, "produtos")
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        sql_total, sql_itens, params = _sql_estoque_baixo(margem, categoria_id, pagina, limite)
+        total = db.execute(sql_total, params).scalar()
+        result = db.execute(sql_itens, params).fetchall()
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Listagem de estoque baixo realizada com sucesso ({total} produto(s))"
+            }
+        )
+
+        return {
+            "itens": [{**_row_to_dict(row), "falta": row.falta} for row in result],
+            "total": total,
+            "pagina": pagina,
+            "limite": limite,
+        }
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar produtos com estoque baixo: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar produtos com estoque baixo: {str(e)}")
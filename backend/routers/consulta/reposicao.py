@@ -0,0 +1,100 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
+from logger import get_router_logger
+from models import Produto, SugestaoReposicao
+from previsao import qtd_sugerida_atual
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+
+router = APIRouter(
+    prefix="/consulta/reposicao",
+    tags=["Consulta - Reposição"]
+)
+
+# Logger de consulta - manter registro=false para não cair na pasta de logs de registro
+logger_consulta = get_router_logger("reposicao", registro=False)
+
+
+def _row_to_dict(row):
+    return {
+        "produto_id": row.produto_id,
+        "nome": row.nome,
+        "qtd_disponivel": row.qtd_disponivel,
+        "qtd_minima": row.qtd_minima,
+        "demanda_diaria": row.demanda_diaria,
+        "prazo_entrega_dias": row.prazo_entrega_dias,
+        "estoque_seguranca": row.estoque_seguranca,
+        "ponto_pedido": row.ponto_pedido,
+        "qtd_sugerida": row.qtd_sugerida,
+        "calculado_em": row.calculado_em,
+    }
+
+
+@router.get("/")
+def listar_sugestoes(
+    request: Request,
+    response: Response,
+    apenas_sugeridas: bool = False,
+    categoria_id: Optional[int] = None,
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Ponto de pedido e quantidade sugerida de compra por produto, a partir
+    da previsão de demanda (job de previsao.py). A quantidade sugerida é
+    calculada na consulta com o saldo atual (uma entrada depois do job já
+    zera a sugestão). apenas_sugeridas=true lista só os produtos que estão
+    no ponto de pedido agora.
+    """
+    try:
+        # GET condicional: muda quando o job recalcula ou quando um produto muda
+        etag = calcular_etag(db, request, "sugestao_reposicao", "produtos")
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        qtd_sugerida = qtd_sugerida_atual().label("qtd_sugerida")
+        query = (
+            select(
+                SugestaoReposicao.produto_id, Produto.nome, Produto.qtd_disponivel, Produto.qtd_minima,
+                SugestaoReposicao.demanda_diaria, SugestaoReposicao.prazo_entrega_dias,
+                SugestaoReposicao.estoque_seguranca, SugestaoReposicao.ponto_pedido,
+                qtd_sugerida, SugestaoReposicao.calculado_em,
+            )
+            .join(Produto, Produto.id == SugestaoReposicao.produto_id)
+        )
+        if apenas_sugeridas:
+            query = query.where(qtd_sugerida > 0)
+        if categoria_id is not None:
+            query = query.where(Produto.categoria_id == categoria_id)
+        query = query.order_by(qtd_sugerida.desc(), SugestaoReposicao.produto_id)
+
+        itens = [_row_to_dict(row) for row in db.execute(query)]
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Sugestões de reposição consultadas ({len(itens)} produto(s))"
+            }
+        )
+
+        return itens
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao consultar sugestões de reposição: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar sugestões de reposição: {str(e)}")
@@ -1,29 +1,45 @@
 from fastapi import APIRouter
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from config import load_config
+from sqlalchemy import text
+from database import PERFIS, get_sessionmaker, pool_stats, get_roteador
+from cache import cache_stats
 
-router = APIRouter(prefix="/consulta/teste-banco", tags=["Teste de Credenciais"])   
-
-def create_db_session(env_type: str):
-    """Cria engine e session para o env_type especificado"""
-    DATABASE_URL, ENV_TYPE = load_config(env_type)
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal, ENV_TYPE
+router = APIRouter(prefix="/consulta/teste-banco", tags=["Teste de Credenciais"])
 
 @router.get("/")
 def teste_db():
     resultados = {}
-    for env in ["leitura", "escrita", "admin", "powerbi"]:
-        SessionLocal, ENV_TYPE = create_db_session(env)
-        db = SessionLocal()
+    for env in PERFIS:
+        try:
+            # usa a engine (pool) do perfil, criada uma única vez no processo
+            db = get_sessionmaker(env)()
+        except Exception as e:
+            resultados[env] = {"status": "erro", "mensagem": str(e)}
+            continue
         try:
             # SQLAlchemy 2.x exige text() para queries textuais
             result = db.execute(text("SELECT 1")).fetchone()
-            resultados[ENV_TYPE] = {"status": "ok", "result": result[0]}
+            resultados[env] = {"status": "ok", "result": result[0]}
         except Exception as e:
-            resultados[ENV_TYPE] = {"status": "erro", "mensagem": str(e)}
+            resultados[env] = {"status": "erro", "mensagem": str(e)}
         finally:
             db.close()
-    return resultados
\ No newline at end of file
+    return resultados
+
+@router.get("/pool")
+def status_pool():
+    """Mostra o uso dos pools de conexão de cada perfil já inicializado"""
+    from database_async import async_pool_stats
+    return {**pool_stats(), **{f"{perfil}_async": stats for perfil, stats in async_pool_stats().items()}}
+
+@router.get("/replicas")
+def status_replicas():
+    """Réplicas de leitura configuradas e se estão respondendo (true) ou fora da escolha (false)"""
+    roteador = get_roteador()
+    if roteador is None:
+        return {"replicas": False}
+    return {"estrategia": roteador.estrategia, "status": roteador.status()}
+
+@router.get("/cache")
+def status_cache():
+    """Hits, misses e invalidações dos caches de tabelas de referência"""
+    return cache_stats()
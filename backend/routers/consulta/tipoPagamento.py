@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Request
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from config import load_config
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.orm import Session
+from database import get_db_leitura  # sessão do pool de leitura (engine compartilhada)
 from logger import get_router_logger
+from exportacao import stream_query, FORMATOS, FORMATO_PATTERN
+from versoes import calcular_etag, nao_modificado, resposta_304  # ETag / 304
+from serializacao import objetos, listagem
+from leitor import LeitorTabela, Parametros, parametros_leitura, aplicar_cabecalhos  # filter/sort/fields/paginação
+from models import TipoPagamento
+from cache import get_cache
 
 router = APIRouter(
     prefix="/consulta/tipopagamento",
@@ -12,20 +17,59 @@ router = APIRouter(
 
 logger_consulta = get_router_logger("tipo_pagamento", registro=False)
 
-def create_db_session(env_type: str):
-    DATABASE_URL, ENV_TYPE = load_config(env_type)
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal, ENV_TYPE
+
+# Cache da listagem (invalidado pelo router de registro da mesma tabela)
+cache_tabela = get_cache("tipo_pagamento")
+
+# campos devolvidos, nessa ordem (são os nomes que o JS usa)
+CAMPOS = ("id", "descricao", "status")
+
+leitor = LeitorTabela(
+    TipoPagamento.__table__, CAMPOS, ordem="id",
+    filtros=("id", "descricao", "status"),
+    ordenacao=("descricao", "status"),
+)
+
+
+def _carregar(db: Session):
+    """Busca a tabela no banco (só é chamada quando o cache está vazio ou expirado)."""
+    pagina = leitor.executar(db, leitor.consulta())
+    return objetos(pagina.linhas, pagina.campos)
+
 
 @router.get("/")
-def listar_pagamentos(request: Request):
-    SessionLocal, ENV_TYPE = create_db_session("leitura")
-    db = SessionLocal()
+def listar_pagamentos(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: Session = Depends(get_db_leitura)):
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
     try:
-        result = db.execute(
-            text("SELECT id, descricao, status FROM tipo_pagamento ORDER BY id")
-        ).fetchall()
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de tipo_pagamento em {formato} iniciada"
+                }
+            )
+            return stream_query(*leitor.montar_exportacao(consulta), formato, "tipo_pagamento", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = calcular_etag(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        if consulta.padrao:
+            # lista completa: lê do cache em memória; só vai ao banco em caso de miss/expiração
+            dados = cache_tabela.obter("lista", lambda: _carregar(db))
+        else:
+            # com filter/sort/fields/paginação a consulta vai direto ao banco
+            pagina = leitor.executar(db, consulta)
+            aplicar_cabecalhos(response, pagina)
+            dados = listagem(pagina.linhas, pagina.campos, "json", response)
 
         logger_consulta.info(
             "",  
@@ -37,10 +81,7 @@ def listar_pagamentos(request: Request):
             }
         )
 
-        return [
-            {"id": row.id, "descricao": row.descricao, "status": row.status}  # Adicionado 'status'
-            for row in result
-        ]
+        return dados
     except Exception as e:
         logger_consulta.error(
             "",  # mensagem principal vazia porque usamos 'extra' para detalhes
@@ -54,5 +95,3 @@ def listar_pagamentos(request: Request):
         raise HTTPException(
             status_code=500, detail=f"Erro interno ao buscar tipos de pagamento: {str(e)}"
         )
-    finally:
-        db.close()
\ No newline at end of file
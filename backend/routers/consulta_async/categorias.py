@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database_async import get_async_db_leitura  # sessão async do pool de leitura
+from exportacao import stream_query_async, FORMATOS, FORMATO_PATTERN
+from versoes import calcular_etag_async, nao_modificado, resposta_304  # ETag / 304
+from serializacao import objetos, listagem
+from leitor import Parametros, parametros_leitura, aplicar_cabecalhos
+
+# mesmo leitor, cache e logger da versão síncrona (o registro invalida o mesmo cache)
+from routers.consulta.categorias import leitor, logger_consulta, cache_tabela
+
+router = APIRouter(
+    prefix="/consulta/categorias",
+    tags=["Consulta - Tabela categorias"]
+)
+
+
+async def _carregar(db: AsyncSession):
+    """Busca a tabela no banco (só é chamada quando o cache está vazio ou expirado)."""
+    pagina = await leitor.executar_async(db, leitor.consulta())
+    return objetos(pagina.linhas, pagina.campos)
+
+
+@router.get("/")
+async def listar_categorias(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: AsyncSession = Depends(get_async_db_leitura)):
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
+    try:
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de categorias em {formato} iniciada"
+                }
+            )
+            return stream_query_async(*leitor.montar_exportacao(consulta), formato, "categorias", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = await calcular_etag_async(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        if consulta.padrao:
+            # lista completa: lê do cache em memória; só vai ao banco em caso de miss/expiração
+            dados = await cache_tabela.obter_async("lista", lambda: _carregar(db))
+        else:
+            # com filter/sort/fields/paginação a consulta vai direto ao banco
+            pagina = await leitor.executar_async(db, consulta)
+            aplicar_cabecalhos(response, pagina)
+            dados = listagem(pagina.linhas, pagina.campos, "json", response)
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": "Listagem de categorias realizada com sucesso"
+            }
+        )
+
+        return dados
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar categorias: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar categorias: {str(e)}")
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database_async import get_async_db_leitura  # sessão async do pool de leitura
+from exportacao import stream_query_async, FORMATOS
+from serializacao import listagem, FORMATO_LISTAGEM_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag_async, nao_modificado, resposta_304  # ETag / 304
+from leitor import Parametros, parametros_leitura, aplicar_cabecalhos
+
+# mesmas queries, conversão e logger da versão síncrona
+from routers.consulta.fornecedores import leitor, logger_consulta
+
+router = APIRouter(
+    prefix="/consulta/fornecedores",
+    tags=["Consulta - Tabela fornecedores"]
+)
+
+
+@router.get("/")
+async def listar_fornecedores(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: AsyncSession = Depends(get_async_db_leitura)):
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
+    try:
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de fornecedores em {formato} iniciada"
+                }
+            )
+            return stream_query_async(*leitor.montar_exportacao(consulta), formato, "fornecedores", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = await calcular_etag_async(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = await leitor.executar_async(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": "Listagem de fornecedores realizada com sucesso"
+            }
+        )
+
+        return listagem(pagina.linhas, pagina.campos, formato, response)
+
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar fornecedores: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar fornecedores: {str(e)}")
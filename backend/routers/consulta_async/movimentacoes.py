@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database_async import get_async_db_leitura  # sessão async do pool de leitura
+from exportacao import stream_query_async, FORMATOS
+from serializacao import listagem, formatar, resposta, FORMATO_LISTAGEM_PATTERN, FORMATO_PAGINA_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag_async, nao_modificado, resposta_304  # ETag / 304
+from leitor import Parametros, parametros_leitura, aplicar_cabecalhos
+
+# mesmo leitor, filtros e logger da versão síncrona
+from routers.consulta.movimentacoes import (
+    LIMITE_MAXIMO, EXPAND_DESCRICAO, logger_consulta, leitor, _expansoes, _filtros, _consulta_pagina
+)
+
+router = APIRouter(
+    prefix="/consulta/movimentacoes",
+    tags=["Consulta - Tabela movimentacoes"])
+
+
+@router.get("/")
+async def listar_movimentacoes(
+    request: Request,
+    response: Response,
+    produto_id: Optional[int] = None,
+    tipo_mov_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    tipo_pag_id: Optional[int] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRICAO),
+    parametros: Parametros = Depends(parametros_leitura),
+    db: AsyncSession = Depends(get_async_db_leitura)
+):
+    filtros = _filtros(produto_id, tipo_mov_id, fornecedor_id, tipo_pag_id, data_inicio, data_fim)
+    consulta = leitor.consulta(parametros, filtros, _expansoes(expand), exportacao=formato in FORMATOS)
+    try:
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de movimentacoes em {formato} iniciada"
+                }
+            )
+            return stream_query_async(*leitor.montar_exportacao(consulta), formato, "movimentacoes", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = await calcular_etag_async(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = await leitor.executar_async(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": "Listagem de movimentacoes realizada com sucesso"
+            }
+        )
+
+        return listagem(pagina.linhas, pagina.campos, formato, response)
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar movimentacoes: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentacoes: {str(e)}")
+
+
+@router.get("/pagina")
+async def paginar_movimentacoes(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limite: int = Query(100, ge=1, le=LIMITE_MAXIMO),
+    ordem: str = Query("desc", pattern="^(asc|desc)$"),
+    produto_id: Optional[int] = None,
+    tipo_mov_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    tipo_pag_id: Optional[int] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    formato: str = Query("json", pattern=FORMATO_PAGINA_PATTERN),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRICAO),
+    db: AsyncSession = Depends(get_async_db_leitura)
+):
+    """
+    Lista movimentações em páginas usando paginação por cursor (keyset) em (data, id).
+    """
+    filtros = _filtros(produto_id, tipo_mov_id, fornecedor_id, tipo_pag_id, data_inicio, data_fim)
+    consulta = _consulta_pagina(request, cursor, limite, ordem, filtros, _expansoes(expand))
+
+    try:
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = await calcular_etag_async(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = await leitor.executar_async(db, consulta)
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Página de movimentacoes ({len(pagina.linhas)} itens) realizada com sucesso"
+            }
+        )
+
+        return resposta({
+            "itens": formatar(pagina.linhas, pagina.campos, formato),
+            "proximo_cursor": pagina.proximo_cursor,
+            "limite": limite,
+        }, response)
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao paginar movimentacoes: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar movimentacoes: {str(e)}")
@@ -0,0 +1,123 @@
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database_async import get_async_db_leitura  # sessão async do pool de leitura
+from exportacao import stream_query_async, FORMATOS
+from serializacao import listagem, FORMATO_LISTAGEM_PATTERN  # JSON rápido / colunar
+from versoes import calcular_etag_async, nao_modificado, resposta_304  # ETag / 304
+from leitor import Parametros, parametros_leitura, aplicar_cabecalhos
+
+# mesmas queries, conversão e logger da versão síncrona
+from routers.consulta.produtos import leitor, logger_consulta, _row_to_dict, _sql_estoque_baixo
+
+router = APIRouter(
+    prefix="/consulta/produtos",
+    tags=["Consulta - Tabela produtos"])
+
+
+@router.get("/")
+async def listar_produtos(request: Request, response: Response, formato: str = Query("json", pattern=FORMATO_LISTAGEM_PATTERN), parametros: Parametros = Depends(parametros_leitura), db: AsyncSession = Depends(get_async_db_leitura)):
+    consulta = leitor.consulta(parametros, exportacao=formato in FORMATOS)
+    try:
+        if formato in FORMATOS:
+            # exportação em streaming (ndjson/csv) com cursor no servidor
+            logger_consulta.info(
+                "",
+                extra={
+                    "ip": request.client.host,
+                    "status": 200,
+                    "method": request.method,
+                    "detail": f"Exportação de produtos em {formato} iniciada"
+                }
+            )
+            return stream_query_async(*leitor.montar_exportacao(consulta), formato, "produtos", db)
+
+        # GET condicional: se o cliente já tem esta versão, responde 304 sem montar a lista
+        etag = await calcular_etag_async(db, request, *leitor.tabelas(consulta))
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        pagina = await leitor.executar_async(db, consulta)
+        aplicar_cabecalhos(response, pagina)  # X-Total-Count / X-Proximo-Cursor
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": "Listagem de produtos realizada com sucesso"
+            }
+        )
+
+        return listagem(pagina.linhas, pagina.campos, formato, response)
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar produtos: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar produtos: {str(e)}")
+
+
+@router.get("/estoque-baixo")
+async def listar_estoque_baixo(
+    request: Request,
+    response: Response,
+    margem: Decimal = Query(Decimal("0"), ge=0),
+    categoria_id: Optional[int] = None,
+    pagina: int = Query(1, ge=1),
+    limite: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db_leitura)
+):
+    """
+    Produtos com qtd_disponivel <= qtd_minima + margem, do maior para o menor déficit.
+    """
+    try:
+        etag = await calcular_etag_async(db, request, "produtos")
+        if nao_modificado(request, etag):
+            return resposta_304(etag)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # navegador revalida com If-None-Match
+
+        sql_total, sql_itens, params = _sql_estoque_baixo(margem, categoria_id, pagina, limite)
+        total = (await db.execute(sql_total, params)).scalar()
+        result = (await db.execute(sql_itens, params)).fetchall()
+
+        logger_consulta.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": request.method,
+                "detail": f"Listagem de estoque baixo realizada com sucesso ({total} produto(s))"
+            }
+        )
+
+        return {
+            "itens": [{**_row_to_dict(row), "falta": row.falta} for row in result],
+            "total": total,
+            "pagina": pagina,
+            "limite": limite,
+        }
+    except Exception as e:
+        logger_consulta.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "detail": f"Erro ao buscar produtos com estoque baixo: {str(e)}",
+                "method": request.method
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar produtos com estoque baixo: {str(e)}")
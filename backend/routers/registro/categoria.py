@@ -1,11 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from database import get_db  # função que retorna a sessão do SQLAlchemy
 from models import Categoria   # modelo SQLAlchemy da tabela Categoria
 # Pydantic para validação de entrada e saída
 from schemas import CategoriaCreate, CategoriaResponse
 from logger import get_router_logger
+from versoes import registrar_alteracao
+from alteracoes import registrar_linhas  # log do /consulta/changes
+from busca import indice_busca, VERSAO_BUSCA  # índice da /consulta/busca
+import cache  # cache da consulta desta tabela
+from integridade import inserir, atualizar, erro_de_integridade  # unicidade pelas constraints do banco
 
 # =========================
 # CONFIGURAÇÃO DO ROUTER
@@ -29,38 +34,21 @@ def criar_Categoria(categoria: CategoriaCreate, request: Request, db: Session =
 
     Passos:
     1. Recebe os dados validados pelo Pydantic (CategoriaCreate)
-    2. Verifica se já existe um Categoria com o mesmo nome (unicidade)
-    3. Insere no banco se não existir
-    4. Retorna o objeto criado (CategoriaResponse)
+    2. Insere no banco (descrição repetida é barrada pela constraint UNIQUE
+       e volta como 409)
+    3. Retorna o objeto criado (CategoriaResponse) com o id devolvido pelo INSERT
 
     """
+    valores = categoria.model_dump()
     try:
-        # 1️.Verificação de existência
-        existente = db.query(Categoria).filter(
-            Categoria.descricao == categoria.descricao).first()
-        if existente:
-            # Log de aviso caso Categoria já exista
-            logger_registro.warning(
-                "Tentativa de criar categoria existente",  # mensagem principal preenchida
-                extra={
-                    "ip": request.client.host,
-                    "status": 400,
-                    "method": "POST",
-                    "detail": f"Falha ao criar Categoria: Categoria '{categoria.descricao}' já existe"
-                }
-            )
-            raise HTTPException(status_code=400, detail="Categoria já existe")
-
-        # 2️. Criação do objeto SQLAlchemy
-        novo_Categoria = Categoria(
-            descricao=categoria.descricao
-        )
-
-        # 3️. Adiciona e confirma no banco
-        db.add(novo_Categoria)
+        # 1️. INSERT (sem SELECT antes para checar a descrição nem refresh depois)
+        novo_id = inserir(db, Categoria, valores)
+        registrar_alteracao(db, "categoria", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "categoria", novo_id)
         db.commit()
-        # atualiza o objeto com o ID gerado pelo banco
-        db.refresh(novo_Categoria)
+        cache.invalidar("categorias")  # próxima consulta já lê a tabela atualizada
+        novo_Categoria = CategoriaResponse(id=novo_id, **valores)
+        indice_busca.atualizar_categoria(novo_Categoria)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -73,9 +61,24 @@ def criar_Categoria(categoria: CategoriaCreate, request: Request, db: Session =
             }
         )
 
-        # 4️. Retorno do objeto criado (Pydantic converte para JSON)
+        # 2️. Retorno do objeto criado (Pydantic converte para JSON)
         return novo_Categoria
 
+    except IntegrityError as e:
+        # Descrição repetida: nada é gravado
+        db.rollback()
+        erro = erro_de_integridade(e, "Categoria", valores)
+        logger_registro.warning(
+            "Tentativa de criar categoria existente",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "POST",
+                "detail": f"Falha ao criar Categoria: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         # Desfaz a transação em caso de erro de banco
         db.rollback()
@@ -121,16 +124,14 @@ def atualizar_Categoria(
 
     Passos:
     1. Recebe o ID da categoria a ser atualizada e os novos dados (CategoriaCreate).
-    2. Busca a categoria no banco.
-    3. Se encontrar, atualiza a descrição (garantindo unicidade).
-    4. Se não encontrar, retorna 404.
+    2. Atualiza a descrição com um UPDATE direto (descrição de outra
+       categoria é barrada pela constraint UNIQUE e volta como 409).
+    3. Se o ID não existir, retorna 404.
     """
+    valores = categoria_update.model_dump()
     try:
-        # 1️. Busca a categoria pelo ID
-        db_categoria = db.query(Categoria).filter(
-            Categoria.id == categoria_id).first()
-
-        if not db_categoria:
+        # 1️. UPDATE pelo ID (sem SELECT antes nem refresh depois)
+        if not atualizar(db, Categoria, categoria_id, valores):
             logger_registro.warning(
                 "Tentativa de atualizar categoria inexistente",
                 extra={
@@ -143,29 +144,13 @@ def atualizar_Categoria(
             raise HTTPException(
                 status_code=404, detail=f"Categoria com ID {categoria_id} não encontrada")
 
-        # 2️. Verifica se a nova descrição já existe em outra categoria (para manter a unicidade)
-        if db_categoria.descricao != categoria_update.descricao:
-            existente = db.query(Categoria).filter(
-                Categoria.descricao == categoria_update.descricao).first()
-            if existente and existente.id != categoria_id:
-                logger_registro.warning(
-                    "Tentativa de atualizar categoria para uma descrição existente",
-                    extra={
-                        "ip": request.client.host,
-                        "status": 400,
-                        "method": "PUT",
-                        "detail": f"Falha ao atualizar Categoria: Descrição '{categoria_update.descricao}' já existe em outra categoria."
-                    }
-                )
-                raise HTTPException(
-                    status_code=400, detail=f"A descrição '{categoria_update.descricao}' já existe em outra categoria.")
-
-        # 3️. Aplica a atualização
-        db_categoria.descricao = categoria_update.descricao
-
-        # 4️. Confirma no banco
+        # 2️. Confirma no banco
+        registrar_alteracao(db, "categoria", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "categoria", categoria_id)
         db.commit()
-        db.refresh(db_categoria)  # atualiza o objeto
+        cache.invalidar("categorias")  # próxima consulta já lê a tabela atualizada
+        db_categoria = CategoriaResponse(id=categoria_id, **valores)
+        indice_busca.atualizar_categoria(db_categoria)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -178,13 +163,29 @@ def atualizar_Categoria(
             }
         )
 
-        # 5️. Retorno do objeto atualizado
+        # 3️. Retorno do objeto atualizado
         return db_categoria
 
     except HTTPException:
-        # Re-lança exceções HTTP já tratadas (404, 400)
+        # Re-lança exceções HTTP já tratadas (404)
+        db.rollback()
         raise
 
+    except IntegrityError as e:
+        # Descrição de outra categoria: nada é gravado
+        db.rollback()
+        erro = erro_de_integridade(e, "Categoria", valores)
+        logger_registro.warning(
+            "Tentativa de atualizar categoria para uma descrição existente",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "PUT",
+                "detail": f"Falha ao atualizar Categoria ID {categoria_id}: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -245,7 +246,11 @@ def delete_categoria(categoria_id: int, request: Request, db: Session = Depends(
 
         # 2. Deleta e confirma no banco
         db.delete(db_item)
+        registrar_alteracao(db, "categoria", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "categoria", categoria_id, removido=True)
         db.commit()
+        cache.invalidar("categorias")  # próxima consulta já lê a tabela atualizada
+        indice_busca.remover("categoria", categoria_id)  # índice da /consulta/busca
 
         logger_registro.info(
             "Categoria excluída com sucesso",
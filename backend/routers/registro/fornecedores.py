@@ -1,11 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from database import get_db  # função que retorna a sessão do SQLAlchemy
 from models import Fornecedores   # modelo SQLAlchemy da tabela fornecedors
 # Pydantic para validação de entrada e saída
 from schemas import FornecedoresCreate, FornecedoresResponse
 from logger import get_router_logger
+from versoes import registrar_alteracao
+from alteracoes import registrar_linhas  # log do /consulta/changes
+from busca import indice_busca, VERSAO_BUSCA  # índice da /consulta/busca
+from integridade import inserir, atualizar, erro_de_integridade  # unicidade pelas constraints do banco
 
 # =========================
 # CONFIGURAÇÃO DO ROUTER
@@ -29,41 +33,19 @@ def criar_fornecedor(fornecedor: FornecedoresCreate, request: Request, db: Sessi
 
     Passos:
     1. Recebe os dados validados pelo Pydantic (fornecedorCreate)
-    2. Verifica se já existe um fornecedor com o mesmo razao_social (unicidade)
-    3. Insere no banco se não existir
-    4. Retorna o objeto criado (fornecedorResponse)
+    2. Insere no banco (razao_social, email ou cnpj repetidos são barrados
+       pelas constraints UNIQUE e voltam como 409)
+    3. Retorna o objeto criado (fornecedorResponse) com o id devolvido pelo INSERT
     """
+    valores = fornecedor.model_dump()
     try:
-        # 1️.Verificação de existência
-        existente = db.query(Fornecedores).filter(
-            Fornecedores.razao_social == fornecedor.razao_social).first()
-        if existente:
-            # Log de aviso caso fornecedor já exista
-            logger_registro.warning(
-                "Tentativa de criar fornecedor existente",
-                extra={
-                    "ip": request.client.host,
-                    "status": 400,
-                    "method": "POST",
-                    "detail": f"Falha ao criar fornecedor: fornecedor '{fornecedor.razao_social}' já existe"
-                }
-            )
-            raise HTTPException(status_code=400, detail="fornecedor já existe")
-
-        # 2️. Criação do objeto SQLAlchemy
-        novo_fornecedor = Fornecedores(
-            razao_social=fornecedor.razao_social,
-            contato=fornecedor.contato,
-            email=fornecedor.email,
-            cnpj=fornecedor.cnpj,
-            status=fornecedor.status
-        )
-
-        # 3️. Adiciona e confirma no banco
-        db.add(novo_fornecedor)
+        # 1️. INSERT (sem SELECT antes para checar a unicidade nem refresh depois)
+        novo_id = inserir(db, Fornecedores, valores)
+        registrar_alteracao(db, "fornecedores", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "fornecedores", novo_id)
         db.commit()
-        # atualiza o objeto com o ID gerado pelo banco
-        db.refresh(novo_fornecedor)
+        novo_fornecedor = FornecedoresResponse(id=novo_id, **valores)
+        indice_busca.atualizar_fornecedor(novo_fornecedor)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -76,9 +58,24 @@ def criar_fornecedor(fornecedor: FornecedoresCreate, request: Request, db: Sessi
             }
         )
 
-        # 4️. Retorno do objeto criado (Pydantic converte para JSON)
+        # 2️. Retorno do objeto criado (Pydantic converte para JSON)
         return novo_fornecedor
 
+    except IntegrityError as e:
+        # Razão social, email ou cnpj já cadastrados: nada é gravado
+        db.rollback()
+        erro = erro_de_integridade(e, "Fornecedor", valores)
+        logger_registro.warning(
+            "Tentativa de criar fornecedor existente",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "POST",
+                "detail": f"Falha ao criar fornecedor: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         # Desfaz a transação em caso de erro de banco
         db.rollback()
@@ -124,16 +121,14 @@ def atualizar_fornecedor(
 
     Passos:
     1. Recebe o ID do fornecedor a ser atualizado e os novos dados (FornecedoresCreate).
-    2. Busca o fornecedor no banco.
-    3. Se encontrar, atualiza todos os campos (garantindo unicidade de razao_social se for alterada).
-    4. Se não encontrar, retorna 404.
+    2. Atualiza todos os campos com um UPDATE direto (razao_social, email ou
+       cnpj de outro fornecedor são barrados pelas constraints UNIQUE e voltam como 409).
+    3. Se o ID não existir, retorna 404.
     """
+    valores = fornecedor_update.model_dump()
     try:
-        # 1️. Busca o fornecedor pelo ID
-        db_fornecedor = db.query(Fornecedores).filter(
-            Fornecedores.id == fornecedor_id).first()
-
-        if not db_fornecedor:
+        # 1️. UPDATE pelo ID (sem SELECT antes nem refresh depois)
+        if not atualizar(db, Fornecedores, fornecedor_id, valores):
             logger_registro.warning(
                 "Tentativa de atualizar fornecedor inexistente",
                 extra={
@@ -146,33 +141,12 @@ def atualizar_fornecedor(
             raise HTTPException(
                 status_code=404, detail=f"Fornecedor com ID {fornecedor_id} não encontrado")
 
-        # 2️. Verifica se a nova razao_social já existe em outro fornecedor (para manter a unicidade)
-        if db_fornecedor.razao_social != fornecedor_update.razao_social:
-            existente = db.query(Fornecedores).filter(
-                Fornecedores.razao_social == fornecedor_update.razao_social).first()
-            if existente and existente.id != fornecedor_id:
-                logger_registro.warning(
-                    "Tentativa de atualizar fornecedor para uma razao_social existente",
-                    extra={
-                        "ip": request.client.host,
-                        "status": 400,
-                        "method": "PUT",
-                        "detail": f"Falha ao atualizar Fornecedor: Razão Social '{fornecedor_update.razao_social}' já existe."
-                    }
-                )
-                raise HTTPException(
-                    status_code=400, detail=f"A Razão Social '{fornecedor_update.razao_social}' já existe.")
-
-        # 3️. Aplica as atualizações em todos os campos
-        db_fornecedor.razao_social = fornecedor_update.razao_social
-        db_fornecedor.contato = fornecedor_update.contato
-        db_fornecedor.email = fornecedor_update.email
-        db_fornecedor.cnpj = fornecedor_update.cnpj
-        db_fornecedor.status = fornecedor_update.status
-
-        # 4️. Confirma no banco
+        # 2️. Confirma no banco
+        registrar_alteracao(db, "fornecedores", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "fornecedores", fornecedor_id)
         db.commit()
-        db.refresh(db_fornecedor)  # atualiza o objeto
+        db_fornecedor = FornecedoresResponse(id=fornecedor_id, **valores)
+        indice_busca.atualizar_fornecedor(db_fornecedor)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -185,13 +159,29 @@ def atualizar_fornecedor(
             }
         )
 
-        # 5️. Retorno do objeto atualizado
+        # 3️. Retorno do objeto atualizado
         return db_fornecedor
 
     except HTTPException:
-        # Re-lança exceções HTTP já tratadas (404, 400)
+        # Re-lança exceções HTTP já tratadas (404)
+        db.rollback()
         raise
 
+    except IntegrityError as e:
+        # Razão social, email ou cnpj de outro fornecedor: nada é gravado
+        db.rollback()
+        erro = erro_de_integridade(e, "Fornecedor", valores)
+        logger_registro.warning(
+            "Tentativa de atualizar fornecedor para dados já existentes",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "PUT",
+                "detail": f"Falha ao atualizar Fornecedor ID {fornecedor_id}: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -255,7 +245,10 @@ def delete_fornecedor(fornecedor_id: int, request: Request, db: Session = Depend
 
         # 2. Deleta e confirma no banco
         db.delete(db_item)
+        registrar_alteracao(db, "fornecedores", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        registrar_linhas(db, "fornecedores", fornecedor_id, removido=True)
         db.commit()
+        indice_busca.remover("fornecedor", fornecedor_id)  # índice da /consulta/busca
 
         logger_registro.info(
             "Fornecedor excluído com sucesso",
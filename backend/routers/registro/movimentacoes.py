@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, status
+import json
+from decimal import Decimal
+
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from database import get_db  # função que retorna a sessão do SQLAlchemy
-from models import Movimentacoes   # modelo SQLAlchemy da tabela Categoria
+from models import Movimentacoes, Produto, TipoMovimentacao, Fornecedores, TipoPagamento
 from schemas import MovimentacoesCreate, MovimentacoesResponse  # Pydantic para validação de entrada e saída
 from logger import get_router_logger
+from versoes import registrar_alteracao
+from estoque import calcular_delta, aplicar_deltas, novo_acumulador  # saldo do produto (qtd_disponivel)
+from snapshots import ajustar_snapshots, dia_da_movimentacao  # correção de snapshots em datas retroativas
+from resumos import atualizar_resumos, campos_movimentacao  # totais de BI (bi_resumo_movimentacoes)
+from previsao import marcar_recalculo  # previsão de demanda (sugestao_reposicao)
+from integridade import validar_referencias, inserir, converter_data
+from eventos import publicar  # feed de alterações (/consulta/eventos)
+from alteracoes import registrar_linhas  # log do /consulta/changes
 
 # =========================
 # CONFIGURAÇÃO DO ROUTER
@@ -18,41 +32,59 @@ router = APIRouter(
 logger_registro = get_router_logger("movimentacoes", registro=True)
 
 
+def _data(valor):
+    try:
+        return converter_data(valor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Data da movimentação inválida: {valor}")
+
+
+def _dia(valor):
+    try:
+        return dia_da_movimentacao(valor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Data da movimentação inválida: {valor}")
+
+
 # =========================
 # ROTA DE CRIAÇÃO DE Categoria
 # =========================
 @router.post("/", response_model=MovimentacoesResponse)
 def criar_Movimentacao(movimentacoes: MovimentacoesCreate, request: Request, db: Session = Depends(get_db)):
     """
-    Cria uma nova categoria na tabela 'movimentacoes'.
+    Cria uma nova movimentação na tabela 'movimentacoes'.
     
     Passos:
     1. Recebe os dados validados pelo Pydantic (MovimentacoesCreate)
-    2. Verifica se já existe um Categoria com o mesmo nome (unicidade)
-    3. Insere no banco se não existir
-    4. Retorna o objeto criado (MovimentacoesResponse)
+    2. Confere produto, tipo, fornecedor e tipo de pagamento numa query só
+    3. Trava o produto (SELECT ... FOR UPDATE) e aplica a quantidade no saldo
+       (soma se o tipo for entrada, subtrai se for saída)
+    4. Insere a movimentação (o id vem do próprio INSERT) e confirma tudo
+       na mesma transação
+    5. Retorna o objeto criado (MovimentacoesResponse)
     """
 
-        # 1️.Verificação de existência
     try:
+        # 1️. Chaves estrangeiras (uma query) e sentido do tipo de movimentação
+        sinal = validar_referencias(db, movimentacoes)
+        delta = sinal * movimentacoes.quantidade
+        data = _data(movimentacoes.data)
 
-            # 2️. Criação do objeto SQLAlchemy
-        nova_movimentacao = Movimentacoes(
-                produto_id=movimentacoes.produto_id,
-                quantidade=movimentacoes.quantidade,
-                data=movimentacoes.data,
-                tipo_mov_id=movimentacoes.tipo_mov_id,
-                preco_venda=movimentacoes.preco_venda,
-                preco_compra=movimentacoes.preco_compra,
-                fornecedor_id=movimentacoes.fornecedor_id,
-                tipo_pag_id=movimentacoes.tipo_pag_id
-                       
-            )
+        # 2️. Atualiza o saldo do produto (ainda sem commit)
+        aplicar_deltas(db, {movimentacoes.produto_id: delta})
+        ajustes = {(movimentacoes.produto_id, data.date()): delta}
+        ajustar_snapshots(db, ajustes)
+        marcar_recalculo(db, ajustes)
 
-            # 3️. Adiciona e confirma no banco
-        db.add(nova_movimentacao)
+        # 3️. Insere e confirma no banco (movimentação + saldo juntos)
+        valores = movimentacoes.model_dump()
+        novo_id = inserir(db, Movimentacoes, {**valores, "data": data})
+        atualizar_resumos(db, incluir=[campos_movimentacao(valores)])
+        nova_movimentacao = MovimentacoesResponse(id=novo_id, **valores)
+        registrar_alteracao(db, "movimentacoes", "produtos")  # versão da tabela (ETag das consultas)
+        publicar(db, "movimentacao.registrada", nova_movimentacao.model_dump())  # feed, depois do commit
+        registrar_linhas(db, "movimentacoes", novo_id)  # o saldo dos produtos entra pelo aplicar_deltas
         db.commit()
-        db.refresh(nova_movimentacao)  # atualiza o objeto com o ID gerado pelo banco
 
         # Log de sucesso
         logger_registro.info(
@@ -68,6 +100,20 @@ def criar_Movimentacao(movimentacoes: MovimentacoesCreate, request: Request, db:
             # 4️. Retorno do objeto criado (Pydantic converte para JSON)
         return nova_movimentacao
 
+    except HTTPException as e:
+        # Tipo de movimentação ou produto inválido: nada é gravado
+        db.rollback()
+        logger_registro.warning(
+            "Movimentação recusada",
+            extra={
+                "ip": request.client.host,
+                "status": e.status_code,
+                "method": "POST",
+                "detail": f"Falha ao registrar movimentação: {e.detail}"
+            }
+        )
+        raise
+
     except SQLAlchemyError as e:
         # Desfaz a transação em caso de erro de banco
         db.rollback()
@@ -109,13 +155,14 @@ def atualizar_movimentacao(
     
     Passos:
     1. Recebe o ID da movimentação e os novos dados (MovimentacoesCreate).
-    2. Busca a movimentação no banco.
-    3. Se encontrar, atualiza todos os campos de forma dinâmica.
+    2. Busca (e trava) a movimentação no banco.
+    3. Se encontrar, desfaz o efeito antigo no saldo, atualiza todos os campos
+       de forma dinâmica e aplica o efeito novo, tudo na mesma transação.
     4. Se não encontrar, retorna 404.
     """
     try:
         # 1️. Busca a movimentação pelo ID
-        db_movimentacao = db.query(Movimentacoes).filter(Movimentacoes.id == movimentacao_id).first()
+        db_movimentacao = db.query(Movimentacoes).filter(Movimentacoes.id == movimentacao_id).with_for_update().first()
 
         if not db_movimentacao:
             logger_registro.warning(
@@ -129,14 +176,40 @@ def atualizar_movimentacao(
             )
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Movimentação com ID {movimentacao_id} não encontrada")
 
-        # 2️. Aplica as atualizações em todos os campos de forma dinâmica (Padrão do Cliente)
+        # 2️. Estorna o efeito antigo no saldo do produto
+        deltas = novo_acumulador()
+        ajustes = novo_acumulador()  # snapshots: (produto_id, dia) -> delta
+        delta_antigo = calcular_delta(db, db_movimentacao.tipo_mov_id, db_movimentacao.quantidade)
+        deltas[db_movimentacao.produto_id] -= delta_antigo
+        ajustes[(db_movimentacao.produto_id, _dia(db_movimentacao.data))] -= delta_antigo
+        antes = campos_movimentacao(db_movimentacao)
+
+        # 3️. Aplica as atualizações em todos os campos de forma dinâmica (Padrão do Cliente)
         update_data = movimentacao_update.model_dump(exclude_unset=True)
         for key, value in update_data.items():
+            if key == "data":
+                value = _data(value)  # a coluna TIMESTAMP espera datetime
             setattr(db_movimentacao, key, value)
 
-        # 3️. Confirma no banco
+        # 4️. Confere as novas referências (uma query), aplica o efeito novo (pode ser
+        #    outro produto/tipo/quantidade) e trava os produtos envolvidos
+        sinal = validar_referencias(db, db_movimentacao)
+        delta_novo = sinal * Decimal(db_movimentacao.quantidade)
+        deltas[db_movimentacao.produto_id] += delta_novo
+        ajustes[(db_movimentacao.produto_id, _dia(db_movimentacao.data))] += delta_novo
+        aplicar_deltas(db, deltas)
+        ajustar_snapshots(db, ajustes)
+        marcar_recalculo(db, ajustes)
+        atualizar_resumos(db, incluir=[campos_movimentacao(db_movimentacao)], estornar=[antes])
+
+        # 5️. Confirma no banco (a resposta é montada antes: sem refresh depois do commit)
+        resposta = MovimentacoesResponse(
+            id=movimentacao_id, **{**campos_movimentacao(db_movimentacao), "data": movimentacao_update.data}
+        )
+        registrar_alteracao(db, "movimentacoes", "produtos")  # versão da tabela (ETag das consultas)
+        publicar(db, "movimentacao.atualizada", resposta.model_dump())  # feed, depois do commit
+        registrar_linhas(db, "movimentacoes", movimentacao_id)
         db.commit()
-        db.refresh(db_movimentacao) # atualiza o objeto
 
         # Log de sucesso
         logger_registro.info(
@@ -149,11 +222,12 @@ def atualizar_movimentacao(
             }
         )
 
-        # 4️. Retorno do objeto atualizado
-        return db_movimentacao
+        # 6️. Retorno do objeto atualizado
+        return resposta
 
     except HTTPException:
-        # Re-lança exceções HTTP já tratadas (404)
+        # Re-lança exceções HTTP já tratadas (404, 400) sem gravar nada
+        db.rollback()
         raise
     
     except SQLAlchemyError as e:
@@ -191,8 +265,8 @@ def delete_movimentacao(movimentacao_id: int, request: Request, db: Session = De
     Deleta uma movimentação existente pelo ID.
     """
     try:
-        # 1️. Busca a movimentação pelo ID
-        db_item = db.query(Movimentacoes).filter(Movimentacoes.id == movimentacao_id).first()
+        # 1️. Busca (e trava) a movimentação pelo ID
+        db_item = db.query(Movimentacoes).filter(Movimentacoes.id == movimentacao_id).with_for_update().first()
 
         if db_item is None:
             logger_registro.warning(
@@ -209,8 +283,19 @@ def delete_movimentacao(movimentacao_id: int, request: Request, db: Session = De
                 detail="Movimentação não encontrada."
             )
 
-        # 2️. Deleta e confirma no banco
+        # 2️. Estorna o efeito da movimentação no saldo do produto
+        delta = calcular_delta(db, db_item.tipo_mov_id, db_item.quantidade)
+        aplicar_deltas(db, {db_item.produto_id: -delta})
+        ajustes = {(db_item.produto_id, _dia(db_item.data)): -delta}
+        ajustar_snapshots(db, ajustes)
+        marcar_recalculo(db, ajustes)
+        atualizar_resumos(db, estornar=[campos_movimentacao(db_item)])
+
+        # 3️. Deleta e confirma no banco (exclusão + saldo juntos)
         db.delete(db_item)
+        registrar_alteracao(db, "movimentacoes", "produtos")  # versão da tabela (ETag das consultas)
+        publicar(db, "movimentacao.removida", {"id": movimentacao_id, "produto_id": db_item.produto_id})  # feed
+        registrar_linhas(db, "movimentacoes", movimentacao_id, removido=True)
         db.commit()
 
         # Log de sucesso (204 No Content)
@@ -226,6 +311,11 @@ def delete_movimentacao(movimentacao_id: int, request: Request, db: Session = De
         # Retorno HTTP 204 No Content para exclusão bem-sucedida
         return
 
+    except HTTPException:
+        # Re-lança exceções HTTP já tratadas (404, 400) sem gravar nada
+        db.rollback()
+        raise
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -250,3 +340,233 @@ def delete_movimentacao(movimentacao_id: int, request: Request, db: Session = De
             }
         )
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno: {str(e)}")
+
+
+# =========================
+# 4. ROTA DE CRIAÇÃO EM LOTE (POST /lote)
+# =========================
+TAMANHO_LOTE_PADRAO = 500     # linhas por INSERT (executemany)
+TAMANHO_LOTE_MAXIMO = 5000
+MAXIMO_LINHAS = 50000         # limite de linhas por requisição
+MAXIMO_BYTES = 32 * 1024 * 1024  # limite do corpo em array JSON (lido inteiro antes do parse)
+
+
+async def _ler_corpo_lote(request: Request):
+    """
+    Lê o corpo como array JSON ou NDJSON (uma movimentação por linha).
+    O limite de linhas (e de bytes, no array JSON) é conferido enquanto o
+    corpo chega: um lote grande demais é recusado sem ser lido inteiro.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if "ndjson" in content_type:
+            linhas = []
+            pendente = b""
+            async for pedaco in request.stream():
+                pendente += pedaco
+                *completas, pendente = pendente.split(b"\n")
+                linhas.extend(json.loads(linha) for linha in completas if linha.strip())
+                if len(linhas) > MAXIMO_LINHAS:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Máximo de {MAXIMO_LINHAS} movimentações por lote")
+            if pendente.strip():
+                linhas.append(json.loads(pendente))
+        else:
+            # array JSON só é lido no fim: o limite durante a leitura é de bytes
+            corpo = bytearray()
+            async for pedaco in request.stream():
+                corpo += pedaco
+                if len(corpo) > MAXIMO_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Corpo maior que {MAXIMO_BYTES // (1024 * 1024)} MB (use NDJSON ou divida o lote)"
+                    )
+            linhas = json.loads(corpo)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Corpo inválido: {str(e)}")
+
+    if not isinstance(linhas, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="O corpo deve ser uma lista de movimentações")
+    if len(linhas) > MAXIMO_LINHAS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Máximo de {MAXIMO_LINHAS} movimentações por lote")
+
+    return linhas
+
+
+def _ids_existentes(db: Session, coluna, ids):
+    """Um único SELECT ... WHERE id IN (...) por tabela referenciada."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    return set(db.scalars(select(coluna).where(coluna.in_(ids))))
+
+
+def _gravar_lote(db: Session, validas, resultados, tamanho_lote: int, parcial: bool):
+    """
+    Valida as chaves estrangeiras de todas as linhas (uma query por tabela),
+    aplica o saldo dos produtos e insere as movimentações em blocos, tudo
+    numa única transação.
+    """
+    # 1️. Verificação de existência das FKs em bloco
+    produtos = _ids_existentes(db, Produto.id, (m.produto_id for _, m in validas))
+    fornecedores = _ids_existentes(db, Fornecedores.id, (m.fornecedor_id for _, m in validas))
+    tipos_pagamento = _ids_existentes(db, TipoPagamento.id, (m.tipo_pag_id for _, m in validas))
+    tipos_ids = {m.tipo_mov_id for _, m in validas}
+    tipos_movimentacao = dict(
+        db.execute(
+            select(TipoMovimentacao.id, TipoMovimentacao.sinal).where(TipoMovimentacao.id.in_(tipos_ids))
+        ).all()
+    ) if tipos_ids else {}
+
+    linhas = []
+    deltas = novo_acumulador()
+    ajustes = novo_acumulador()  # snapshots: (produto_id, dia) -> delta
+    for indice, mov in validas:
+        erros = []
+        if mov.produto_id not in produtos:
+            erros.append(f"Produto com ID {mov.produto_id} não encontrado")
+        if mov.tipo_mov_id not in tipos_movimentacao:
+            erros.append(f"Tipo de movimentação com ID {mov.tipo_mov_id} não encontrado")
+        if mov.fornecedor_id is not None and mov.fornecedor_id not in fornecedores:
+            erros.append(f"Fornecedor com ID {mov.fornecedor_id} não encontrado")
+        if mov.tipo_pag_id is not None and mov.tipo_pag_id not in tipos_pagamento:
+            erros.append(f"Tipo de pagamento com ID {mov.tipo_pag_id} não encontrado")
+
+        try:
+            data = converter_data(mov.data)
+        except ValueError:
+            erros.append(f"Data da movimentação inválida: {mov.data}")
+
+        if erros:
+            resultados[indice] = {"indice": indice, "status": "erro", "erro": "; ".join(erros)}
+            continue
+
+        delta = tipos_movimentacao[mov.tipo_mov_id] * mov.quantidade
+        deltas[mov.produto_id] += delta
+        ajustes[(mov.produto_id, data.date())] += delta
+        linhas.append((indice, {**mov.model_dump(), "data": data}))
+
+    houve_erro = any(r is not None for r in resultados)
+    if houve_erro and not parcial:
+        # modo tudo-ou-nada: nenhuma linha é gravada
+        for indice, _ in linhas:
+            resultados[indice] = {"indice": indice, "status": "nao_gravada"}
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"mensagem": "Lote recusado: existem linhas inválidas", "resultados": resultados}
+        )
+    if not linhas:
+        # nada para gravar (lote vazio ou todas as linhas inválidas): sem versão nova, evento nem 201
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"mensagem": "Lote recusado: nenhuma linha válida para gravar", "resultados": resultados}
+        )
+
+    # 2️. Saldo dos produtos (SELECT ... FOR UPDATE uma vez por produto)
+    aplicar_deltas(db, deltas)
+    ajustar_snapshots(db, ajustes)
+    marcar_recalculo(db, ajustes)
+
+    # 3️. INSERT em blocos; usa RETURNING quando o banco suporta
+    tabela = Movimentacoes.__table__
+    com_returning = db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order
+    novos_ids = []
+    for inicio in range(0, len(linhas), tamanho_lote):
+        bloco = linhas[inicio:inicio + tamanho_lote]
+        valores = [dados for _, dados in bloco]
+        if com_returning:
+            ids = db.scalars(insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), valores).all()
+        else:
+            # sem RETURNING (MySQL): o bloco vai num único INSERT ... VALUES (...), (...).
+            # Num INSERT com o número de linhas conhecido o InnoDB reserva os ids de
+            # uma vez, em sequência, e o lastrowid é o id da primeira linha
+            primeiro_id = db.execute(insert(tabela).values(valores)).lastrowid
+            ids = list(range(primeiro_id, primeiro_id + len(bloco)))
+        novos_ids += ids
+        for (indice, _), novo_id in zip(bloco, ids):
+            resultados[indice] = {"indice": indice, "status": "ok", "id": novo_id}
+
+    # 4️. Totais de BI e confirma tudo de uma vez
+    atualizar_resumos(db, incluir=[dados for _, dados in linhas])
+    registrar_alteracao(db, "movimentacoes", "produtos")  # versão da tabela (ETag das consultas)
+    # um evento só para o lote (milhares de linhas esvaziariam o histórico do feed)
+    publicar(db, "movimentacao.lote", {"quantidade": len(linhas), "produto_ids": sorted(deltas)})
+    registrar_linhas(db, "movimentacoes", novos_ids)
+    db.commit()
+    return resultados
+
+
+@router.post("/lote", status_code=status.HTTP_201_CREATED)
+async def criar_movimentacoes_lote(
+    request: Request,
+    tamanho_lote: int = Query(TAMANHO_LOTE_PADRAO, ge=1, le=TAMANHO_LOTE_MAXIMO),
+    parcial: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Registra várias movimentações de uma vez (ex: fechamento do PDV).
+
+    Passos:
+    1. Recebe uma lista JSON ou NDJSON (Content-Type: application/x-ndjson)
+    2. Valida todas as linhas com o Pydantic (MovimentacoesCreate)
+    3. Confere as FKs com uma query por tabela referenciada
+    4. Atualiza o saldo dos produtos e insere em blocos de 'tamanho_lote'
+       linhas, tudo numa única transação
+    5. Retorna o resultado de cada linha (na ordem recebida)
+
+    Com parcial=false (padrão) qualquer linha inválida recusa o lote inteiro;
+    com parcial=true as linhas válidas são gravadas e as inválidas reportadas.
+    Se nenhuma linha puder ser gravada, o lote é recusado (400).
+    """
+    brutos = await _ler_corpo_lote(request)
+
+    resultados = [None] * len(brutos)
+    validas = []
+    for indice, bruto in enumerate(brutos):
+        try:
+            validas.append((indice, MovimentacoesCreate.model_validate(bruto)))
+        except ValidationError as e:
+            erro = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            resultados[indice] = {"indice": indice, "status": "erro", "erro": erro}
+
+    try:
+        # o acesso ao banco é bloqueante, então roda fora do event loop
+        resultados = await run_in_threadpool(_gravar_lote, db, validas, resultados, tamanho_lote, parcial)
+
+        gravadas = sum(1 for r in resultados if r["status"] == "ok")
+        logger_registro.info(
+            "Lote de movimentações registrado",
+            extra={
+                "ip": request.client.host,
+                "status": 201,
+                "method": "POST",
+                "detail": f"Lote com {len(brutos)} linha(s): {gravadas} gravada(s), {len(brutos) - gravadas} com erro"
+            }
+        )
+        return {"total": len(brutos), "gravadas": gravadas, "resultados": resultados}
+
+    except HTTPException as e:
+        db.rollback()
+        logger_registro.warning(
+            "Lote de movimentações recusado",
+            extra={
+                "ip": request.client.host,
+                "status": e.status_code,
+                "method": "POST",
+                "detail": f"Lote com {len(brutos)} linha(s) recusado"
+            }
+        )
+        raise
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger_registro.error(
+            "Erro ao registrar lote de movimentações no banco",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "method": "POST",
+                "detail": f"Erro ao registrar lote de movimentações (SQLAlchemy): {str(e)}"
+            }
+        )
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro no banco de dados: {str(e)}")
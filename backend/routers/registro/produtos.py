@@ -1,10 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from database import get_db  # função que retorna a sessão do SQLAlchemy
 from models import Produto, Movimentacoes  # modelo SQLAlchemy da tabela produtos
-from schemas import ProdutoCreate, ProdutoResponse  # Pydantic para validação de entrada e saída
+from schemas import ProdutoCreate, ProdutoUpdate, ProdutoResponse  # Pydantic para validação de entrada e saída
 from logger import get_router_logger
+from versoes import registrar_alteracao
+from busca import indice_busca, VERSAO_BUSCA  # índice da /consulta/busca
+from resumos import mover_categoria  # totais de BI por categoria
+from integridade import inserir, erro_de_integridade  # unicidade/FK pelas constraints do banco
+from eventos import publicar  # feed de alterações (/consulta/eventos)
+from alteracoes import registrar_linhas  # log do /consulta/changes
 
 # =========================
 # CONFIGURAÇÃO DO ROUTER
@@ -28,41 +34,21 @@ def criar_produto(produto: ProdutoCreate, request: Request, db: Session = Depend
     
     Passos:
     1. Recebe os dados validados pelo Pydantic (ProdutoCreate)
-    2. Estabelece a sessão com o banco via dependência da tabela categoria
-    3. Verifica se já existe um produto com o mesmo nome (unicidade)
-    4. Insere no banco se não existir
-    5. Retorna o objeto criado (ProdutoResponse)
+    2. Insere direto no banco: a unicidade do nome e a categoria são
+       garantidas pelas constraints (IntegrityError vira 409/400)
+    3. Retorna o objeto criado (ProdutoResponse) com o id devolvido pelo INSERT
     """
+    valores = produto.model_dump()
+    valores["status"] = produto.status or "ativo"  # se não passar status, usa "ativo"
     try:
-        # 1️.Verificação de existência
-        existente = db.query(Produto).filter(Produto.nome == produto.nome).first()
-        if existente:
-            # Log de aviso caso produto já exista
-            logger_registro.warning(
-                "",
-                extra={
-                    "ip": request.client.host,
-                    "status": 400,
-                    "method": "POST",
-                    "detail": f"Falha ao criar produto: Produto '{produto.nome}' já existe"
-                }
-            )
-            raise HTTPException(status_code=400, detail="Produto já existe")
-
-        # 2️. Criação do objeto SQLAlchemy
-        novo_produto = Produto(
-            nome=produto.nome,
-            medida=produto.medida,
-            qtd_disponivel=produto.qtd_disponivel,
-            qtd_minima=produto.qtd_minima,
-            categoria_id=produto.categoria_id,
-            status=produto.status or "ativo"  # se não passar status, usa "ativo"
-        )
-
-        # 3️. Adiciona e confirma no banco
-        db.add(novo_produto)
+        # 1️. INSERT (sem SELECT antes para checar o nome nem refresh depois)
+        novo_id = inserir(db, Produto, valores)
+        novo_produto = ProdutoResponse(id=novo_id, **valores)
+        registrar_alteracao(db, "produtos", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        publicar(db, "produto.criado", novo_produto.model_dump())  # vai para o feed depois do commit
+        registrar_linhas(db, "produtos", novo_id)
         db.commit()
-        db.refresh(novo_produto)  # atualiza o objeto com o ID gerado pelo banco
+        indice_busca.atualizar_produto(novo_produto)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -75,9 +61,24 @@ def criar_produto(produto: ProdutoCreate, request: Request, db: Session = Depend
             }
         )
 
-        # 4️. Retorno do objeto criado (Pydantic converte para JSON)
+        # 2️. Retorno do objeto criado (Pydantic converte para JSON)
         return novo_produto
 
+    except IntegrityError as e:
+        # Nome repetido (409) ou categoria inexistente (400)
+        db.rollback()
+        erro = erro_de_integridade(e, "Produto", valores)
+        logger_registro.warning(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "POST",
+                "detail": f"Falha ao criar produto: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         # Desfaz a transação em caso de erro de banco
         db.rollback()
@@ -111,7 +112,7 @@ def criar_produto(produto: ProdutoCreate, request: Request, db: Session = Depend
 @router.put("/{produto_id}", response_model=ProdutoResponse, status_code=status.HTTP_200_OK)
 def atualizar_produto(
     produto_id: int, 
-    produto_update: ProdutoCreate, 
+    produto_update: ProdutoUpdate, 
     request: Request, 
     db: Session = Depends(get_db)
 ):
@@ -119,13 +120,17 @@ def atualizar_produto(
     Atualiza um produto existente na tabela 'produtos' pelo ID.
     
     Passos:
-    1. Busca o produto pelo ID.
-    2. Verifica se o novo nome (se fornecido) já existe em OUTRO produto.
-    3. Aplica as atualizações dinamicamente.
+    1. Busca (e trava) o produto pelo ID.
+    2. Aplica as atualizações dinamicamente (nome repetido em OUTRO produto
+       é barrado pela constraint UNIQUE e volta como 409).
+
+    O saldo (qtd_disponivel) não é alterado aqui: só muda por movimentações.
     """
+    update_data = produto_update.model_dump(exclude_unset=True)
     try:
-        # 1. Busca o produto pelo ID
-        db_produto = db.query(Produto).filter(Produto.id == produto_id).first()
+        # 1. Busca o produto pelo ID (FOR UPDATE: espera uma movimentação em andamento
+        #    no mesmo produto, para a resposta sair com o saldo confirmado)
+        db_produto = db.query(Produto).filter(Produto.id == produto_id).with_for_update().first()
 
         if not db_produto:
             logger_registro.warning(
@@ -139,33 +144,22 @@ def atualizar_produto(
             )
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Produto com ID {produto_id} não encontrado")
 
-        # 2. Verifica a unicidade do nome (se o nome foi alterado)
-        if produto_update.nome and produto_update.nome != db_produto.nome:
-            existente_com_novo_nome = db.query(Produto).filter(Produto.nome == produto_update.nome).first()
-            if existente_com_novo_nome:
-                logger_registro.warning(
-                    "Tentativa de alterar nome para um produto já existente",
-                    extra={
-                        "ip": request.client.host,
-                        "status": 400,
-                        "method": "PUT",
-                        "detail": f"Falha ao atualizar Produto: Nome '{produto_update.nome}' já existe."
-                    }
-                )
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Produto com nome '{produto_update.nome}' já existe.")
-
-
-        # 3. Aplica as atualizações em todos os campos de forma dinâmica
-        update_data = produto_update.model_dump(exclude_unset=True)
+        # 2. Aplica as atualizações em todos os campos de forma dinâmica
+        categoria_antiga = db_produto.categoria_id
         for key, value in update_data.items():
             # Garante que status use 'ativo' como padrão se for nulo na atualização
             if key == 'status' and value is None:
                 value = "ativo"
             setattr(db_produto, key, value)
 
-        # 4. Confirma no banco
+        # 3. Confirma no banco (se mudou de categoria, os totais de BI mudam junto)
+        mover_categoria(db, produto_id, categoria_antiga, db_produto.categoria_id)
+        registrar_alteracao(db, "produtos", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        resposta = ProdutoResponse.model_validate(db_produto, from_attributes=True)  # antes do commit: sem refresh depois
+        publicar(db, "produto.atualizado", resposta.model_dump())  # vai para o feed depois do commit
+        registrar_linhas(db, "produtos", produto_id)
         db.commit()
-        db.refresh(db_produto) # atualiza o objeto
+        indice_busca.atualizar_produto(resposta)  # índice da /consulta/busca
 
         # Log de sucesso
         logger_registro.info(
@@ -174,16 +168,31 @@ def atualizar_produto(
                 "ip": request.client.host,
                 "status": 200,
                 "method": "PUT",
-                "detail": f"Produto ID {produto_id} ('{db_produto.nome}') atualizado."
+                "detail": f"Produto ID {produto_id} ('{resposta.nome}') atualizado."
             }
         )
 
-        # 5. Retorno do objeto atualizado
-        return db_produto
+        # 4. Retorno do objeto atualizado
+        return resposta
 
     except HTTPException:
-        # Re-lança exceções HTTP já tratadas (404, 400)
+        # Re-lança exceções HTTP já tratadas (404)
         raise
+
+    except IntegrityError as e:
+        # Nome de outro produto (409) ou categoria inexistente (400)
+        db.rollback()
+        erro = erro_de_integridade(e, "Produto", update_data)
+        logger_registro.warning(
+            "Falha de integridade ao atualizar produto",
+            extra={
+                "ip": request.client.host,
+                "status": erro.status_code,
+                "method": "PUT",
+                "detail": f"Falha ao atualizar Produto ID {produto_id}: {erro.detail}"
+            }
+        )
+        raise erro
     
     except SQLAlchemyError as e:
         db.rollback()
@@ -261,7 +270,11 @@ def delete_produto(produto_id: int, request: Request, db: Session = Depends(get_
         # 3. Deleta e confirma no banco
         # 2. Deleta e confirma no banco
         db.delete(db_item)
+        registrar_alteracao(db, "produtos", VERSAO_BUSCA)  # versão da tabela (ETag) e do índice da busca
+        publicar(db, "produto.removido", {"id": produto_id})  # vai para o feed depois do commit
+        registrar_linhas(db, "produtos", produto_id, removido=True)
         db.commit()
+        indice_busca.remover("produto", produto_id)  # índice da /consulta/busca
 
         # Log de sucesso (204 No Content)
         logger_registro.info(
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import get_db
+from logger import get_router_logger
+from previsao import calcular_sugestoes
+
+# Configuração do Router
+router = APIRouter(
+    prefix="/registro/reposicao",
+    tags=["Registro - Reposição"]
+)
+
+# Logger específico do router de registro
+logger_registro = get_router_logger("reposicao", registro=True)
+
+
+@router.post("/calcular", status_code=status.HTTP_200_OK)
+def recalcular_sugestoes(request: Request, db: Session = Depends(get_db)):
+    """
+    Roda a previsão de demanda agora, sem esperar o job. Produtos já
+    calculados só processam os dias novos; retorna um resumo da execução.
+    """
+    try:
+        resumo = calcular_sugestoes(db)
+
+        logger_registro.info(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 200,
+                "method": "POST",
+                "detail": f"Sugestões de reposição recalculadas ({resumo['produtos']} produto(s))"
+            }
+        )
+        return resumo
+
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Cálculo de reposição já em andamento em outro processo, tente novamente"
+        )
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger_registro.error(
+            "",
+            extra={
+                "ip": request.client.host,
+                "status": 500,
+                "method": "POST",
+                "detail": f"Erro ao recalcular sugestões de reposição: {str(e)}"
+            }
+        )
+        raise HTTPException(status_code=500, detail=f"Erro ao recalcular sugestões de reposição: {str(e)}")
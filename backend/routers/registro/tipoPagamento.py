@@ -4,10 +4,13 @@ from sqlalchemy.exc import SQLAlchemyError
 from typing import List
 
 # Importa o modelo e os schemas
-from models import TipoPagamento  # Ajuste o nome conforme seu models.py
+from models import TipoPagamento, Movimentacoes  # Ajuste o nome conforme seu models.py
 from schemas import TipoPagamentoCreate, TipoPagamentoResponse  # Ajuste os nomes conforme seu schemas.py
 from database import get_db
 from logger import get_router_logger
+from versoes import registrar_alteracao
+from alteracoes import registrar_linhas  # log do /consulta/changes
+import cache  # cache da consulta desta tabela
 
 # Configuração do Router
 router = APIRouter(
@@ -52,7 +55,11 @@ def create_tipo_pagamento(
 
         # Adiciona e confirma no banco
         db.add(db_item)
+        db.flush()  # gera o id (usado no log de alterações)
+        registrar_alteracao(db, "tipo_pagamento")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_pagamento", db_item.id)
         db.commit()
+        cache.invalidar("tipo_pagamento")  # próxima consulta já lê a tabela atualizada
         db.refresh(db_item)
 
         logger_registro.info(
@@ -65,6 +72,10 @@ def create_tipo_pagamento(
 
         return db_item
 
+    except HTTPException:
+        # 400 / 404 já tratados acima
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -122,9 +133,16 @@ def update_tipo_pagamento(
 
         # Atualiza os campos do modelo
         for key, value in tipo_pagamento.model_dump(exclude_unset=True).items():
+            if key == "status" and value is None:
+                value = "ativo"
             setattr(db_item, key, value)
 
+        registrar_alteracao(db, "tipo_pagamento")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_pagamento", tipo_pagamento_id)
+
         db.commit()
+
+        cache.invalidar("tipo_pagamento")  # próxima consulta já lê a tabela atualizada
         db.refresh(db_item)
 
         logger_registro.info(
@@ -136,6 +154,10 @@ def update_tipo_pagamento(
         )
         return db_item
 
+    except HTTPException:
+        # 400 / 404 já tratados acima
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -190,8 +212,25 @@ def delete_tipo_pagamento(
                 detail="Tipo de Pagamento não encontrado"
             )
 
+        em_uso = db.query(Movimentacoes.id).filter(Movimentacoes.tipo_pag_id == tipo_pagamento_id).first()
+        if em_uso is not None:
+            logger_registro.warning(
+                "",
+                extra={
+                    "ip": "N/A", "status": 400, "method": "DELETE",
+                    "detail": f"Falha ao deletar Tipo Pagamento: ID {tipo_pagamento_id} possui movimentações"
+                }
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Não é possível excluir este tipo de pagamento pois ele possui movimentações associadas"
+            )
+
         db.delete(db_item)
+        registrar_alteracao(db, "tipo_pagamento")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_pagamento", tipo_pagamento_id, removido=True)
         db.commit()
+        cache.invalidar("tipo_pagamento")  # próxima consulta já lê a tabela atualizada
 
         logger_registro.info(
             "",
@@ -202,6 +241,10 @@ def delete_tipo_pagamento(
         )
         return  # Retorno HTTP 204 No Content
 
+    except HTTPException:
+        # 400 / 404 já tratados acima
+        db.rollback()
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, exists
 from sqlalchemy.orm import Session
 # Importado para tratamento de erro de banco
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from typing import List
 
 # Importa o modelo e os schemas
 # ATENÇÃO: Verifique se os nomes 'TipoMovimentacao', 'TipoMovimentacaoCreateSchema', 'TipoMovimentacaoResponseSchema' estão corretos
-from models import TipoMovimentacao
+from models import TipoMovimentacao, Movimentacoes
 from schemas import TipoMovimentacaoCreateSchema, TipoMovimentacaoResponseSchema
 from database import get_db  # Dependência para obter a sessão de DB
 from logger import get_router_logger  # Importa o sistema de logger
+from versoes import registrar_alteracao
+from alteracoes import registrar_linhas  # log do /consulta/changes
+import cache  # cache da consulta desta tabela
+from integridade import inserir, atualizar, erro_de_integridade  # unicidade pela constraint do banco
 
 # =========================
 # CONFIGURAÇÃO DO ROUTER
@@ -35,33 +40,17 @@ def create_tipo_movimentacao(
 ):
     """
     Cria um novo tipo de movimentação no banco de dados.
-    Inclui verificação de unicidade pela descrição.
+    A unicidade pela descrição fica com a constraint UNIQUE (repetida volta como 409).
     """
+    valores = tipo_movimentacao.model_dump()
     try:
-        # 1️. Verificação de unicidade pela 'descricao'
-        existente = db.query(TipoMovimentacao).filter(
-            TipoMovimentacao.descricao == tipo_movimentacao.descricao
-        ).first()
-
-        if existente:
-            # Log de aviso caso já exista
-            logger_registro.warning(
-                "",
-                extra={
-                    "ip": "N/A", "status": 400, "method": "POST",
-                    "detail": f"Falha ao criar Tipo Movimentação: '{tipo_movimentacao.descricao}' já existe"
-                }
-            )
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Tipo de Movimentação já existe")
-
-        # 2️. Cria a instância do modelo - O Pydantic V2 (model_dump()) agora só tem 'descricao'
-        db_item = TipoMovimentacao(**tipo_movimentacao.model_dump())
-
-        # 3️. Adiciona e confirma no banco
-        db.add(db_item)
+        # 1️. INSERT (sem SELECT antes para checar a descrição nem refresh depois)
+        novo_id = inserir(db, TipoMovimentacao, valores)
+        registrar_alteracao(db, "tipo_movimentacao")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_movimentacao", novo_id)
         db.commit()
-        db.refresh(db_item)
+        cache.invalidar("tipo_movimentacao")  # próxima consulta já lê a tabela atualizada
+        db_item = TipoMovimentacaoResponseSchema(id=novo_id, **valores)
 
         # Log de sucesso
         logger_registro.info(
@@ -74,6 +63,18 @@ def create_tipo_movimentacao(
 
         return db_item
 
+    except IntegrityError as e:
+        db.rollback()
+        erro = erro_de_integridade(e, "Tipo de Movimentação", valores)
+        logger_registro.warning(
+            "",
+            extra={
+                "ip": "N/A", "status": erro.status_code, "method": "POST",
+                "detail": f"Falha ao criar Tipo Movimentação: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -103,18 +104,31 @@ def create_tipo_movimentacao(
 @router.put("/{tipo_movimentacao_id}", response_model=TipoMovimentacaoResponseSchema)
 def update_tipo_movimentacao(
     tipo_movimentacao_id: int,
-    # Usa o schema Create, que só tem 'descricao'
+    # Usa o schema Create ('descricao' e 'sinal')
     tipo_movimentacao: TipoMovimentacaoCreateSchema,
     db: Session = Depends(get_db)
 ):
     """
-    Atualiza as informações de um tipo de movimentação existente pelo ID.
+    Atualiza as informações de um tipo de movimentação existente pelo ID
+    (UPDATE direto; descrição de outro tipo volta como 409, assim como
+    trocar o sinal de um tipo que já tem movimentações).
     """
+    valores = tipo_movimentacao.model_dump()
     try:
-        db_item = db.query(TipoMovimentacao).filter(
-            TipoMovimentacao.id == tipo_movimentacao_id).first()
+        # trocar o sinal de um tipo já usado deixaria o saldo dos produtos (e o estorno
+        # das movimentações antigas em PUT/DELETE) inconsistente
+        sinal_atual = db.scalar(
+            select(TipoMovimentacao.sinal).where(TipoMovimentacao.id == tipo_movimentacao_id).with_for_update()
+        )
+        if sinal_atual is not None and sinal_atual != valores["sinal"] and db.scalar(
+            select(exists().where(Movimentacoes.tipo_mov_id == tipo_movimentacao_id))
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="O sinal não pode ser alterado: o tipo de movimentação já tem movimentações registradas."
+            )
 
-        if db_item is None:
+        if not atualizar(db, TipoMovimentacao, tipo_movimentacao_id, valores):
             logger_registro.warning(
                 "",
                 extra={
@@ -127,12 +141,13 @@ def update_tipo_movimentacao(
                 detail="Tipo de Movimentação não encontrado."
             )
 
-        # Atualiza os campos do modelo (apenas 'descricao')
-        for key, value in tipo_movimentacao.model_dump(exclude_unset=True).items():
-            setattr(db_item, key, value)
+        registrar_alteracao(db, "tipo_movimentacao")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_movimentacao", tipo_movimentacao_id)
 
         db.commit()
-        db.refresh(db_item)
+
+        cache.invalidar("tipo_movimentacao")  # próxima consulta já lê a tabela atualizada
+        db_item = TipoMovimentacaoResponseSchema(id=tipo_movimentacao_id, **valores)
 
         logger_registro.info(
             "",
@@ -143,6 +158,23 @@ def update_tipo_movimentacao(
         )
         return db_item
 
+    except HTTPException:
+        # 404 / 409 já tratados acima
+        db.rollback()
+        raise
+
+    except IntegrityError as e:
+        db.rollback()
+        erro = erro_de_integridade(e, "Tipo de Movimentação", valores)
+        logger_registro.warning(
+            "",
+            extra={
+                "ip": "N/A", "status": erro.status_code, "method": "PUT",
+                "detail": f"Falha ao atualizar Tipo Movimentação ID {tipo_movimentacao_id}: {erro.detail}"
+            }
+        )
+        raise erro
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -191,8 +223,24 @@ def delete_tipo_movimentacao(tipo_movimentacao_id: int, db: Session = Depends(ge
                 detail="Tipo de Movimentação não encontrado."
             )
 
+        if db.scalar(select(exists().where(Movimentacoes.tipo_mov_id == tipo_movimentacao_id))):
+            logger_registro.warning(
+                "",
+                extra={
+                    "ip": "N/A", "status": 400, "method": "DELETE",
+                    "detail": f"Falha ao deletar Tipo Movimentação: ID {tipo_movimentacao_id} possui movimentações."
+                }
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Não é possível excluir este tipo de movimentação pois ele possui movimentações associadas."
+            )
+
         db.delete(db_item)
+        registrar_alteracao(db, "tipo_movimentacao")  # versão da tabela (ETag das consultas)
+        registrar_linhas(db, "tipo_movimentacao", tipo_movimentacao_id, removido=True)
         db.commit()
+        cache.invalidar("tipo_movimentacao")  # próxima consulta já lê a tabela atualizada
 
         logger_registro.info(
             "",
@@ -204,6 +252,11 @@ def delete_tipo_movimentacao(tipo_movimentacao_id: int, db: Session = Depends(ge
         # Retorno HTTP 204 No Content para exclusão bem-sucedida
         return
 
+    except HTTPException:
+        # 400 / 404 já tratados acima
+        db.rollback()
+        raise
+
     except SQLAlchemyError as e:
         db.rollback()
         logger_registro.error(
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 from decimal import Decimal
 from pydantic import BaseModel
 from typing import Optional
@@ -15,6 +15,15 @@ class ProdutoCreate(BaseModel):
     categoria_id: int             # FK (tem que existir no banco)
     status: Optional[str] = "ativo"  # default "ativo" se não for informado
 
+# Schema para atualizar produto (PUT): sem qtd_disponivel, o saldo só muda
+# por movimentações (estoque.aplicar_deltas). Se vier no corpo é ignorado.
+class ProdutoUpdate(BaseModel):
+    nome: str
+    medida: str
+    qtd_minima: Decimal
+    categoria_id: int
+    status: Optional[str] = "ativo"
+
 # Schema para resposta da API (saída)
 class ProdutoResponse(BaseModel):
     id: int                       # vem do banco
@@ -82,13 +91,13 @@ orm_mode = True  # permite retornar objetos SQLAlchemy direto'
 
 
 class TipoPagamentoCreate(BaseModel):
-    nome: str
+    descricao: str
     status: Optional[str] = "ativo"
 
 
 class TipoPagamentoResponse(BaseModel):
     id: int
-    nome: str
+    descricao: str
     status: str
 
     class Config:
@@ -97,12 +106,14 @@ class TipoPagamentoResponse(BaseModel):
 
 class TipoMovimentacaoCreateSchema(BaseModel):
     descricao: str
+    sinal: Literal[1, -1, 0]  # efeito no saldo: 1 entrada, -1 saída, 0 não altera
 
 
 # Schema de resposta (saída de dados)
 class TipoMovimentacaoResponseSchema(BaseModel):
     id: int
     descricao: str
+    sinal: int
 
     class Config:
         orm_mode = True
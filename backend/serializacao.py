@@ -0,0 +1,118 @@
+import gzip
+from decimal import Decimal
+from operator import attrgetter
+
+import orjson
+
+from metricas import RespostaJSON
+
+# -------------------------------------------------------------------
+# Serialização rápida das listagens
+# Devolvendo uma lista de dicts, o FastAPI passa o jsonable_encoder em
+# cada valor (recursivo, em Python) antes do json.dumps; em listas grandes
+# isso é a maior parte do tempo da requisição. Aqui as linhas do banco vão
+# direto para bytes com o orjson (Decimal convertido por decimal_json,
+# datetime/date nativos) numa RespostaRapida, que o FastAPI
+# devolve como está.
+#
+# formato=colunar manda {"colunas": [...], "linhas": [[...], ...]}: os
+# nomes dos campos aparecem uma vez só em vez de em cada linha.
+# -------------------------------------------------------------------
+FORMATO_LISTAGEM_PATTERN = "^(json|colunar|ndjson|csv)$"   # FORMATO_PATTERN + colunar
+FORMATO_PAGINA_PATTERN = "^(json|colunar)$"
+
+NIVEL_GZIP = 6          # compressão x CPU (o 9 custa bem mais e ganha pouco em JSON)
+MINIMO_GZIP = 1024      # bytes: abaixo disso o cabeçalho do gzip não compensa
+
+
+def decimal_json(valor: Decimal) -> float:
+    """
+    Conversão única de Decimal para JSON (listagens, dumps e exportação
+    NDJSON): sempre float, o mesmo que os schemas Pydantic (campos float)
+    devolvem. Assim 10 sai 10.0 em qualquer rota, seja qual for a escala
+    da coluna ou a origem do valor.
+    """
+    return float(valor)
+
+
+def _default(valor):
+    if isinstance(valor, Decimal):
+        return decimal_json(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def dumps(conteudo) -> bytes:
+    return orjson.dumps(conteudo, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RespostaRapida(RespostaJSON):
+    """RespostaJSON serializada com orjson (conteúdo pode ter Decimal/datetime direto do banco)."""
+
+    def serializar(self, content) -> bytes:
+        return dumps(content)
+
+
+class RespostaComprimida(RespostaRapida):
+    """
+    RespostaRapida em gzip quando o cliente aceita (comprimir=True, vindo do
+    Accept-Encoding). O tempo de compressão entra no da serialização.
+    """
+
+    def __init__(self, content, comprimir: bool = False, **kwargs):
+        self.comprimir = comprimir
+        self.comprimida = False
+        super().__init__(content, **kwargs)
+        if self.comprimida:
+            self.headers["Content-Encoding"] = "gzip"
+        self.headers["Vary"] = "Accept-Encoding"
+
+    def serializar(self, content) -> bytes:
+        corpo = dumps(content)
+        if not self.comprimir or len(corpo) < MINIMO_GZIP:
+            return corpo
+        self.comprimida = True
+        return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def aceita_gzip(request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _pegar(campos):
+    # attrgetter com um campo só devolve o valor solto, não uma tupla (?fields=id)
+    if len(campos) == 1:
+        campo = campos[0]
+        return lambda row: (getattr(row, campo),)
+    return attrgetter(*campos)
+
+
+def objetos(linhas, campos) -> list:
+    """Linhas do banco -> [{campo: valor}, ...] (só os campos pedidos, nessa ordem)."""
+    pegar = _pegar(campos)
+    return [dict(zip(campos, pegar(row))) for row in linhas]
+
+
+def colunar(linhas, campos) -> dict:
+    """Linhas do banco -> {"colunas": [...], "linhas": [[...], ...]}."""
+    pegar = _pegar(campos)
+    return {"colunas": list(campos), "linhas": [pegar(row) for row in linhas]}
+
+
+def formatar(linhas, campos, formato: str = "json"):
+    return colunar(linhas, campos) if formato == "colunar" else objetos(linhas, campos)
+
+
+def resposta(conteudo, response=None) -> RespostaRapida:
+    """
+    Monta a RespostaRapida levando os cabeçalhos já definidos no `response`
+    do endpoint (ETag, Cache-Control), que o FastAPI não copia quando o
+    endpoint devolve uma Response pronta.
+    """
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return RespostaRapida(conteudo, headers=headers)
+
+
+def listagem(linhas, campos, formato: str = "json", response=None) -> RespostaRapida:
+    return resposta(formatar(linhas, campos, formato), response)
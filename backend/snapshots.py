@@ -0,0 +1,289 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select, insert, update, func, and_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import get_sessionmaker
+from estoque import sinais_por_tipo
+from logger import get_router_logger
+from models import EstoqueSnapshot, Movimentacoes, Produto
+
+# -------------------------------------------------------------------
+# Snapshots de estoque (tabela estoque_snapshot)
+# De tempos em tempos grava o saldo de fechamento de cada produto.
+# "Quanto tínhamos do produto X no dia D" vira:
+#     snapshot mais recente até D + movimentações depois dele até D
+# em vez de somar todo o histórico de movimentações.
+#
+# Movimentações com data retroativa (anterior ao último snapshot)
+# corrigem os snapshots já gravados na mesma transação (ajustar_snapshots).
+#
+# ESTOQUE_SNAPSHOT_DIAS = de quantos em quantos dias gravar (0 desliga o job)
+# ESTOQUE_SNAPSHOT_VERIFICAR = de quantos em quantos segundos o job confere se está na hora
+# -------------------------------------------------------------------
+PERIODO_DIAS = int(os.getenv("ESTOQUE_SNAPSHOT_DIAS", "1"))
+INTERVALO_VERIFICACAO = int(os.getenv("ESTOQUE_SNAPSHOT_VERIFICAR", "3600"))
+TAMANHO_LOTE = 1000
+
+
+def _inicio_do_dia(dia: date) -> datetime:
+    return datetime.combine(dia, time.min)
+
+
+def dia_da_movimentacao(valor) -> date:
+    """Data (sem hora) de uma movimentação; aceita datetime, date ou texto ISO."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    try:
+        return datetime.fromisoformat(texto).date()
+    except ValueError:
+        return date.fromisoformat(texto[:10])
+
+
+def somar_deltas(db, sinais: dict, desde: date, ate: date = None, produto_ids=None) -> dict:
+    """
+    produto_id -> efeito no saldo das movimentações com data nos dias
+    [desde, ate) (ate=None: até hoje). Soma agrupada no banco.
+    """
+    condicoes = [Movimentacoes.data >= _inicio_do_dia(desde)]
+    if ate is not None:
+        condicoes.append(Movimentacoes.data < _inicio_do_dia(ate))
+    if produto_ids is not None:
+        condicoes.append(Movimentacoes.produto_id.in_(produto_ids))
+
+    result = db.execute(
+        select(Movimentacoes.produto_id, Movimentacoes.tipo_mov_id, func.sum(Movimentacoes.quantidade))
+        .where(*condicoes)
+        .group_by(Movimentacoes.produto_id, Movimentacoes.tipo_mov_id)
+    )
+
+    deltas = defaultdict(Decimal)
+    for produto_id, tipo_mov_id, quantidade in result:
+        deltas[produto_id] += sinais.get(tipo_mov_id, 0) * Decimal(quantidade or 0)
+    return deltas
+
+
+# -------------------------------------------------------------------
+# Gravação dos snapshots
+# -------------------------------------------------------------------
+def tirar_snapshot(db, dia: date) -> int:
+    """
+    Grava o saldo de fechamento de todos os produtos no dia informado:
+    saldo atual menos o que foi movimentado depois daquele dia.
+    Retorna quantos produtos foram gravados (0 se outro worker já gravou).
+    """
+    sinais = sinais_por_tipo(db)
+    posteriores = somar_deltas(db, sinais, desde=dia + timedelta(days=1))
+    linhas = [
+        {"data": dia, "produto_id": produto_id, "qtd": Decimal(qtd or 0) - posteriores.get(produto_id, 0)}
+        for produto_id, qtd in db.execute(select(Produto.id, Produto.qtd_disponivel))
+    ]
+
+    try:
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            db.execute(insert(EstoqueSnapshot), linhas[inicio:inicio + TAMANHO_LOTE])
+        db.commit()
+    except IntegrityError:
+        # outro worker gravou o mesmo dia primeiro
+        db.rollback()
+        return 0
+    return len(linhas)
+
+
+def snapshot_pendente(db, hoje: date = None):
+    """Dia que deve ser fotografado agora (último dia fechado), ou None se ainda não é hora."""
+    ontem = (hoje or date.today()) - timedelta(days=1)
+    ultimo = db.scalar(select(func.max(EstoqueSnapshot.data)))
+    if ultimo is not None and (ontem - ultimo).days < PERIODO_DIAS:
+        return None
+    return ontem
+
+
+def ajustar_snapshots(db, ajustes: dict):
+    """
+    Corrige snapshots já gravados quando entra/sai/muda uma movimentação
+    com data retroativa. ajustes = {(produto_id, dia): delta}.
+    Chamar antes do commit (mesma transação da movimentação).
+    """
+    ajustes = {chave: delta for chave, delta in ajustes.items() if delta}
+    if not ajustes:
+        return
+
+    ultimo = db.scalar(select(func.max(EstoqueSnapshot.data)))
+    if ultimo is None:
+        return
+
+    for (produto_id, dia), delta in ajustes.items():
+        if dia > ultimo:
+            continue  # caso comum: movimentação depois do último snapshot, nada a corrigir
+        db.execute(
+            update(EstoqueSnapshot)
+            .where(EstoqueSnapshot.produto_id == produto_id, EstoqueSnapshot.data >= dia)
+            .values(qtd=EstoqueSnapshot.qtd + delta)
+        )
+
+
+# -------------------------------------------------------------------
+# Consulta do estoque em uma data
+# -------------------------------------------------------------------
+def estoque_em(db, dia: date, produto_id: int = None, categoria_id: int = None):
+    """
+    Saldo de fechamento dos produtos no dia: snapshot mais recente até o dia
+    + movimentações entre o snapshot e o dia.
+    """
+    filtros = []
+    if produto_id is not None:
+        filtros.append(Produto.id == produto_id)
+    if categoria_id is not None:
+        filtros.append(Produto.categoria_id == categoria_id)
+    produtos = db.execute(
+        select(Produto.id, Produto.nome, Produto.medida, Produto.qtd_disponivel).where(*filtros).order_by(Produto.id)
+    ).all()
+    if not produtos:
+        return []
+
+    # restringe as somas aos produtos pedidos (sem filtro: todos)
+    ids = [p.id for p in produtos] if filtros else None
+
+    ultimo_por_produto = (
+        select(EstoqueSnapshot.produto_id, func.max(EstoqueSnapshot.data).label("data"))
+        .where(EstoqueSnapshot.data <= dia)
+        .group_by(EstoqueSnapshot.produto_id)
+    )
+    if ids is not None:
+        ultimo_por_produto = ultimo_por_produto.where(EstoqueSnapshot.produto_id.in_(ids))
+    ultimo_por_produto = ultimo_por_produto.subquery()
+
+    snapshots = {
+        row.produto_id: (row.data, row.qtd)
+        for row in db.execute(
+            select(EstoqueSnapshot.produto_id, EstoqueSnapshot.data, EstoqueSnapshot.qtd).join(
+                ultimo_por_produto,
+                and_(EstoqueSnapshot.produto_id == ultimo_por_produto.c.produto_id,
+                     EstoqueSnapshot.data == ultimo_por_produto.c.data)
+            )
+        )
+    }
+
+    sinais = sinais_por_tipo(db)
+    dia_seguinte = dia + timedelta(days=1)
+
+    # normalmente todos os produtos têm o mesmo snapshot: uma soma por data de snapshot
+    por_data = defaultdict(list)
+    for produto in produtos:
+        if produto.id in snapshots:
+            por_data[snapshots[produto.id][0]].append(produto.id)
+
+    deltas = {}
+    for data_snapshot, produto_ids in por_data.items():
+        somas = somar_deltas(
+            db, sinais, desde=data_snapshot + timedelta(days=1), ate=dia_seguinte,
+            produto_ids=produto_ids if ids is not None or len(por_data) > 1 else None
+        )
+        for pid in produto_ids:
+            deltas[pid] = somas.get(pid, Decimal(0))
+
+    # dia anterior ao primeiro snapshot: volta a partir do snapshot seguinte
+    # (ou do saldo atual, se o produto não tem snapshot nenhum)
+    sem_snapshot = [p.id for p in produtos if p.id not in snapshots]
+    seguintes = _primeiro_snapshot_depois(db, dia, sem_snapshot) if sem_snapshot else {}
+    posteriores = {}
+    for data_snapshot in set(d for d, _ in seguintes.values()):
+        produto_ids = [pid for pid, (d, _) in seguintes.items() if d == data_snapshot]
+        somas = somar_deltas(db, sinais, desde=dia_seguinte, ate=data_snapshot + timedelta(days=1), produto_ids=produto_ids)
+        posteriores.update({pid: somas.get(pid, Decimal(0)) for pid in produto_ids})
+    sem_nenhum = [pid for pid in sem_snapshot if pid not in seguintes]
+    if sem_nenhum:
+        posteriores.update(somar_deltas(db, sinais, desde=dia_seguinte, produto_ids=sem_nenhum))
+
+    itens = []
+    for produto in produtos:
+        if produto.id in snapshots:
+            data_snapshot, qtd_snapshot = snapshots[produto.id]
+            qtd = Decimal(qtd_snapshot) + deltas[produto.id]
+        elif produto.id in seguintes:
+            data_snapshot, qtd_snapshot = seguintes[produto.id]
+            qtd = Decimal(qtd_snapshot) - posteriores.get(produto.id, 0)
+        else:
+            data_snapshot = None
+            qtd = Decimal(produto.qtd_disponivel or 0) - posteriores.get(produto.id, 0)
+        itens.append({
+            "produto_id": produto.id,
+            "nome": produto.nome,
+            "medida": produto.medida,
+            "qtd": qtd,
+            "snapshot": data_snapshot,
+        })
+    return itens
+
+
+def _primeiro_snapshot_depois(db, dia: date, produto_ids) -> dict:
+    """produto_id -> (data, qtd) do snapshot mais antigo depois do dia."""
+    primeiro = (
+        select(EstoqueSnapshot.produto_id, func.min(EstoqueSnapshot.data).label("data"))
+        .where(EstoqueSnapshot.data > dia, EstoqueSnapshot.produto_id.in_(produto_ids))
+        .group_by(EstoqueSnapshot.produto_id)
+        .subquery()
+    )
+    return {
+        row.produto_id: (row.data, row.qtd)
+        for row in db.execute(
+            select(EstoqueSnapshot.produto_id, EstoqueSnapshot.data, EstoqueSnapshot.qtd).join(
+                primeiro,
+                and_(EstoqueSnapshot.produto_id == primeiro.c.produto_id, EstoqueSnapshot.data == primeiro.c.data)
+            )
+        )
+    }
+
+
+# -------------------------------------------------------------------
+# Job em segundo plano (uma thread por processo; entre workers quem
+# gravar primeiro ganha, os outros recebem IntegrityError e ignoram)
+# -------------------------------------------------------------------
+_parar = threading.Event()
+_thread = None
+logger_snapshots = get_router_logger("snapshots", registro=True)
+
+
+def executar_snapshot_pendente():
+    with get_sessionmaker("escrita")() as db:
+        dia = snapshot_pendente(db)
+        if dia is not None:
+            tirar_snapshot(db, dia)
+
+
+def _loop():
+    while True:
+        try:
+            executar_snapshot_pendente()
+        except SQLAlchemyError as e:
+            logger_snapshots.error(
+                "",
+                extra={"ip": "N/A", "status": 500, "method": "N/A", "detail": f"Falha ao gravar snapshot de estoque: {e}"}
+            )
+        if _parar.wait(INTERVALO_VERIFICACAO):
+            return
+
+
+def iniciar_snapshots():
+    global _thread
+    if PERIODO_DIAS <= 0 or _thread is not None:
+        return
+    _parar.clear()
+    _thread = threading.Thread(target=_loop, name="snapshot-estoque", daemon=True)
+    _thread.start()
+
+
+def parar_snapshots():
+    global _thread
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+    _thread = None
@@ -0,0 +1,125 @@
+import hashlib
+import os
+
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from cache import get_cache
+from database import upsert
+from models import VersaoTabela
+
+# -------------------------------------------------------------------
+# Versão das tabelas + ETag (GET condicional)
+# Cada escrita nos routers de registro incrementa a versão da tabela
+# (tabela versao_tabela) na mesma transação. As consultas montam o ETag
+# a partir dessa versão: se o cliente mandar If-None-Match com o mesmo
+# ETag, respondemos 304 sem montar nem serializar a lista.
+#
+# A versão lida é guardada por pouco tempo em memória (VERSAO_TTL) para
+# que polls repetidos nem cheguem ao banco. Escritas feitas neste mesmo
+# processo limpam esse cache logo após o commit. A chave inclui o banco
+# de onde a versão foi lida: uma réplica atrasada não pode deixar a versão
+# antiga no cache para quem lê do escritor (ler o que acabou de escrever).
+# -------------------------------------------------------------------
+VERSAO_TTL = int(os.getenv("ETAG_VERSAO_TTL", "1"))  # segundos
+
+cache_versoes = get_cache("versao_tabela", ttl=VERSAO_TTL)
+
+
+def registrar_alteracao(db: Session, *tabelas: str):
+    """
+    Incrementa a versão das tabelas alteradas (chamar ANTES do commit,
+    para entrar na mesma transação da escrita).
+    """
+    for tabela in tabelas:
+        db.execute(_stmt_incrementar(db), {"tabela": tabela, "versao": 1})
+    db.info.setdefault("tabelas_alteradas", set()).update(tabelas)
+
+
+def _stmt_incrementar(db: Session):
+    # cria a linha da tabela na primeira escrita e depois só soma 1
+    return upsert(db, VersaoTabela, ["tabela"], lambda novo: {"versao": VersaoTabela.versao + 1})
+
+
+@event.listens_for(Session, "after_commit")
+def _limpar_cache_apos_commit(session):
+    for tabela in session.info.pop("tabelas_alteradas", ()):
+        cache_versoes.invalidar(_chave(session, tabela))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop("tabelas_alteradas", None)
+
+
+def _chave(db, tabela: str):
+    # servidor de onde a versão foi lida (Session ou AsyncSession): engines
+    # sync/async e perfis diferentes no mesmo banco dividem a mesma entrada
+    url = db.get_bind().url
+    return (url.host, url.port, url.database, tabela)
+
+
+def obter_versao(db: Session, tabela: str) -> int:
+    return cache_versoes.obter(
+        _chave(db, tabela),
+        lambda: db.scalar(select(VersaoTabela.versao).where(VersaoTabela.tabela == tabela)) or 0
+    )
+
+
+def calcular_etag(db: Session, request: Request, *tabelas: str):
+    """
+    ETag da resposta: versão das tabelas envolvidas + os parâmetros da URL
+    (filtros diferentes geram listas diferentes). Retorna None se a tabela
+    de versões não estiver disponível (aí a consulta segue sem ETag).
+    """
+    try:
+        versoes = [f"{tabela}.{obter_versao(db, tabela)}" for tabela in tabelas]
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+    return _montar_etag(request, versoes)
+
+
+async def calcular_etag_async(db, request: Request, *tabelas: str):
+    """Mesmo que calcular_etag, para os routers async (db é uma AsyncSession)."""
+    try:
+        versoes = []
+        for tabela in tabelas:
+            versao = await cache_versoes.obter_async(_chave(db, tabela), lambda: _ler_versao_async(db, tabela))
+            versoes.append(f"{tabela}.{versao}")
+    except SQLAlchemyError:
+        await db.rollback()
+        return None
+
+    return _montar_etag(request, versoes)
+
+
+async def _ler_versao_async(db, tabela: str) -> int:
+    return await db.scalar(select(VersaoTabela.versao).where(VersaoTabela.tabela == tabela)) or 0
+
+
+def _montar_etag(request: Request, versoes):
+    parametros = sorted(request.query_params.multi_items())
+    variante = hashlib.md5(repr(parametros).encode()).hexdigest()[:8]
+    return f'W/"{"-".join(versoes)}-{variante}"'
+
+
+def nao_modificado(request: Request, etag) -> bool:
+    """True se o cliente já tem essa versão (If-None-Match bate com o ETag)."""
+    if not etag:
+        return False
+    enviado = request.headers.get("if-none-match")
+    if not enviado:
+        return False
+    if enviado.strip() == "*":
+        return True
+    # comparação fraca: ignora o prefixo W/
+    normalizar = lambda valor: valor.strip().removeprefix("W/")
+    return normalizar(etag) in {normalizar(valor) for valor in enviado.split(",")}
+
+
+def resposta_304(etag: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
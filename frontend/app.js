@@ -58,116 +58,85 @@ function criarTabela(dados, colunas) {
   return table;
 }
 
-// FUNÇÃO DE CONSULTA NA TABELA CATEGORIAS
-async function carregarCategorias() {
-  const container = document.getElementById("listaCategorias");
-  container.innerHTML = "<p>Carregando...</p>";
-
-  try {
-    const res = await fetch("/consulta/categorias/");
-    const data = await res.json();
-    container.innerHTML = "";
-
-    const colunas = ["id", "descricao"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
-  } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar categorias: ${err}</p>`;
-    console.error(err);
-  }
+// LISTAGENS: UMA REQUISIÇÃO SÓ (/consulta/bootstrap) EM VEZ DE UM GET POR TABELA
+// Guarda as versões recebidas e manda de volta: o que não mudou volta em
+// "inalterados" (sem os dados) e continua com o que já estava aqui.
+const listagens = { versoes: {}, dados: {} };
+
+async function carregarListagens(nomes) {
+  const params = new URLSearchParams();
+  if (nomes) params.set("datasets", nomes.join(","));
+  const versoes = Object.entries(listagens.versoes)
+    .filter(([nome]) => !nomes || nomes.includes(nome))
+    .map(([nome, versao]) => `${nome}:${versao}`);
+  if (versoes.length) params.set("versoes", versoes.join(","));
+
+  const res = await fetch(`/consulta/bootstrap/?${params}`);
+  if (!res.ok) throw new Error(`Erro HTTP: ${res.status}`);
+  const data = await res.json();
+  Object.assign(listagens.dados, data.dados);
+  Object.assign(listagens.versoes, data.versoes);
+  return listagens.dados;
 }
 
-// FUNÇÃO PARA PRODUTOS
-async function carregarProdutos() {
-  const container = document.getElementById("listaProdutos");
-  container.innerHTML = "<p>Carregando...</p>";
+// nome do dataset no bootstrap -> onde e como mostrar
+const TELAS_LISTAGEM = {
+  categorias: { container: "listaCategorias", rotulo: "categorias", colunas: ["id", "descricao"] },
+  produtos: { container: "listaProdutos", rotulo: "produtos", colunas: ["id", "nome", "medida", "qtd_disponivel", "qtd_minima", "categoria_id", "status"] },
+  fornecedores: { container: "listaFornecedores", rotulo: "fornecedores", colunas: ["id", "razao_social", "contato", "email", "cnpj", "status"] },
+  movimentacoes: { container: "listaMovimentacoes", rotulo: "movimentações", colunas: ["id", "produto_id", "quantidade", "data", "tipo_mov_id", "preco_venda", "preco_compra", "fornecedor_id", "tipo_pag_id"] },
+  tipopagamento: { container: "listaTipoPag", rotulo: "tipos de pagamento", colunas: ["id", "descricao"] },
+  tipomovimentacao: { container: "listaTipoMov", rotulo: "tipos de movimentação", colunas: ["id", "descricao", "sinal"] },
+};
+
+async function mostrarListagens(nomes) {
+  nomes.forEach(nome => {
+    document.getElementById(TELAS_LISTAGEM[nome].container).innerHTML = "<p>Carregando...</p>";
+  });
 
   try {
-    const res = await fetch("/consulta/produtos/");
-    const data = await res.json();
-    container.innerHTML = "";
-
-    const colunas = ["id", "nome", "medida", "qtd_disponivel", "qtd_minima", "categoria_id", "status"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
+    const dados = await carregarListagens(nomes.length === Object.keys(TELAS_LISTAGEM).length ? null : nomes);
+    nomes.forEach(nome => {
+      const tela = TELAS_LISTAGEM[nome];
+      const container = document.getElementById(tela.container);
+      container.innerHTML = "";
+      container.appendChild(criarTabela(dados[nome] || [], tela.colunas));
+    });
   } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar produtos: ${err}</p>`;
+    nomes.forEach(nome => {
+      const tela = TELAS_LISTAGEM[nome];
+      document.getElementById(tela.container).innerHTML = `<p style="color:red;">Erro ao carregar ${tela.rotulo}: ${err}</p>`;
+    });
     console.error(err);
   }
 }
 
-// FUNÇÃO PARA FORNECEDORES
-async function carregarFornecedores() {
-  const container = document.getElementById("listaFornecedores");
-  container.innerHTML = "<p>Carregando...</p>";
-
-  try {
-    const res = await fetch("/consulta/fornecedores/");
-    const data = await res.json();
-    container.innerHTML = "";
-
-    const colunas = ["id", "razao_social", "contato", "email", "cnpj", "status"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
-  } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar fornecedores: ${err}</p>`;
-    console.error(err);
-  }
+// TODAS AS TABELAS DE UMA VEZ (uma requisição)
+function carregarTudo() {
+  return mostrarListagens(Object.keys(TELAS_LISTAGEM));
 }
 
-// FUNÇÃO PARA MOVIMENTAÇÕES
-async function carregarMovimentacoes() {
-  const container = document.getElementById("listaMovimentacoes");
-  container.innerHTML = "<p>Carregando...</p>";
-
-  try {
-    const res = await fetch("/consulta/movimentacoes/");
-    const data = await res.json();
-    container.innerHTML = "";
-
-    const colunas = ["id", "produto_id", "quantidade", "data", "tipo_mov_id", "preco_venda", "preco_compra", "fornecedor_id", "tipo_pag_id"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
-  } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar movimentações: ${err}</p>`;
-    console.error(err);
-  }
+// UMA TABELA SÓ (botões de cada seção)
+function carregarCategorias() {
+  return mostrarListagens(["categorias"]);
 }
 
-// FUNÇÃO PARA TIPOS DE PAGAMENTO
-async function carregarTipoPagamento() {
-  const container = document.getElementById("listaTipoPag");
-  container.innerHTML = "<p>Carregando...</p>";
-
-  try {
-    const res = await fetch("/consulta/tipopagamento/");
-    const data = await res.json();
-    container.innerHTML = "";
+function carregarProdutos() {
+  return mostrarListagens(["produtos"]);
+}
 
-    const colunas = ["id", "descricao"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
-  } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar tipos de pagamento: ${err}</p>`;
-    console.error(err);
-  }
+function carregarFornecedores() {
+  return mostrarListagens(["fornecedores"]);
 }
 
-// FUNÇÃO PARA TIPOS DE MOVIMENTAÇÃO
-async function carregarTipoMovimentacao() {
-  const container = document.getElementById("listaTipoMov");
-  container.innerHTML = "<p>Carregando...</p>";
+function carregarMovimentacoes() {
+  return mostrarListagens(["movimentacoes"]);
+}
 
-  try {
-    const res = await fetch("/consulta/tipomovimentacao/");
-    const data = await res.json();
-    container.innerHTML = "";
+function carregarTipoPagamento() {
+  return mostrarListagens(["tipopagamento"]);
+}
 
-    const colunas = ["id", "descricao_mov"];
-    const tabela = criarTabela(data, colunas);
-    container.appendChild(tabela);
-  } catch (err) {
-    container.innerHTML = `<p style="color:red;">Erro ao carregar tipos de movimentação: ${err}</p>`;
-    console.error(err);
-  }
+function carregarTipoMovimentacao() {
+  return mostrarListagens(["tipomovimentacao"]);
 }
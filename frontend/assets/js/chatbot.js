@@ -29,17 +29,42 @@ function addMessage(sender, text) {
   chatbox.scrollTop = chatbox.scrollHeight;
 }
 
+// SINCRONIZAÇÃO INCREMENTAL (/consulta/changes)
+// A lista fica no localStorage junto com o token da última sincronização;
+// nas próximas vezes só vem o que mudou desde ele (sem token = carga completa).
+async function sincronizarTabela(tabela, chave) {
+  const chaveToken = `${chave}Token`;
+  let lista = JSON.parse(localStorage.getItem(chave) || "null");
+  let token = lista ? Number(localStorage.getItem(chaveToken) || 0) : 0;
+  if (!token) lista = [];
+
+  let mais = true;
+  while (mais) {
+    const response = await fetch(`${CHATBOT_API_BASE}/consulta/changes/?since=${token}&tabelas=${tabela}`);
+    if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
+
+    const dados = await response.json();
+    const { alterados, removidos } = dados.tabelas[tabela];
+    const porId = new Map(lista.map((item) => [item.id, item]));
+    removidos.forEach((id) => porId.delete(id));
+    alterados.forEach((item) => porId.set(item.id, item));
+    lista = [...porId.values()].sort((a, b) => a.id - b.id);
+    token = dados.token;
+    mais = dados.mais;
+  }
+
+  localStorage.setItem(chave, JSON.stringify(lista));
+  localStorage.setItem(chaveToken, String(token));
+  return lista;
+}
+
 // CARREGAR PRODUTOS DA API
 async function carregarProdutosViaChat() {
   addMessage("bot", "🔄 Carregando produtos...");
 
   try {
-    const response = await fetch(`${CHATBOT_API_BASE}/consulta/produtos/`);
-    if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
-
-    const produtos = await response.json();
+    const produtos = await sincronizarTabela("produtos", "produtosGlobais");
     window.produtosGlobais = produtos;
-    localStorage.setItem("produtosGlobais", JSON.stringify(produtos));
 
     if (typeof preencherTabela === "function") preencherTabela(produtos);
 
@@ -57,12 +82,8 @@ async function fetchFornecedores() {
   addMessage("bot", "🔄 Carregando fornecedores...");
 
   try {
-    const response = await fetch(`${CHATBOT_API_BASE}/consulta/fornecedores/`);
-    if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
-
-    const fornecedores = await response.json();
+    const fornecedores = await sincronizarTabela("fornecedores", "fornecedoresGlobais");
     window.fornecedoresGlobais = fornecedores;
-    localStorage.setItem("fornecedoresGlobais", JSON.stringify(fornecedores));
 
     addMessage("bot", `✅ ${fornecedores.length} fornecedores carregados!`);
     return fornecedores;
@@ -106,14 +127,12 @@ async function processCommand(text) {
     }
 
     try {
-      const response = await fetch(`${CHATBOT_API_BASE}/consulta/produtos/`);
-      const produtos = await response.json();
-
-      const resultados = produtos.filter((p) =>
-        Object.values(p).some((val) =>
-          String(val).toLowerCase().includes(termo)
-        )
+      // busca feita no servidor (ignora acentos e aceita erros de digitação)
+      const response = await fetch(
+        `${CHATBOT_API_BASE}/consulta/busca/?tipo=produto&limite=20&q=${encodeURIComponent(termo)}`
       );
+      const { itens } = await response.json();
+      const resultados = itens.map((item) => item.dados);
 
       if (resultados.length > 0) {
         addMessage("bot", `🔍 Encontrei ${resultados.length} produto(s):`);
@@ -145,22 +164,23 @@ async function processCommand(text) {
     // ESTOQUE BAIXO
   } else if (command.includes("estoque baixo")) {
     try {
-      const response = await fetch(`${CHATBOT_API_BASE}/consulta/produtos/`);
-      const produtos = await response.json();
-
-      const baixos = produtos.filter(
-        (p) => (p.qtd_disponivel || p.stock || 0) <= 10
+      // filtro (qtd_disponivel <= qtd_minima) e ordenação feitos no servidor
+      const response = await fetch(
+        `${CHATBOT_API_BASE}/consulta/produtos/estoque-baixo?limite=10`
       );
+      const { itens: baixos, total } = await response.json();
 
       if (baixos.length > 0) {
-        addMessage("bot", `⚠️ ${baixos.length} produto(s) com estoque baixo:`);
-        baixos.slice(0, 10).forEach((p) => {
-          const nome = p.nome || p.title || "Sem nome";
-          const estoque = p.qtd_disponivel || p.stock || 0;
-          addMessage("bot", `${nome} — Apenas ${estoque} unidades!`);
+        addMessage("bot", `⚠️ ${total} produto(s) com estoque baixo:`);
+        baixos.forEach((p) => {
+          const nome = p.nome || "Sem nome";
+          addMessage(
+            "bot",
+            `${nome} — Apenas ${p.qtd_disponivel} ${p.medida} (mínimo ${p.qtd_minima})!`
+          );
         });
-        if (baixos.length > 10)
-          addMessage("bot", `... e mais ${baixos.length - 10} produtos.`);
+        if (total > baixos.length)
+          addMessage("bot", `... e mais ${total - baixos.length} produtos.`);
       } else {
         addMessage("bot", "✅ Tudo certo! Nenhum produto com estoque crítico.");
       }
@@ -195,16 +215,12 @@ async function processCommand(text) {
     }
 
     try {
+      // busca feita no servidor (nome, CNPJ com ou sem pontuação, e-mail)
       const response = await fetch(
-        `${CHATBOT_API_BASE}/consulta/fornecedores/`
-      );
-      const fornecedores = await response.json();
-
-      const encontrados = fornecedores.filter((f) =>
-        Object.values(f).some((val) =>
-          String(val).toLowerCase().includes(termo)
-        )
+        `${CHATBOT_API_BASE}/consulta/busca/?tipo=fornecedor&limite=20&q=${encodeURIComponent(termo)}`
       );
+      const { itens } = await response.json();
+      const encontrados = itens.map((item) => item.dados);
 
       if (encontrados.length > 0) {
         addMessage("bot", `🔍 Encontrei ${encontrados.length} fornecedor(es):`);
@@ -40,10 +40,10 @@ async function buscarTiposPagamento() {
   }
 }
 
-// Buscar movimentações
+// Buscar movimentações (já com o nome do produto, resolvido no servidor)
 async function buscarMovimentacoes() {
   try {
-    const response = await fetch(`${API_URL}/consulta/movimentacoes/`);
+    const response = await fetch(`${API_URL}/consulta/movimentacoes/?expand=produto`);
     if (!response.ok) throw new Error('Erro ao buscar movimentações');
     return await response.json();
   } catch (error) {
@@ -75,30 +75,12 @@ async function criarMovimentacao(movimentacao) {
   }
 }
 
-// ========== FUNÇÕES DE MAPEAMENTO ==========
-
-// Buscar nome do produto por ID
-function getNomeProduto(produtoId) {
-  const produto = produtosCache.find(p => p.id === produtoId);
-  return produto ? produto.nome : `Produto #${produtoId}`;
-}
-
-// Buscar nome do tipo de pagamento por ID
-function getNomeTipoPagamento(tipoId) {
-  const tipo = tiposPagamentoCache.find(t => t.id === tipoId);
-  return tipo ? tipo.nome : '-';
-}
-
 // ========== CARREGAR E EXIBIR HISTÓRICO ==========
 
 async function carregarHistorico() {
   try {
-    // Busca todos os dados necessários
-    const [movimentacoes, produtos, tiposPagamento] = await Promise.all([
-      buscarMovimentacoes(),
-      buscarProdutos(),
-      buscarTiposPagamento()
-    ]);
+    // uma requisição só: o nome do produto vem junto (expand), sem baixar a lista de produtos
+    const movimentacoes = await buscarMovimentacoes();
 
     const tbody = document.getElementById("tabela-historico");
     tbody.innerHTML = "";
@@ -114,7 +96,7 @@ async function carregarHistorico() {
     movimentacoes.forEach((item) => {
       const tr = document.createElement("tr");
       
-      const nomeProduto = getNomeProduto(item.produto_id);
+      const nomeProduto = item.produto_nome || `Produto #${item.produto_id}`;
       const preco_compra = item.preco_compra ? `R$ ${item.preco_compra.toFixed(2)}` : '-';
       const dataFormatada = new Date(item.data).toLocaleDateString('pt-BR');
       const observacoes = item.observacoes || '-';
@@ -19,9 +19,9 @@ const editForm = document.getElementById("editForm");
 const cancelEdit = document.getElementById("cancelEdit");
 
 window.onload = async () => {
-  await fetchCategorias();
-  await fetchProdutos();
+  await carregarDadosIniciais();
   inicializarEventListeners();
+  assinarAlteracoes();
 };
 
 // ============================
@@ -51,6 +51,28 @@ function inicializarEventListeners() {
 // ============================
 // Carregar dados
 // ============================
+// categorias + produtos numa requisição só (/consulta/bootstrap)
+async function carregarDadosIniciais() {
+  try {
+    showLoading(true);
+    const response = await fetch(`${API_BASE_URL}/consulta/bootstrap/?datasets=categorias,produtos`);
+    if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
+
+    const { dados } = await response.json();
+    categoriasGlobais = dados.categorias;
+    produtosGlobais = dados.produtos;
+    localStorage.setItem("produtosGlobais", JSON.stringify(produtosGlobais));
+
+    preencherTabela(produtosGlobais);
+  } catch (error) {
+    console.error("Erro no bootstrap, carregando separadamente:", error);
+    await fetchCategorias();
+    await fetchProdutos();
+  } finally {
+    showLoading(false);
+  }
+}
+
 async function fetchProdutos() {
   try {
     showLoading(true);
@@ -77,6 +99,39 @@ async function fetchProdutos() {
   }
 }
 
+// ============================
+// Atualização ao vivo (feed de alterações)
+// ============================
+function assinarAlteracoes() {
+  if (!window.EventSource) return;
+  // o EventSource reconecta sozinho e manda o Last-Event-ID para retomar
+  const fonte = new EventSource(`${API_BASE_URL}/consulta/eventos/?tipos=produto,estoque`);
+
+  const atualizar = (produto) => {
+    const i = produtosGlobais.findIndex((p) => p.id === produto.id);
+    if (i >= 0) produtosGlobais[i] = { ...produtosGlobais[i], ...produto };
+    else produtosGlobais.push(produto);
+    preencherTabela(produtosGlobais);
+  };
+
+  fonte.addEventListener("produto.criado", (e) => atualizar(JSON.parse(e.data)));
+  fonte.addEventListener("produto.atualizado", (e) => atualizar(JSON.parse(e.data)));
+  fonte.addEventListener("produto.removido", (e) => {
+    const { id } = JSON.parse(e.data);
+    produtosGlobais = produtosGlobais.filter((p) => p.id !== id);
+    preencherTabela(produtosGlobais);
+  });
+  fonte.addEventListener("estoque.saldo", (e) => {
+    JSON.parse(e.data).saldos.forEach(({ produto_id, qtd_disponivel }) => {
+      const produto = produtosGlobais.find((p) => p.id === produto_id);
+      if (produto) produto.qtd_disponivel = qtd_disponivel;
+    });
+    preencherTabela(produtosGlobais);
+  });
+  // ficou para trás demais (ou o servidor reiniciou): recarrega a lista inteira
+  fonte.addEventListener("reset", () => fetchProdutos());
+}
+
 async function fetchCategorias() {
   try {
     const response = await fetch(`${API_BASE_URL}/consulta/categorias/`);
@@ -225,24 +280,18 @@ function abrirModalEdicaoProduto(produtoId) {
 
     const nome = document.getElementById("editNome").value.trim();
     const medida = document.getElementById("editPreco").value.trim(); 
-    const qtd_disponivel = document.getElementById("editEstoque").value.trim();
     const categoria_id = document.getElementById("editCategoria").value;
 
-    if (!nome || !medida || !qtd_disponivel || !categoria_id) {
+    if (!nome || !medida || !categoria_id) {
       alert("Todos os campos devem ser preenchidos!");
       return;
     }
 
-    if (isNaN(qtd_disponivel) || qtd_disponivel < 0) {
-      alert("Quantidade inválida!");
-      return;
-    }
-
+    // o estoque (qtd_disponivel) não vai no PUT: só muda por movimentações
     const produtoAtualizado = {
       nome,
       medida,
-      qtd_disponivel: parseInt(qtd_disponivel),
-      qtd_minima: 0,
+      qtd_minima: produtoAtualEdicao.qtd_minima || 0,
       categoria_id: parseInt(categoria_id),
       status: produtoAtualEdicao.status || "ativo",
     };